@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import designs
+import sweep_engine
+from emulator import Emulator, std_err_field
+from sweep_engine import SweepProtocol, SweepSpec
+
+if TYPE_CHECKING:
+    from squidasm.run.stack.config import StackNetworkConfig
+
+# Active-learning scheduler for declarative sweeps. After a coarse pass over
+# the points of the spec, new points are added in batches where the emulated
+# curve is least well known, until the budget of simulated points is used up.
+#
+# A candidate x is scored by the standard deviation of the emulator at x plus
+# the error of interpolating linearly over the gap to its nearest point,
+# curvature(x) * h(x)^2 / 8. The points that were already simulated are also
+# candidates: when the noise at one of them dominates, it is simulated again
+# (an extra repetition) instead of adding a new point.
+
+# Number of candidate points per batch for 1 and for more dimensions.
+CANDIDATES_1D = 257
+CANDIDATES_ND = 1024
+
+# Minimum distance of a new point to the simulated points, as a fraction of
+# their typical spacing in the unit box.
+MIN_GAP = 0.25
+
+
+def _bounds(spec: SweepSpec) -> Tuple[List[Tuple[float, float]], List[bool]]:
+    bounds, log = [], []
+    for p in spec.parameters:
+        if p.bounds is not None:
+            bounds.append(p.bounds)
+        else:
+            bounds.append((min(p.values), max(p.values)))
+        log.append(p.log)
+    return bounds, log
+
+
+def candidate_points(spec: SweepSpec, seed: int = 0) -> List[Tuple[float, ...]]:
+    bounds, log = _bounds(spec)
+    if len(bounds) == 1:
+        unit = np.linspace(0, 1, CANDIDATES_1D)[:, None]
+    else:
+        rng = np.random.default_rng(seed)
+        unit = designs.sobol(CANDIDATES_ND, len(bounds), rng)
+    return designs.scale_points(unit, bounds, log)
+
+
+def _emulators(
+    spec: SweepSpec,
+    protocol: SweepProtocol,
+    points: List[Tuple[float, ...]],
+    summaries: List[Dict[str, Dict]],
+    field: str,
+) -> Dict[str, Emulator]:
+    x = np.array(points, dtype=float)
+    emulators = {}
+    for version in protocol.compile_versions:
+        entries = [summary[version] for summary in summaries]
+        y = np.array([entry[field] for entry in entries], dtype=float)
+        std_err_name = std_err_field(field, entries[0])
+        std_err = np.zeros_like(y)
+        if std_err_name is not None:
+            std_err = np.array([entry[std_err_name] for entry in entries], dtype=float)
+        emulators[version] = Emulator(
+            [str(path) for path in spec.paths],
+            [p.log for p in spec.parameters],
+            x,
+            y,
+            std_err,
+        ).fit()
+    return emulators
+
+
+def select_points(
+    emulators: Dict[str, Emulator],
+    points: List[Tuple[float, ...]],
+    candidates: List[Tuple[float, ...]],
+    num_points: int,
+) -> List[Tuple[float, ...]]:
+    """Greedily pick `num_points` candidates (or existing points, to repeat)
+    with the highest score over all compile versions. After every pick, the
+    emulators are conditioned on the predicted value at the picked point, so
+    that the next pick goes elsewhere unless the noise there is large."""
+    # New points keep some distance from the simulated ones; going back to a
+    # point is done by repeating it, which only helps if its outputs are noisy.
+    emulator = next(iter(emulators.values()))
+    dimensions = len(candidates[0])
+    min_gap = MIN_GAP * len(set(points)) ** (-1 / dimensions)
+    gaps = emulator.nearest_distance(np.array(candidates, dtype=float))
+    options = [c for c, gap in zip(candidates, gaps) if gap > min_gap]
+    if any(np.any(emulator.std_err > 0) for emulator in emulators.values()):
+        options += sorted(set(points))
+    x = np.array(options, dtype=float)
+    selected = []
+    for _ in range(num_points):
+        scores = np.zeros(len(options))
+        for emulator in emulators.values():
+            _, std = emulator.predict(x)
+            gap = emulator.nearest_distance(x)
+            scores = np.maximum(scores, std + emulator.curvature(x) * gap**2 / 8)
+        best = options[int(np.argmax(scores))]
+        selected.append(best)
+
+        for version, emulator in emulators.items():
+            mean, _ = emulator.predict([best])
+            # A planned point is expected to be as noisy as a typical one.
+            std_err = np.median(emulator.std_err)
+            emulators[version] = emulator.with_points([best], mean, [std_err])
+    return selected
+
+
+def run_active(
+    spec: SweepSpec,
+    base_cfg: StackNetworkConfig,
+    protocol: SweepProtocol,
+    executor: Any,
+    budget: int,
+    batch_size: int = 4,
+    field: Optional[str] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    """Run the points of `spec` as a coarse pass, then add batches of
+    `batch_size` points selected by `select_points` until `budget` points
+    (including repetitions) have been simulated."""
+    if field is None:
+        field = protocol.primary_field
+    points = spec.points()
+    if budget < len(points):
+        raise ValueError(
+            f"the budget ({budget}) is smaller than the coarse pass ({len(points)})"
+        )
+
+    checkpoint, meta = sweep_engine.open_checkpoint(
+        spec,
+        base_cfg,
+        protocol,
+        executor,
+        resume,
+        active={"budget": budget, "batch_size": batch_size, "field": field},
+    )
+    candidates = candidate_points(spec, spec.seed)
+
+    # Points are identified by their coordinates and repetition, so repeated
+    # points get their own seeds and checkpoint entries.
+    repetitions = [0] * len(points)
+    while True:
+        keys = [tuple(p) + (r,) for p, r in zip(points, repetitions)]
+        print(f"{len(points)} points planned, budget {budget}")
+        summaries = sweep_engine.run_points(
+            spec, base_cfg, protocol, executor, checkpoint, points, keys
+        )
+        if len(points) >= budget:
+            break
+
+        emulators = _emulators(spec, protocol, points, summaries, field)
+        num_points = min(batch_size, budget - len(points))
+        for point in select_points(emulators, points, candidates, num_points):
+            repetitions.append(points.count(point))
+            points.append(point)
+            if repetitions[-1] > 0:
+                print(f"repeating point {point}")
+            else:
+                print(f"adding point {point}")
+
+    # Sort the points, so that 1D sweeps can be plotted as curves.
+    order = sorted(range(len(points)), key=lambda i: (points[i], repetitions[i]))
+    data = sweep_engine.sweep_data(
+        spec,
+        protocol,
+        [points[i] for i in order],
+        [summaries[i] for i in order],
+        meta,
+    )
+    for version in protocol.compile_versions:
+        for entry, i in zip(data[version], order):
+            entry["repetition"] = repetitions[i]
+    sweep_engine.dump_sweep_data(protocol, data, spec.name)
+    return data
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import instrument
+import parallel
+
+# Throughput benchmarks of the simulation functions. Every workload runs a
+# fixed, seeded number of iterations of one protocol on one config, in a fresh
+# process so that its peak memory is not shared with other workloads. The
+# results can be compared with those of an earlier run (e.g. before a squidasm
+# or netqasm update) to catch slowdowns. The simulation stack is only imported
+# by the workloads, so that `--help` and the startup suite run without it.
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(__file__), "benchmark_results")
+
+DEFAULT_NUM_TIMES = 100
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 0
+# Relative slowdown (or memory increase) above which a workload is flagged.
+DEFAULT_THRESHOLD = 0.1
+
+PACKAGES = ["netsquid", "squidasm", "netqasm"]
+
+SUITES = ["throughput", "startup", "all"]
+
+# Commands whose start-up time is measured. They should not import any of
+# `HEAVY_MODULES`.
+STARTUP_COMMANDS = {
+    "simulate_bqc --help": ["simulate_bqc.py", "--help"],
+    "simulate_teleport --help": ["simulate_teleport.py", "--help"],
+    "plot_bqc --help": ["plot_bqc.py", "--help"],
+    "plot_teleport --help": ["plot_teleport.py", "--help"],
+}
+HEAVY_MODULES = ["netsquid", "pydynaa", "squidasm", "netqasm", "matplotlib"]
+
+# Runs a script like `python <script> <args>` and prints the heavy modules it
+# imported on the last line.
+_IMPORTS_SNIPPET = """
+import json, runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+print()
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules} & set(%r))))
+"""
+
+# Starts a pool worker like `parallel.run_jobs` does and waits for its first
+# (empty) job. The initializer imports the simulation stack.
+_WORKER_SNIPPET = """
+import multiprocessing, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+import parallel
+context = multiprocessing.get_context(sys.argv[1])
+start = time.perf_counter()
+with ProcessPoolExecutor(
+    max_workers=1,
+    mp_context=context,
+    initializer=parallel._init_worker,
+    initargs=("WARNING", False, False, None),
+) as executor:
+    executor.submit(os.getpid).result()
+print(time.perf_counter() - start)
+"""
+
+
+@dataclass
+class Workload:
+    config: str
+    protocol: str
+    compile_version: str
+    formalism: str = "dm"
+
+
+WORKLOADS = {
+    "teleport/meas_epr_first": Workload(
+        "teleport_cfg1.yaml", "teleport", "meas_epr_first"
+    ),
+    "teleport/meas_epr_last": Workload(
+        "teleport_cfg1.yaml", "teleport", "meas_epr_last"
+    ),
+    "trap/vanilla": Workload("near_perfect_nv.yaml", "trap", "vanilla"),
+    "trap/nv": Workload("near_perfect_nv.yaml", "trap", "nv"),
+    "trap/nv-ket": Workload("near_perfect_nv.yaml", "trap", "nv", formalism="ket"),
+}
+
+
+def _simulate(workload: Workload, cfg: Any, num_times: int) -> int:
+    # Returns the number of simulated iterations.
+    from bqc import bqc
+    from sweep_bqc import TRAP_INPUTS
+    from sweep_teleport import THETA_PHIS
+    from teleport import teleport
+
+    if workload.protocol == "teleport":
+        teleport.teleportation_samples_multi(
+            cfg,
+            num_times,
+            theta_phis=THETA_PHIS,
+            compile_version=workload.compile_version,
+        )
+        return num_times * len(THETA_PHIS)
+
+    bqc.trap_round_samples_multi(
+        cfg, num_times, inputs=TRAP_INPUTS, formalism=workload.formalism
+    )
+    return num_times * len(TRAP_INPUTS)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    if sys.platform == "darwin":
+        return peak / 2**20
+    return peak / 2**10
+
+
+def run_workload(name: str, num_times: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """Run workload `name` `repeat` times and return the results of the
+    fastest run. Every run builds its network from scratch."""
+    from squidasm.run.stack.config import StackNetworkConfig
+    from squidasm.sim.stack.common import LogManager
+
+    import session
+    from sweep_bqc import version_config
+
+    LogManager.set_log_level("WARNING")
+    workload = WORKLOADS[name]
+    cfg = StackNetworkConfig.from_file(
+        os.path.join(os.path.dirname(__file__), "configs", workload.config)
+    )
+    if workload.protocol == "trap":
+        cfg = version_config(cfg, workload.compile_version)
+
+    instrument.enable()
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(repeat):
+        session.clear_sessions()
+        instrument.reset()
+        parallel.reset_simulation(seed)
+        start = time.perf_counter()
+        iterations = _simulate(workload, cfg, num_times)
+        seconds = time.perf_counter() - start
+        if best is not None and seconds >= best["seconds"]:
+            continue
+        phases = instrument.totals()
+        phases["other"] = seconds - sum(phases.values())
+        best = {
+            "iterations": iterations,
+            "seconds": seconds,
+            "iterations_per_s": iterations / seconds,
+            "phases": phases,
+            "counts": instrument.report()["counts"],
+        }
+    best["peak_rss_mb"] = _peak_rss_mb()
+    return best
+
+
+def run_benchmarks(
+    names: List[str],
+    num_times: int = DEFAULT_NUM_TIMES,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = DEFAULT_SEED,
+) -> Dict[str, Any]:
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        print(f"running {name}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(
+                run_workload, name, num_times, repeat, seed
+            ).result()
+        print_result(name, results[name])
+    return {
+        "meta": benchmark_meta(num_times, repeat, seed),
+        "workloads": {
+            name: {"workload": asdict(WORKLOADS[name]), **result}
+            for name, result in results.items()
+        },
+    }
+
+
+def _best_time(argv: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + argv,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_startup_benchmarks(repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Wall time of the `STARTUP_COMMANDS` and of starting a pool worker with
+    every start method, in fresh interpreters (best of `repeat`). The workers
+    import the simulation stack, so they are skipped without it."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results: Dict[str, Any] = {}
+    for name, argv in STARTUP_COMMANDS.items():
+        seconds = _best_time(argv, repeat)
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORTS_SNIPPET % HEAVY_MODULES] + argv,
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        heavy = json.loads(output.strip().splitlines()[-1])
+        results[name] = {"seconds": seconds, "heavy_modules": heavy}
+        print(f"{name}: {seconds:.3f} s, heavy modules imported: {heavy or 'none'}")
+
+    if importlib.util.find_spec("squidasm") is None:
+        print("workers: skipped, squidasm is not installed")
+        return results
+    for method in multiprocessing.get_all_start_methods():
+        seconds = min(
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", _WORKER_SNIPPET, method],
+                    cwd=cwd,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout
+            )
+            for _ in range(repeat)
+        )
+        results[f"worker ({method})"] = {"seconds": seconds}
+        print(f"worker ({method}): {seconds:.3f} s until its first job returns")
+    return results
+
+
+def benchmark_meta(num_times: int, repeat: int, seed: int) -> Dict[str, Any]:
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "num_times": num_times,
+        "repeat": repeat,
+        "seed": seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.node(),
+        "versions": versions,
+    }
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    phases = ", ".join(
+        f"{phase} {seconds:.3f} s" for phase, seconds in result["phases"].items()
+    )
+    print(
+        f"{name}: {result['iterations_per_s']:.1f} iterations/s "
+        f"({result['iterations']} in {result['seconds']:.3f} s; {phases}), "
+        f"peak RSS {result['peak_rss_mb']:.1f} MB"
+    )
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """Compare benchmark results with a baseline and return a description of
+    every workload whose throughput dropped, or whose peak memory grew, by
+    more than `threshold` (relative), and of every start-up benchmark that got
+    slower by more than `threshold` or imports more heavy modules."""
+    regressions = []
+    for name, result in results.get("startup", {}).items():
+        base = baseline.get("startup", {}).get(name)
+        if base is None:
+            print(f"{name}: not in the baseline")
+            continue
+        slowdown = result["seconds"] / base["seconds"]
+        flag = ""
+        if slowdown > 1 + threshold:
+            regressions.append(f"{name}: start-up time {slowdown - 1:+.1%}")
+            flag = "  <-- REGRESSION"
+        new_heavy = set(result.get("heavy_modules", [])) - set(
+            base.get("heavy_modules", [])
+        )
+        if new_heavy:
+            regressions.append(f"{name}: now imports {sorted(new_heavy)}")
+            flag = "  <-- REGRESSION"
+        print(f"{name}: start-up time {slowdown - 1:+.1%}{flag}")
+
+    for name, result in results.get("workloads", {}).items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None:
+            print(f"{name}: not in the baseline")
+            continue
+        speed = result["iterations_per_s"] / base["iterations_per_s"]
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"]
+        flag = ""
+        if speed < 1 - threshold:
+            regressions.append(f"{name}: throughput {speed - 1:+.1%}")
+            flag = "  <-- REGRESSION"
+        if memory > 1 + threshold:
+            regressions.append(f"{name}: peak RSS {memory - 1:+.1%}")
+            flag = "  <-- REGRESSION"
+        print(f"{name}: throughput {speed - 1:+.1%}, peak RSS {memory - 1:+.1%}{flag}")
+    return regressions
+
+
+def dump_results(results: Dict[str, Any], path: Optional[str] = None) -> None:
+    paths = [path]
+    if path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        paths = [
+            os.path.join(BENCHMARK_DIR, f"bench_{timestamp}.json"),
+            os.path.join(BENCHMARK_DIR, "bench_LAST.json"),
+        ]
+    for p in paths:
+        Path(os.path.dirname(os.path.abspath(p))).mkdir(parents=True, exist_ok=True)
+        with open(p, "w") as f:
+            json.dump(results, f, indent=4)
+    print(f"results written to {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="Simulation benchmarks")
+    parser.add_argument(
+        "--suite",
+        type=str,
+        choices=SUITES,
+        default="all",
+        help=(
+            "Run the simulation throughput workloads, the start-up time "
+            "benchmarks of the scripts and pool workers, or both."
+        ),
+    )
+    parser.add_argument(
+        "--workload",
+        type=str,
+        action="append",
+        choices=list(WORKLOADS),
+        default=None,
+        help="Workload to run (default all). Can be given multiple times.",
+    )
+    parser.add_argument(
+        "--num",
+        type=int,
+        default=DEFAULT_NUM_TIMES,
+        help="Iterations per input of every workload.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Run every workload this many times and keep the fastest run.",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--out",
+        type=str,
+        default=None,
+        help=(
+            "Write the results to this JSON file instead of a timestamped file "
+            "in netqasm_sim/benchmark_results."
+        ),
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help=(
+            "Earlier results to compare with. Exits with status 1 if any "
+            "workload regressed by more than --threshold."
+        ),
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative throughput drop or memory increase that is a regression.",
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"meta": benchmark_meta(args.num, args.repeat, args.seed)}
+    if args.suite in ["throughput", "all"]:
+        names = args.workload if args.workload is not None else list(WORKLOADS)
+        results.update(run_benchmarks(names, args.num, args.repeat, args.seed))
+    if args.suite in ["startup", "all"]:
+        results["startup"] = run_startup_benchmarks(args.repeat)
+    dump_results(results, args.out)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("regressions found:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print(f"no regressions above {args.threshold:.0%}")
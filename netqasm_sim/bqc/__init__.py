@@ -0,0 +1,4 @@
+# Constants of the BQC simulation that are needed without importing NetSquid
+# and squidasm, e.g. to build the command line parsers.
+
+COMPILE_VERSIONS = ["vanilla", "nv"]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from squidasm.run.stack.config import StackNetworkConfig
+
+# Closed-form model of the trap rounds of ClientProgram and ServerProgram (with
+# dummy = 1) on two NV nodes connected by a depolarising link.
+#
+# Every noise source either shrinks the Bloch vector of a remotely-prepared
+# qubit or flips a measurement outcome, so the error rate and the RSP
+# fidelities are products of per-source factors. All inputs are broadcast
+# against each other, so a whole grid of parameters is evaluated in one call.
+
+
+@dataclass(frozen=True)
+class TrapGateCounts:
+    # Depolarising applications of the electron-carbon gate noise that act on
+    # the first EPR half (the trap qubit) while it is moved to a carbon, before
+    # the state is dumped. One more application acts while the carbon is still
+    # being prepared and only shrinks the state by a factor (1 - p/2).
+    rsp_noise: int
+    rsp_half_noise: int
+    # Applications between the dump and the measurement of the trap qubit,
+    # on the trap and the dummy qubit together.
+    trap_noise: int
+    # Time (ns) the trap qubit spends in the carbon, apart from waiting for
+    # the second EPR pair.
+    memory_time: float
+
+
+# Fitted to the NetSquid results in final_data/sweep_data_paper_bqc, and
+# validated against fresh NetSquid runs at gate noise values that are not in
+# that data by `sweep_bqc.crosscheck`.
+GATE_COUNTS = {
+    "vanilla": TrapGateCounts(
+        rsp_noise=4, rsp_half_noise=1, trap_noise=4, memory_time=1_048_000
+    ),
+    "nv": TrapGateCounts(
+        rsp_noise=2, rsp_half_noise=1, trap_noise=4, memory_time=192_000
+    ),
+}
+
+
+@dataclass
+class TrapRoundModel:
+    error_rate: np.ndarray
+    epr_fid1: np.ndarray
+    epr_fid2: np.ndarray
+
+
+def _value(cfg: Any, name: str, default: float = 0.0) -> float:
+    if cfg is None:
+        return default
+    if isinstance(cfg, dict):
+        value = cfg.get(name, default)
+    else:
+        value = getattr(cfg, name, default)
+    return default if value is None else float(value)
+
+
+def _geometric_decay(t_cycle, prob_success, t_decay):
+    # E[exp(-k * t_cycle / T)] for k ~ Geometric(prob_success), k >= 1.
+    if t_decay == 0:
+        return np.ones_like(np.asarray(prob_success, dtype=float))
+    d = np.exp(-np.asarray(t_cycle, dtype=float) / t_decay)
+    return prob_success * d / (1 - (1 - prob_success) * d)
+
+
+def expected_trap_rounds(
+    compile_version: str,
+    depolar_prob: Any,
+    link_fidelity: Any,
+    prob_error_0: Any = 0.0,
+    prob_error_1: Any = 0.0,
+    carbon_T2: float = 0.0,
+    t_cycle: Any = 0.0,
+    prob_success: Any = 1.0,
+) -> TrapRoundModel:
+    """Expected trap-round error rate and RSP fidelities.
+
+    `depolar_prob` is the `ec_gate_depolar_prob` of both nodes and
+    `prob_error_0/1` the readout errors of both nodes. All array arguments are
+    broadcast, e.g. pass `depolar_prob[:, None]` and `link_fidelity[None, :]`
+    to evaluate a 2D grid.
+    """
+    counts = GATE_COUNTS[compile_version]
+    p = np.asarray(depolar_prob, dtype=float)
+    fidelity = np.asarray(link_fidelity, dtype=float)
+    readout_error = (
+        np.asarray(prob_error_0, dtype=float) + np.asarray(prob_error_1, dtype=float)
+    ) / 2
+
+    # Bloch vector length of the state that is remotely prepared by measuring
+    # one half of a Werner state, with a wrongly recorded client outcome
+    # counting as a flip.
+    werner = (4 * fidelity - 1) / 3
+    readout = 1 - 2 * readout_error
+    rsp = werner * readout
+
+    memory = _geometric_decay(t_cycle, prob_success, carbon_T2)
+    if carbon_T2 != 0:
+        memory = memory * np.exp(-counts.memory_time / carbon_T2)
+    gate_noise = (1 - p) ** counts.rsp_noise * (1 - p / 2) ** counts.rsp_half_noise
+
+    epr1 = rsp
+    epr2 = rsp * memory * gate_noise
+
+    # The trap fails if the outcome of the trap qubit is flipped an odd number
+    # of times: by the dummy qubit (through the CPHASE), by the trap qubit
+    # itself, by later gate noise, or by the server readout.
+    trap = epr1 * epr2 * (1 - p) ** counts.trap_noise * readout
+
+    error_rate, epr_fid1, epr_fid2 = np.broadcast_arrays(
+        (1 - trap) / 2, (1 + epr1) / 2, (1 + epr2) / 2
+    )
+    return TrapRoundModel(error_rate=error_rate, epr_fid1=epr_fid1, epr_fid2=epr_fid2)
+
+
+def expected_trap_rounds_cfg(
+    cfg: StackNetworkConfig, compile_version: str, depolar_prob: Any
+) -> TrapRoundModel:
+    """`expected_trap_rounds` with all parameters but the gate noise taken
+    from `cfg`."""
+    for stack in cfg.stacks:
+        if not stack.qdevice_typ.startswith("nv"):
+            raise ValueError(
+                f"analytic engine only supports NV devices, not {stack.qdevice_typ}"
+            )
+    link = cfg.links[0]
+    if link.typ == "perfect":
+        fidelity, prob_success, t_cycle = 1.0, 1.0, 0.0
+    elif link.typ == "depolarise":
+        fidelity = _value(link.cfg, "fidelity")
+        prob_success = _value(link.cfg, "prob_success", 1.0)
+        t_cycle = _value(link.cfg, "t_cycle")
+    else:
+        raise ValueError(f"analytic engine does not support {link.typ} links")
+
+    qdevice_cfg = cfg.stacks[1].qdevice_cfg
+    return expected_trap_rounds(
+        compile_version,
+        depolar_prob,
+        fidelity,
+        prob_error_0=_value(qdevice_cfg, "prob_error_0"),
+        prob_error_1=_value(qdevice_cfg, "prob_error_1"),
+        carbon_T2=_value(qdevice_cfg, "carbon_T2"),
+        t_cycle=t_cycle,
+        prob_success=prob_success,
+    )
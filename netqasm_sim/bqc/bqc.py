@@ -2,21 +2,28 @@ from __future__ import annotations
 
 import math
 from dataclasses import dataclass
-from typing import Any, Dict, Generator, List, Tuple
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 
 import netsquid as ns
+import numpy as np
 from netqasm.lang.ir import BreakpointAction, BreakpointRole
 from netsquid.qubits import ketstates, operators, qubitapi
 from netsquid.qubits.qubit import Qubit
 from pydynaa import EventExpression
 from squidasm.run.stack.config import (LinkConfig, StackConfig,
                                        StackNetworkConfig)
-from squidasm.run.stack.run import run
 from squidasm.sim.stack.common import LogManager
 from squidasm.sim.stack.csocket import ClassicalSocket
 from squidasm.sim.stack.globals import GlobalSimData
 from squidasm.sim.stack.program import Program, ProgramContext, ProgramMeta
 
+import instrument
+from bqc.states import expected_rsp_state, expected_state
+from fidelity import as_density_matrix, squared_fidelities
+from formalism import DEFAULT_FORMALISM, check_formalism, set_formalism
+from results import OUTCOME, STATE, TIME, IterationResults
+from session import run_programs
+
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 
@@ -35,6 +42,10 @@ class ClientProgram(Program):
         r1: int,
         r2: int,
         compile_version: str,
+        results: Optional[IterationResults] = None,
+        schedule: Optional[Sequence[Tuple[float, float, int]]] = None,
+        dump_state: bool = True,
+        dump_output: bool = False,
     ):
         self._alpha = alpha
         self._beta = beta
@@ -45,6 +56,25 @@ class ClientProgram(Program):
         self._r1 = r1
         self._r2 = r2
         self._compile_version = compile_version
+        # If given, the results of every iteration are written to `results`
+        # instead of being returned.
+        self._results = results
+        # If given, iteration i uses schedule[i] = (theta1, theta2, dummy)
+        # instead of (theta1, theta2, dummy).
+        self._schedule = schedule
+        # Whether to insert the client side of the breakpoint at which the
+        # server dumps the EPR states. Must match the server. The client
+        # counts the dumps.
+        self._dump_state = dump_state
+        # The same for the breakpoint at which the server dumps the output
+        # state of a computation round.
+        self._dump_output = dump_output
+        self._iteration = 0
+
+    def _input(self) -> Tuple[float, float, int]:
+        if self._schedule is None:
+            return self._theta1, self._theta2, self._dummy
+        return self._schedule[self._iteration]
 
     @property
     def meta(self) -> ProgramMeta:
@@ -73,65 +103,90 @@ class ClientProgram(Program):
         epr_socket = context.epr_sockets[self.PEER]
         csocket: ClassicalSocket = context.csockets[self.PEER]
 
+        theta1, theta2, dummy = self._input()
         start_time = ns.sim_time()
 
         epr1 = epr_socket.create()[0]
+        instrument.count("epr_pairs")
 
         # RSP
-        if self._trap and self._dummy == 2:
+        if self._trap and dummy == 2:
             # remotely-prepare a dummy state
             p2 = epr1.measure(store_array=False)
         else:
-            epr1.rot_Z(angle=self._theta2)
+            epr1.rot_Z(angle=theta2)
             epr1.H()
             p2 = epr1.measure(store_array=False)
 
         # Create EPR pair
         epr2 = epr_socket.create()[0]
+        instrument.count("epr_pairs")
 
         # RSP
-        if self._trap and self._dummy == 1:
+        if self._trap and dummy == 1:
             # remotely-prepare a dummy state
             p1 = epr2.measure(store_array=False)
         else:
-            epr2.rot_Z(angle=self._theta1)
+            epr2.rot_Z(angle=theta1)
             epr2.H()
             p1 = epr2.measure(store_array=False)
-        conn.insert_breakpoint(
-            BreakpointAction.DUMP_GLOBAL_STATE, role=BreakpointRole.RECEIVE
-        )
+        if self._dump_state:
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, role=BreakpointRole.RECEIVE
+            )
+            instrument.count("state_dumps")
 
+        instrument.count("flushes")
         yield from conn.flush()
 
         p1 = int(p1)
         p2 = int(p2)
 
-        if self._trap and self._dummy == 2:
-            delta1 = -self._theta1 + (p1 + self._r1) * math.pi
+        if self._trap and dummy == 2:
+            delta1 = -theta1 + (p1 + self._r1) * math.pi
         else:
-            delta1 = self._alpha - self._theta1 + (p1 + self._r1) * math.pi
+            delta1 = self._alpha - theta1 + (p1 + self._r1) * math.pi
         csocket.send_float(delta1)
+        instrument.count("classical_messages")
 
         m1 = yield from csocket.recv_int()
-        if self._trap and self._dummy == 1:
-            delta2 = -self._theta2 + (p2 + self._r2) * math.pi
+        if self._trap and dummy == 1:
+            delta2 = -theta2 + (p2 + self._r2) * math.pi
         else:
             delta2 = (
                 math.pow(-1, (m1 + self._r1)) * self._beta
-                - self._theta2
+                - theta2
                 + (p2 + self._r2) * math.pi
             )
         csocket.send_float(delta2)
+        instrument.count("classical_messages")
 
+        if self._dump_output:
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, role=BreakpointRole.RECEIVE
+            )
+            instrument.count("state_dumps")
+        instrument.count("flushes")
         yield from conn.flush()
 
         end_time = ns.sim_time()
+        iteration = self._iteration
+        self._iteration += 1
+        if self._results is not None:
+            self._results.record(
+                iteration,
+                p1=p1,
+                p2=p2,
+                client_start=start_time,
+                client_end=end_time,
+            )
+            return {}
         return {
             "p1": p1,
             "p2": p2,
-            "theta1": self._theta1,
-            "theta2": self._theta2,
-            "dummy": self._dummy,
+            "theta1": theta1,
+            "theta2": theta2,
+            "dummy": dummy,
             "start_time": start_time,
             "end_time": end_time,
         }
@@ -148,8 +203,25 @@ class ClientProgram(Program):
 class ServerProgram(Program):
     PEER = "client"
 
-    def __init__(self, compile_version: str):
+    def __init__(
+        self,
+        compile_version: str,
+        results: Optional[IterationResults] = None,
+        dump_state: bool = True,
+        dump_output: bool = False,
+    ):
         self._compile_version = compile_version
+        self._results = results
+        # Whether to dump the global state to return the states of the EPR
+        # qubits. Without, no breakpoint is inserted.
+        self._dump_state = dump_state
+        # Whether to dump the global state before the output qubit (epr1) is
+        # measured, to return its state as "state" (computation rounds). Only
+        # the last breakpoint's state can be read, so not with dump_state.
+        if dump_state and dump_output:
+            raise ValueError("dump_state and dump_output are exclusive")
+        self._dump_output = dump_output
+        self._iteration = 0
 
     @property
     def meta(self) -> ProgramMeta:
@@ -174,9 +246,11 @@ class ServerProgram(Program):
         epr2 = epr_socket.recv()[0]
         # for _ in range(10):
         #     epr1.cnot(epr2)
-        conn.insert_breakpoint(BreakpointAction.DUMP_GLOBAL_STATE)
+        if self._dump_state:
+            conn.insert_breakpoint(BreakpointAction.DUMP_GLOBAL_STATE)
         epr2.cphase(epr1)
 
+        instrument.count("flushes")
         yield from conn.flush()
 
         delta1 = yield from csocket.recv_float()
@@ -184,36 +258,66 @@ class ServerProgram(Program):
         epr2.rot_Z(angle=delta1)
         epr2.H()
         m1 = epr2.measure(store_array=False)
+        instrument.count("flushes")
         yield from conn.flush()
 
         m1 = int(m1)
 
         csocket.send_int(m1)
+        instrument.count("classical_messages")
 
         delta2 = yield from csocket.recv_float()
 
         epr1.rot_Z(angle=delta2)
         epr1.H()
+        if self._dump_output:
+            conn.insert_breakpoint(BreakpointAction.DUMP_GLOBAL_STATE)
 
         m2 = epr1.measure(store_array=False)
+        instrument.count("flushes")
         yield from conn.flush()
 
-        # m2 = int(m2)
+        m2 = int(m2)
         # return {"m1": m1, "m2": m2}
-        all_states = GlobalSimData.get_last_breakpoint_state()
-        epr_states = all_states["server"]
-        epr1 = epr_states[0]  # created second, still in qubit 0
-        epr2 = epr_states[1]  # created first, moved to qubit 1
+        epr1 = epr2 = None
+        if self._dump_state:
+            with instrument.phase("dump"):
+                all_states = GlobalSimData.get_last_breakpoint_state()
+            epr_states = all_states["server"]
+            epr1 = epr_states[0]  # created second, still in qubit 0
+            epr2 = epr_states[1]  # created first, moved to qubit 1
         # print(f"epr1:\n{epr1}")
         # print(f"epr2:\n{epr2}")
-        # state = all_states["server"][1]
+        state = None
+        if self._dump_output:
+            with instrument.phase("dump"):
+                output_states = GlobalSimData.get_last_breakpoint_state()["server"]
+            state = output_states[0]  # epr1, the output qubit
 
         end_time = ns.sim_time()
+        if self._results is not None:
+            self._results.record(
+                self._iteration,
+                m1=m1,
+                m2=m2,
+                server_start=start_time,
+                server_end=end_time,
+            )
+            with instrument.phase("dump"):
+                if epr1 is not None:
+                    epr1 = as_density_matrix(epr1)
+                    self._results.record(self._iteration, epr1=epr1)
+                if epr2 is not None:
+                    epr2 = as_density_matrix(epr2)
+                    self._results.record(self._iteration, epr2=epr2)
+            self._iteration += 1
+            return {}
         return {
             "m1": m1,
             "m2": m2,
             "epr1": epr1,
             "epr2": epr2,
+            "state": state,
             "start_time": start_time,
             "end_time": end_time,
         }
@@ -236,77 +340,6 @@ class BqcResult:
     m1: int
 
 
-def expected_rsp_state(theta: float, p: int, dummy: bool):
-    expected = qubitapi.create_qubits(1)[0]
-
-    if dummy:
-        if p == 0:
-            qubitapi.assign_qstate(expected, ketstates.s0)
-        elif p == 1:
-            qubitapi.assign_qstate(expected, ketstates.s1)
-    else:
-        if (theta, p) == (0, 0):
-            qubitapi.assign_qstate(expected, ketstates.h0)
-        elif (theta, p) == (0, 1):
-            qubitapi.assign_qstate(expected, ketstates.h1)
-        if (theta, p) == (PI_OVER_2, 0):
-            qubitapi.assign_qstate(expected, ketstates.y0)
-        elif (theta, p) == (PI_OVER_2, 1):
-            qubitapi.assign_qstate(expected, ketstates.y1)
-        if (theta, p) == (PI, 0):
-            qubitapi.assign_qstate(expected, ketstates.h1)
-        elif (theta, p) == (PI, 1):
-            qubitapi.assign_qstate(expected, ketstates.h0)
-        if (theta, p) == (-PI_OVER_2, 0):
-            qubitapi.assign_qstate(expected, ketstates.y1)
-        elif (theta, p) == (-PI_OVER_2, 1):
-            qubitapi.assign_qstate(expected, ketstates.y0)
-        
-    return expected
-
-
-def expected_state(alpha: float, beta: float):
-    expected = qubitapi.create_qubits(1)[0]
-
-    if (alpha, beta) == (0, 0):
-        qubitapi.assign_qstate(expected, ketstates.h0)
-    elif (alpha, beta) == (0, PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.h0)
-    elif (alpha, beta) == (0, PI):
-        qubitapi.assign_qstate(expected, ketstates.h0)
-    elif (alpha, beta) == (0, -PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.h0)
-
-    elif (alpha, beta) == (PI_OVER_2, 0):
-        qubitapi.assign_qstate(expected, ketstates.y0)
-    elif (alpha, beta) == (PI_OVER_2, PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.s0)
-    elif (alpha, beta) == (PI_OVER_2, PI):
-        qubitapi.assign_qstate(expected, ketstates.y1)
-    elif (alpha, beta) == (PI_OVER_2, -PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.s1)
-
-    elif (alpha, beta) == (PI, 0):
-        qubitapi.assign_qstate(expected, ketstates.h1)
-    elif (alpha, beta) == (PI, PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.h1)
-    elif (alpha, beta) == (PI, PI):
-        qubitapi.assign_qstate(expected, ketstates.h1)
-    elif (alpha, beta) == (PI, -PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.h1)
-
-    elif (alpha, beta) == (-PI_OVER_2, 0):
-        qubitapi.assign_qstate(expected, ketstates.y1)
-    elif (alpha, beta) == (-PI_OVER_2, PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.s1)
-    elif (alpha, beta) == (-PI_OVER_2, PI):
-        qubitapi.assign_qstate(expected, ketstates.y0)
-    elif (alpha, beta) == (-PI_OVER_2, -PI_OVER_2):
-        qubitapi.assign_qstate(expected, ketstates.s0)
-
-    return expected
-
-
 def computation_round(
     cfg: StackNetworkConfig,
     num_times: int = 1,
@@ -318,8 +351,14 @@ def computation_round(
     r2: int = 0,
     log_level: str = "WARNING",
     compile_version: str = "None",
-) -> BqcResult:
+    reuse_network: bool = True,
+    dump_state: bool = True,
+) -> Tuple[List[float], List[float]]:
+    """Fidelities of the dumped output states with the expected ones and
+    durations of the rounds. Without `dump_state`, the fidelities are NaN."""
     LogManager.set_log_level(log_level)
+    # The output state is dumped, so this needs density matrices.
+    set_formalism("dm")
 
     client_program = ClientProgram(
         alpha=alpha,
@@ -331,11 +370,18 @@ def computation_round(
         r1=r1,
         r2=r2,
         compile_version=compile_version,
+        dump_state=False,
+        dump_output=dump_state,
+    )
+    server_program = ServerProgram(
+        compile_version=compile_version, dump_state=False, dump_output=dump_state
     )
-    server_program = ServerProgram(compile_version=compile_version)
 
-    client_results, server_results = run(
-        cfg, {"client": client_program, "server": server_program}, num_times=num_times
+    client_results, server_results = run_programs(
+        cfg,
+        {"client": client_program, "server": server_program},
+        num_times=num_times,
+        reuse_network=reuse_network,
     )
 
     durations = []
@@ -344,32 +390,65 @@ def computation_round(
         end_time = max(c_result["end_time"], s_result["end_time"])
         durations.append(end_time - start_time)
 
-    expected = expected_state(alpha, beta)
-    expected_rot_z = expected_state(alpha, beta)
-    qubitapi.operate(expected_rot_z, qubitapi.ops.Z)
+    if not dump_state:
+        return [math.nan] * len(durations), durations
 
-    # print(f"expected: {qubitapi.reduced_dm(expected)}")
-
-    fidelities = [
-        qubitapi.fidelity(
-            expected if r["m1"] == 0 else expected_rot_z, r["state"], squared=True
-        )
-        for r in server_results
-    ]
-    print(f"fidelities: {fidelities}")
+    references = np.stack(
+        [expected_state(alpha, beta, r["m1"]) for r in server_results]
+    )
+    fidelities = squared_fidelities(
+        references, [r["state"] for r in server_results]
+    ).tolist()
     return fidelities, durations
 
 
-def trap_round(
+# Per-iteration results of the client and server programs of a trap round.
+TRAP_ROUND_FIELDS = {
+    "p1": OUTCOME,
+    "p2": OUTCOME,
+    "m1": OUTCOME,
+    "m2": OUTCOME,
+    "epr1": STATE,
+    "epr2": STATE,
+    "client_start": TIME,
+    "client_end": TIME,
+    "server_start": TIME,
+    "server_end": TIME,
+}
+
+
+def trap_round_samples_multi(
     cfg: StackNetworkConfig,
     num_times: int = 1,
+    inputs: Sequence[Tuple[float, float, int]] = ((0.0, 0.0, 1),),
     alpha: float = 0.0,
     beta: float = 0.0,
-    theta1: float = 0.0,
-    theta2: float = 0.0,
-    dummy: int = 1,
     compile_version: str = "None",
-) -> Tuple[float, List[float], List[float], List[float]]:
+    reuse_network: bool = True,
+    formalism: str = DEFAULT_FORMALISM,
+    dump_state: bool = True,
+) -> Dict[str, List]:
+    """Trap rounds for each (theta1, theta2, dummy) of `inputs`, `num_times`
+    times each, all in a single simulation run of `len(inputs) * num_times`
+    iterations. The samples of each iteration are tagged with the index of its
+    input in `inputs`.
+
+    With `dump_state`, the global state is dumped to compute the EPR
+    fidelities; without, they are NaN. The error rate only depends on
+    measurement outcomes, so without dumps the rounds can run in the cheaper
+    "ket" or "stab" `formalism`, in which no states are dumped. A ValueError is raised if
+    `cfg` or the inputs do not fit the formalism (see `check_formalism`)."""
+    angles = [alpha, beta]
+    for theta1, theta2, _ in inputs:
+        angles += [theta1, theta2]
+    check_formalism(formalism, cfg, angles)
+    set_formalism(formalism)
+    if formalism != "dm":
+        dump_state = False
+    indices = np.repeat(np.arange(len(inputs)), num_times)
+    schedule = [tuple(inputs[i]) for i in indices]
+    results = IterationResults(len(schedule), TRAP_ROUND_FIELDS)
+    theta1, theta2, dummy = inputs[0]
     client_program = ClientProgram(
         alpha=alpha,
         beta=beta,
@@ -380,58 +459,130 @@ def trap_round(
         r1=0,
         r2=0,
         compile_version=compile_version,
+        results=results,
+        schedule=schedule,
+        dump_state=dump_state,
+    )
+    server_program = ServerProgram(
+        compile_version=compile_version, results=results, dump_state=dump_state
+    )
+
+    run_programs(
+        cfg,
+        {"client": client_program, "server": server_program},
+        num_times=len(schedule),
+        reuse_network=reuse_network,
     )
-    server_program = ServerProgram(compile_version=compile_version)
 
-    client_results, server_results = run(
-        cfg, {"client": client_program, "server": server_program}, num_times=num_times
+    p1s = results["p1"]
+    p2s = results["p2"]
+    m1s = results["m1"]
+    m2s = results["m2"]
+
+    for _, _, dummy in inputs:
+        assert dummy in [1, 2]
+    # The reference states only depend on the input and the outcome p.
+    references1 = np.stack(
+        [
+            [expected_rsp_state(theta1, p, dummy == 1) for p in (0, 1)]
+            for theta1, _, dummy in inputs
+        ]
+    )
+    references2 = np.stack(
+        [
+            [expected_rsp_state(theta2, p, dummy == 2) for p in (0, 1)]
+            for _, theta2, dummy in inputs
+        ]
+    )
+    fid1s = np.full(len(schedule), np.nan)
+    fid2s = np.full(len(schedule), np.nan)
+    with instrument.phase("fidelity"):
+        if dump_state:
+            fid1s = squared_fidelities(references1[indices, p1s], results["epr1"])
+            fid2s = squared_fidelities(references2[indices, p2s], results["epr2"])
+
+    dummies = np.array([dummy for _, _, dummy in inputs])[indices]
+    fails = np.where(dummies == 1, p1s != m2s, p2s != m1s).astype(int)
+
+    durations = results.durations(
+        ("client_start", "server_start"), ("client_end", "server_end")
     )
 
-    p1s = [result["p1"] for result in client_results]
-    p2s = [result["p2"] for result in client_results]
-    theta1s = [result["theta1"] for result in client_results]
-    theta2s = [result["theta2"] for result in client_results]
-    dummies = [result["dummy"] for result in client_results]
-    m1s = [result["m1"] for result in server_results]
-    m2s = [result["m2"] for result in server_results]
-    epr1s = [result["epr1"] for result in server_results]
-    epr2s = [result["epr2"] for result in server_results]
-
-    # print(f"p1s: {p1s}")
-    # print(f"p2s: {p2s}")
-    # print(f"theta1s: {theta1s}")
-    # print(f"theta2s: {theta2s}")
-    # print(f"dummies: {dummies}")
-    # print(f"epr1s: {epr1s}")
-    # print(f"epr2s: {epr2s}")
-
-    fid1s = [
-        qubitapi.fidelity(expected_rsp_state(theta, p, dummy == 1), epr, squared=True)
-        for epr, theta, p, dummy in zip(epr1s, theta1s, p1s, dummies)
-    ]
-    fid2s = [
-        qubitapi.fidelity(expected_rsp_state(theta, p, dummy == 2), epr, squared=True)
-        for epr, theta, p, dummy in zip(epr2s, theta2s, p2s, dummies)
-    ]
-
-    assert dummy in [1, 2]
-    if dummy == 1:
-        num_fails = len([(p, m) for (p, m) in zip(p1s, m2s) if p != m])
-    else:
-        num_fails = len([(p, m) for (p, m) in zip(p2s, m1s) if p != m])
-
-    frac_fail = round(num_fails / num_times, 3)
+    return {
+        "p1s": p1s.tolist(),
+        "p2s": p2s.tolist(),
+        "m1s": m1s.tolist(),
+        "m2s": m2s.tolist(),
+        "fails": fails.tolist(),
+        "durations": durations.tolist(),
+        "fid1s": fid1s.tolist(),
+        "fid2s": fid2s.tolist(),
+        "inputs": indices.tolist(),
+    }
+
+
+def trap_round_samples(
+    cfg: StackNetworkConfig,
+    num_times: int = 1,
+    alpha: float = 0.0,
+    beta: float = 0.0,
+    theta1: float = 0.0,
+    theta2: float = 0.0,
+    dummy: int = 1,
+    compile_version: str = "None",
+    reuse_network: bool = True,
+    formalism: str = DEFAULT_FORMALISM,
+    dump_state: bool = True,
+) -> Dict[str, List]:
+    samples = trap_round_samples_multi(
+        cfg,
+        num_times,
+        inputs=[(theta1, theta2, dummy)],
+        alpha=alpha,
+        beta=beta,
+        compile_version=compile_version,
+        reuse_network=reuse_network,
+        formalism=formalism,
+        dump_state=dump_state,
+    )
+    del samples["inputs"]
+    return samples
+
+
+def trap_round_result(
+    samples: Dict[str, List]
+) -> Tuple[float, List[float], List[float], List[float]]:
+    fails = samples["fails"]
+    frac_fail = round(sum(fails) / len(fails), 3)
     # print(f"fail rate: {frac_fail}")
+    return frac_fail, samples["durations"], samples["fid1s"], samples["fid2s"]
 
-    durations = []
-    for c_result, s_result in zip(client_results, server_results):
-        start_time = min(c_result["start_time"], s_result["start_time"])
-        end_time = max(c_result["end_time"], s_result["end_time"])
-        durations.append(end_time - start_time)
 
-    last_m1 = m1s[-1]
-    # return BqcResult(dist_0=-1, dist_1=-1, fail_rate=frac_fail, state=None, m1=last_m1)
-    return frac_fail, durations, fid1s, fid2s
+def trap_round(
+    cfg: StackNetworkConfig,
+    num_times: int = 1,
+    alpha: float = 0.0,
+    beta: float = 0.0,
+    theta1: float = 0.0,
+    theta2: float = 0.0,
+    dummy: int = 1,
+    compile_version: str = "None",
+    formalism: str = DEFAULT_FORMALISM,
+    dump_state: bool = True,
+) -> Tuple[float, List[float], List[float], List[float]]:
+    samples = trap_round_samples(
+        cfg,
+        num_times,
+        alpha=alpha,
+        beta=beta,
+        theta1=theta1,
+        theta2=theta2,
+        dummy=dummy,
+        compile_version=compile_version,
+        formalism=formalism,
+        dump_state=dump_state,
+    )
+    return trap_round_result(samples)
 
 
 def test_perfect_config():
@@ -492,6 +643,7 @@ def n_trap_rounds(
     dummy: int = 1,
     log_level: str = "WARNING",
     compile_version: str = "None",
+    formalism: str = DEFAULT_FORMALISM,
 ) -> None:
     LogManager.set_log_level(log_level)
     LogManager.log_to_file("dump.log")
@@ -504,6 +656,7 @@ def n_trap_rounds(
         theta2=theta2,
         dummy=dummy,
         compile_version=compile_version,
+        formalism=formalism,
     )
     print(f"error rate: {error_rate}")
     print(f"fidelities of EPR 1: {fid1s}")
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import math
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+import numpy as np
+
+# Reference states of the BQC rounds, as read-only density matrices. They only
+# need NumPy, so that they can be used without importing NetSquid.
+
+PI_OVER_2 = math.pi / 2
+
+# Single-qubit kets, as in `netsquid.qubits.ketstates`.
+s0 = np.array([1, 0], dtype=complex)
+s1 = np.array([0, 1], dtype=complex)
+h0 = np.array([1, 1], dtype=complex) / math.sqrt(2)
+h1 = np.array([1, -1], dtype=complex) / math.sqrt(2)
+y0 = np.array([1, 1j], dtype=complex) / math.sqrt(2)
+y1 = np.array([1, -1j], dtype=complex) / math.sqrt(2)
+
+# Angles that differ from a multiple of pi/2 by less than this are treated as
+# that multiple, so that e.g. `2 * math.pi / 4` and `PI_OVER_2` match.
+ANGLE_TOLERANCE = 1e-9
+
+_Z = np.array([[1, 0], [0, -1]], dtype=complex)
+
+
+def quarter_turns(angle: float) -> int:
+    """Return k in {0, 1, 2, 3} such that angle = k * pi/2 (mod 2 pi)."""
+    turns = angle / PI_OVER_2
+    k = round(turns)
+    if abs(turns - k) > ANGLE_TOLERANCE:
+        raise ValueError(f"angle {angle} is not a multiple of pi/2")
+    return k % 4
+
+
+def _dm(ket: np.ndarray) -> np.ndarray:
+    ket = np.asarray(ket, dtype=complex).reshape(2)
+    dm = np.outer(ket, ket.conj())
+    dm.setflags(write=False)
+    return dm
+
+
+def _rotate_z(dm: np.ndarray) -> np.ndarray:
+    rotated = _Z @ dm @ _Z
+    rotated.setflags(write=False)
+    return rotated
+
+
+# Reference states of the server qubits after remote state preparation, indexed
+# by (quarter turns of theta, measurement outcome p, dummy).
+_RSP_KETS = {
+    (0, 0): h0,
+    (0, 1): h1,
+    (1, 0): y0,
+    (1, 1): y1,
+    (2, 0): h1,
+    (2, 1): h0,
+    (3, 0): y1,
+    (3, 1): y0,
+}
+RSP_STATES: Mapping[Tuple[int, int, bool], np.ndarray] = MappingProxyType(
+    {
+        **{(k, p, False): _dm(ket) for (k, p), ket in _RSP_KETS.items()},
+        **{(k, 0, True): _dm(s0) for k in range(4)},
+        **{(k, 1, True): _dm(s1) for k in range(4)},
+    }
+)
+
+# Expected output states of a computation round, indexed by (quarter turns of
+# alpha, quarter turns of beta, m1). For m1 = 1 the output is rotated by Z.
+_COMPUTATION_KETS = {
+    0: {0: h0, 1: h0, 2: h0, 3: h0},
+    1: {0: y0, 1: s0, 2: y1, 3: s1},
+    2: {0: h1, 1: h1, 2: h1, 3: h1},
+    3: {0: y1, 1: s1, 2: y0, 3: s0},
+}
+COMPUTATION_STATES: Mapping[Tuple[int, int, int], np.ndarray] = MappingProxyType(
+    {
+        **{
+            (a, b, 0): _dm(ket)
+            for a, kets in _COMPUTATION_KETS.items()
+            for b, ket in kets.items()
+        },
+        **{
+            (a, b, 1): _rotate_z(_dm(ket))
+            for a, kets in _COMPUTATION_KETS.items()
+            for b, ket in kets.items()
+        },
+    }
+)
+
+
+def expected_rsp_state(theta: float, p: int, dummy: bool) -> np.ndarray:
+    return RSP_STATES[(quarter_turns(theta), int(p), bool(dummy))]
+
+
+def expected_state(alpha: float, beta: float, m1: int = 0) -> np.ndarray:
+    return COMPUTATION_STATES[(quarter_turns(alpha), quarter_turns(beta), int(m1))]
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from squidasm.run.stack.config import StackNetworkConfig
+
+
+# Bump this when a change in the simulation code makes cached results invalid.
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "result_cache")
+DEFAULT_MAX_SIZE = 1024 * 2**20  # bytes
+
+# The size of the cache directory is only counted, by listing all entries, when
+# the size this process tracked grows beyond the maximum, and after every
+# `RECOUNT_WRITES` writes to pick up the entries written by other processes.
+RECOUNT_WRITES = 100
+# An eviction removes entries until the cache is at most this fraction of the
+# maximum size, so that the next writes do not trigger another one right away.
+EVICT_TO = 0.9
+
+
+@dataclass
+class _Usage:
+    size: int
+    writes: int = 0
+
+
+# Per cache directory, its size when this process last counted it plus the
+# entries it wrote since. Kept per process rather than per `ResultCache`, since
+# every job sent to a worker carries its own copy of the cache.
+_usage: Dict[str, _Usage] = {}
+
+
+def normalize_config(cfg: StackNetworkConfig) -> str:
+    return json.dumps(json.loads(cfg.json()), sort_keys=True)
+
+
+class ResultCache:
+    """On-disk cache of the per-iteration samples of seeded simulation calls.
+
+    Entries are keyed on a hash of the function, the normalized config, the
+    other (program) parameters, num_times and the seed. When the total size of
+    the cache exceeds `max_size` bytes, the least recently used entries are
+    removed (see `RECOUNT_WRITES`). Writes are atomic, so a cache can be shared by worker processes.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, max_size: int = DEFAULT_MAX_SIZE
+    ) -> None:
+        self._directory = directory if directory is not None else DEFAULT_CACHE_DIR
+        self._max_size = max_size
+
+    def key(
+        self,
+        func: Callable[..., Dict[str, List]],
+        kwargs: Dict[str, Any],
+        num_times: int,
+        seed: int,
+    ) -> str:
+        params = {k: v for k, v in kwargs.items() if k != "cfg"}
+        description = {
+            "cache_version": CACHE_VERSION,
+            "func": f"{func.__module__}.{func.__qualname__}",
+            "config": normalize_config(kwargs["cfg"]),
+            "params": params,
+            "num_times": num_times,
+            "seed": seed,
+        }
+        encoded = json.dumps(description, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, List]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                samples = json.load(f)
+            # Mark as recently used.
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return samples
+
+    def put(self, key: str, samples: Dict[str, List]) -> None:
+        path = self._path(key)
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(samples, f)
+        os.replace(tmp_path, path)
+
+        usage = _usage.get(self._directory)
+        if usage is None or usage.writes >= RECOUNT_WRITES:
+            self._evict()
+            return
+        usage.size += os.path.getsize(path)
+        usage.writes += 1
+        if usage.size > self._max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Count the size of the cache, and if it is larger than `max_size`,
+        remove the least recently used entries."""
+        entries = []
+        for path in Path(self._directory).glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        if total_size > self._max_size:
+            for _, size, path in sorted(entries):
+                if total_size <= EVICT_TO * self._max_size:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+        _usage[self._directory] = _Usage(total_size)
+
+    def call(
+        self,
+        func: Callable[..., Dict[str, List]],
+        kwargs: Dict[str, Any],
+        num_times: int,
+        seed: int,
+        run: Callable[[], Dict[str, List]],
+    ) -> Dict[str, List]:
+        """Return the cached samples of `func` for these arguments, or call
+        `run` to compute them and store the result."""
+        key = self.key(func, kwargs, num_times, seed)
+        samples = self.get(key)
+        if samples is None:
+            samples = run()
+            self.put(key, samples)
+        return samples
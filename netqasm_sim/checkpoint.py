@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+def read_checkpoint_meta(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        header = f.readline()
+    if not header.strip():
+        return None
+    return json.loads(header)["meta"]
+
+
+class Checkpoint:
+    """Append-only record of the finished points of a sweep.
+
+    The first line of the file holds the metadata of the sweep (config,
+    num_times, seed, ...). Every following line holds the key of one finished
+    point and its output entry. When resuming, the metadata must match the
+    current sweep, otherwise the recorded points would not be reproducible.
+    """
+
+    def __init__(self, path: str, meta: Dict[str, Any], resume: bool = False) -> None:
+        self._path = path
+        self._meta = meta
+        self._entries: Dict[str, Any] = {}
+
+        if resume and read_checkpoint_meta(path) is not None:
+            self._load()
+            print(f"resuming from {path} with {len(self._entries)} finished points")
+        else:
+            Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(json.dumps({"meta": meta}) + "\n")
+
+    @staticmethod
+    def _key(key: Tuple) -> str:
+        return json.dumps(list(key))
+
+    def _load(self) -> None:
+        saved_meta = read_checkpoint_meta(self._path)
+        # Compare through JSON so that e.g. tuples and lists are treated alike.
+        if json.loads(json.dumps(self._meta)) != saved_meta:
+            raise ValueError(
+                f"checkpoint {self._path} was written for a different sweep "
+                "(config, num_times or seed differ), cannot resume from it"
+            )
+        with open(self._path, "r") as f:
+            lines = f.readlines()
+        valid_lines = lines[:1]
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The process was killed while writing this line.
+                continue
+            self._entries[self._key(tuple(record["key"]))] = record["entry"]
+            valid_lines.append(line if line.endswith("\n") else line + "\n")
+
+        # Drop partially written lines so that new records start on a new line.
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(valid_lines)
+        os.replace(tmp_path, self._path)
+
+    def __contains__(self, key: Tuple) -> bool:
+        return self._key(key) in self._entries
+
+    def get(self, key: Tuple) -> Any:
+        return self._entries[self._key(key)]
+
+    def record(self, key: Tuple, entry: Any) -> None:
+        self._entries[self._key(key)] = entry
+        with open(self._path, "a") as f:
+            f.write(json.dumps({"key": list(key), "entry": entry}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
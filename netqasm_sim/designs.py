@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Space-filling designs on the unit hypercube [0, 1)^d, used by the sweep engine
+# to sample multi-dimensional parameter spaces with far fewer points than a
+# full grid.
+
+DESIGNS = ["grid", "lhs", "sobol"]
+
+# Number of binary digits of the Sobol points.
+_SOBOL_BITS = 32
+
+# Primitive polynomials and initial direction numbers of dimensions 2 and up
+# (Joe & Kuo, new-joe-kuo-6.21201), as (degree s, coefficients a, m_1..m_s).
+# The first dimension is the van der Corput sequence.
+_SOBOL_PARAMETERS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+    (6, 1, [1, 3, 3, 9, 7, 49]),
+    (6, 13, [1, 1, 1, 15, 21, 21]),
+    (6, 16, [1, 3, 1, 13, 27, 49]),
+]
+
+SOBOL_MAX_DIMENSIONS = len(_SOBOL_PARAMETERS) + 1
+
+
+def latin_hypercube(
+    num_samples: int, dimensions: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Latin hypercube sample: every dimension is split into `num_samples`
+    equal strata and every stratum holds exactly one point."""
+    strata = np.stack([rng.permutation(num_samples) for _ in range(dimensions)], 1)
+    return (strata + rng.random((num_samples, dimensions))) / num_samples
+
+
+def _direction_numbers(dimension: int) -> np.ndarray:
+    # The direction numbers v_k = m_k / 2^k of one dimension, as integers
+    # scaled by 2^_SOBOL_BITS.
+    if dimension == 0:
+        m = [1] * _SOBOL_BITS
+    else:
+        s, a, m = _SOBOL_PARAMETERS[dimension - 1]
+        m = list(m)
+        for k in range(s, _SOBOL_BITS):
+            new = m[k - s] ^ (m[k - s] << s)
+            for j in range(1, s):
+                if (a >> (s - 1 - j)) & 1:
+                    new ^= m[k - j] << j
+            m.append(new)
+    return np.array(
+        [m[k] << (_SOBOL_BITS - 1 - k) for k in range(_SOBOL_BITS)], dtype=np.uint64
+    )
+
+
+def _scramble(directions: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Linear matrix scrambling: multiply the digits of every direction number
+    # (most significant first) by a random lower-triangular binary matrix with
+    # unit diagonal.
+    shifts = np.arange(_SOBOL_BITS - 1, -1, -1, dtype=np.uint64)
+    digits = (directions[:, None] >> shifts[None, :]) & np.uint64(1)
+    matrix = np.tril(rng.integers(0, 2, (_SOBOL_BITS, _SOBOL_BITS)), -1)
+    matrix += np.eye(_SOBOL_BITS, dtype=matrix.dtype)
+    scrambled = (digits.astype(np.int64) @ matrix.T) % 2
+    return (scrambled.astype(np.uint64) << shifts[None, :]).sum(1, dtype=np.uint64)
+
+
+def sobol(
+    num_samples: int,
+    dimensions: int,
+    rng: Optional[np.random.Generator] = None,
+    scramble: bool = True,
+) -> np.ndarray:
+    """The first `num_samples` points of a Sobol sequence. With `scramble`, the
+    digits are scrambled with a random linear matrix and shifted, which keeps
+    the net structure but removes the bias of the points towards 0. The
+    balance properties only hold for powers of 2 samples."""
+    if dimensions > SOBOL_MAX_DIMENSIONS:
+        raise ValueError(
+            f"Sobol points are only available in up to {SOBOL_MAX_DIMENSIONS} "
+            f"dimensions, not {dimensions}"
+        )
+    if scramble and rng is None:
+        raise ValueError("scrambled Sobol points need a random generator")
+
+    indices = np.arange(num_samples, dtype=np.uint64)
+    points = np.zeros((num_samples, dimensions), dtype=np.uint64)
+    for d in range(dimensions):
+        directions = _direction_numbers(d)
+        if scramble:
+            directions = _scramble(directions, rng)
+        for k in range(_SOBOL_BITS):
+            bit = (indices >> np.uint64(k)) & np.uint64(1)
+            points[:, d] ^= bit * directions[k]
+        if scramble:
+            points[:, d] ^= rng.integers(0, 2**_SOBOL_BITS, dtype=np.uint64)
+    return points.astype(np.float64) / 2**_SOBOL_BITS
+
+
+def unit_points(
+    design: str, num_samples: int, dimensions: int, seed: int
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if design == "lhs":
+        return latin_hypercube(num_samples, dimensions, rng)
+    if design == "sobol":
+        return sobol(num_samples, dimensions, rng)
+    raise ValueError(f"unknown design {design}, choose from {DESIGNS}")
+
+
+def scale_points(
+    unit: np.ndarray, bounds: Sequence[Sequence[float]], log: Sequence[bool]
+) -> List[tuple]:
+    """Map points in the unit hypercube to the given `(low, high)` bounds, on a
+    logarithmic scale for the dimensions with `log` set."""
+    columns = []
+    for d, ((low, high), is_log) in enumerate(zip(bounds, log)):
+        if is_log:
+            column = np.exp(np.log(low) + unit[:, d] * (np.log(high) - np.log(low)))
+        else:
+            column = low + unit[:, d] * (high - low)
+        columns.append(column)
+    return [tuple(float(v) for v in row) for row in zip(*columns)]
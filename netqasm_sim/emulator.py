@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sweepdata import SweepData, load_sweep_data
+
+# Gaussian-process emulator of a sweep output (e.g. the fidelity or the error
+# rate of one compile version) as a function of the sweep coordinates. It is
+# trained on stored sweep data, with the standard errors of the simulated
+# points as (heteroscedastic) noise, and answers queries with a mean and a
+# standard deviation without simulating.
+
+# Multipliers tried for every hyperparameter in each round of the coordinate
+# search over the log marginal likelihood.
+_SEARCH_STEPS = [0.25, 0.5, 0.8, 1.25, 2.0, 4.0]
+_SEARCH_ROUNDS = 4
+
+# Prior variance of a constant offset (of the normalized outputs), so that the
+# uncertainty of the mean level is part of the predicted uncertainty.
+_BIAS_VAR = 1.0
+
+# Minimum noise variance (of the normalized outputs), for numerical stability
+# and for the rounding of the stored means.
+_JITTER = 1e-8
+
+
+def std_err_field(field: str, columns: Dict[str, np.ndarray]) -> Optional[str]:
+    """Name of the standard error of `field` in the sweep data, which differs
+    between the sweeps (e.g. "std_err" or "fid_std_err" for the fidelity)."""
+    candidates = [f"{field}_std_err"]
+    if field == "fidelity":
+        candidates += ["fid_std_err", "std_err"]
+    elif field == "duration":
+        candidates += ["dur_std_err"]
+    elif field == "error_rate":
+        candidates += ["std_err"]
+    for name in candidates:
+        if name in columns:
+            return name
+    return None
+
+
+def training_data(
+    data: SweepData, group: str, field: str
+) -> Tuple[List[str], List[bool], np.ndarray, np.ndarray, np.ndarray]:
+    """Parameter names, log-scale flags, coordinates `(N, D)`, values `(N,)`
+    and standard errors `(N,)` of `field` for one compile version."""
+    columns = data[group]
+    if field not in columns:
+        raise ValueError(f"no field {field} in the {group} data")
+    spec = data.meta.get("spec")
+    if "point" in columns:
+        x = np.asarray(columns["point"], dtype=float).reshape(len(columns[field]), -1)
+        parameters = spec["parameters"] if spec is not None else []
+        names = [str(p["path"]) for p in parameters]
+        log = [bool(p.get("log", False)) for p in parameters]
+        if len(names) != x.shape[1]:
+            names = [f"x{d}" for d in range(x.shape[1])]
+            log = [False] * x.shape[1]
+    else:
+        x = np.asarray(columns["sweep_value"], dtype=float)[:, None]
+        names, log = ["sweep_value"], [False]
+
+    y = np.asarray(columns[field], dtype=float)
+    std_err_name = std_err_field(field, columns)
+    if std_err_name is None:
+        std_err = np.zeros_like(y)
+    else:
+        std_err = np.nan_to_num(np.asarray(columns[std_err_name], dtype=float))
+    return names, log, x, y, std_err
+
+
+class Emulator:
+    """Gaussian process with a squared-exponential kernel with one length
+    scale per coordinate (plus a constant offset), on coordinates scaled to
+    the unit box of the training data (log-scaled for log parameters)."""
+
+    def __init__(
+        self,
+        names: List[str],
+        log: List[bool],
+        x: np.ndarray,
+        y: np.ndarray,
+        std_err: np.ndarray,
+    ) -> None:
+        self.names = names
+        self.log = np.asarray(log, dtype=bool)
+        self._x_raw = np.asarray(x, dtype=float)
+        self._y_raw = np.asarray(y, dtype=float)
+        self._std_err_raw = np.asarray(std_err, dtype=float)
+
+        tx = self._transform(self._x_raw)
+        self._x_low = tx.min(0)
+        self._x_span = np.where(tx.max(0) > self._x_low, tx.max(0) - self._x_low, 1.0)
+        self._y_mean = float(self._y_raw.mean())
+        y_std = float(self._y_raw.std())
+        self._y_std = y_std if y_std > 0 else 1.0
+
+        self._x = self._scale(self._x_raw)
+        self._y = (self._y_raw - self._y_mean) / self._y_std
+        self._noise = (self._std_err_raw / self._y_std) ** 2 + _JITTER
+
+        self.length_scales = np.full(self._x.shape[1], 0.3)
+        self.signal_var = 1.0
+        self.extra_noise = 1e-4
+
+    @property
+    def size(self) -> int:
+        return len(self._y)
+
+    @property
+    def std_err(self) -> np.ndarray:
+        """Standard errors of the training outputs."""
+        return self._std_err_raw
+
+    def _transform(self, x: np.ndarray) -> np.ndarray:
+        x = np.array(x, dtype=float)
+        x[:, self.log] = np.log(x[:, self.log])
+        return x
+
+    def _scale(self, x: np.ndarray) -> np.ndarray:
+        return (self._transform(x) - self._x_low) / self._x_span
+
+    def _kernel(self, a: np.ndarray, b: np.ndarray, length_scales, signal_var):
+        diff = (a[:, None, :] - b[None, :, :]) / length_scales
+        squared = np.einsum("ijk,ijk->ij", diff, diff)
+        return signal_var * np.exp(-0.5 * squared) + _BIAS_VAR
+
+    def _log_likelihood(self, length_scales, signal_var, extra_noise) -> float:
+        k = self._kernel(self._x, self._x, length_scales, signal_var)
+        k[np.diag_indices_from(k)] += self._noise + extra_noise
+        try:
+            chol = np.linalg.cholesky(k)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, self._y))
+        return float(-0.5 * self._y @ alpha - np.log(np.diag(chol)).sum())
+
+    def fit(self) -> Emulator:
+        """Choose the hyperparameters by maximizing the log marginal likelihood
+        with a coordinate search in log space, then precompute the weights
+        used for predictions."""
+        params = list(self.length_scales) + [self.signal_var, self.extra_noise]
+        best = self._log_likelihood(
+            self.length_scales, self.signal_var, self.extra_noise
+        )
+        for _ in range(_SEARCH_ROUNDS):
+            for i in range(len(params)):
+                for step in _SEARCH_STEPS:
+                    trial = list(params)
+                    trial[i] *= step
+                    value = self._log_likelihood(
+                        np.array(trial[:-2]), trial[-2], trial[-1]
+                    )
+                    if value > best:
+                        best, params = value, trial
+        self.length_scales = np.array(params[:-2])
+        self.signal_var, self.extra_noise = params[-2], params[-1]
+        self._precompute()
+        return self
+
+    def _precompute(self) -> None:
+        k = self._kernel(self._x, self._x, self.length_scales, self.signal_var)
+        k[np.diag_indices_from(k)] += self._noise + self.extra_noise
+        k_inv = np.linalg.inv(k)
+        self._alpha = k_inv @ self._y
+        self._k_inv = k_inv
+
+    def predict(self, x: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean and standard deviation of the emulated output at the points
+        `x` of shape `(M, D)`."""
+        x = self._scale(np.atleast_2d(np.asarray(x, dtype=float)))
+        k = self._kernel(x, self._x, self.length_scales, self.signal_var)
+        mean = self._y_mean + self._y_std * (k @ self._alpha)
+        var = self.signal_var + _BIAS_VAR - np.einsum("ij,jk,ik->i", k, self._k_inv, k)
+        return mean, self._y_std * np.sqrt(np.clip(var, 0, None))
+
+    def nearest_distance(self, x: Sequence[Sequence[float]]) -> np.ndarray:
+        """Distance of every point to the nearest training point, in the unit
+        box of the training data."""
+        x = self._scale(np.atleast_2d(np.asarray(x, dtype=float)))
+        diff = x[:, None, :] - self._x[None, :, :]
+        return np.sqrt(np.einsum("ijk,ijk->ij", diff, diff).min(1))
+
+    def curvature(self, x: Sequence[Sequence[float]], step: float = 0.02) -> np.ndarray:
+        """Sum over all coordinates of the absolute second derivative of the
+        emulated mean, in the unit box of the training data, from central
+        differences with the given `step`."""
+        x = self._scale(np.atleast_2d(np.asarray(x, dtype=float)))
+        center = self._mean_scaled(x)
+        total = np.zeros(len(x))
+        for d in range(x.shape[1]):
+            offset = np.zeros(x.shape[1])
+            offset[d] = step
+            second = (
+                self._mean_scaled(x + offset)
+                - 2 * center
+                + self._mean_scaled(x - offset)
+            )
+            total += np.abs(second) / step**2
+        return total
+
+    def _mean_scaled(self, x: np.ndarray) -> np.ndarray:
+        k = self._kernel(x, self._x, self.length_scales, self.signal_var)
+        return self._y_mean + self._y_std * (k @ self._alpha)
+
+    def with_points(
+        self, x: Sequence[Sequence[float]], y: Sequence[float], std_err: Sequence[float]
+    ) -> Emulator:
+        """A copy conditioned on extra (e.g. planned) points, with the same
+        hyperparameters and scaling."""
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        y = np.asarray(y, dtype=float)
+        std_err = np.asarray(std_err, dtype=float)
+        other = copy.copy(self)
+        other._x_raw = np.vstack([self._x_raw, x])
+        other._y_raw = np.concatenate([self._y_raw, y])
+        other._std_err_raw = np.concatenate([self._std_err_raw, std_err])
+        other._x = np.vstack([self._x, self._scale(x)])
+        other._y = np.concatenate([self._y, (y - self._y_mean) / self._y_std])
+        other._noise = np.concatenate(
+            [self._noise, (std_err / self._y_std) ** 2 + _JITTER]
+        )
+        other._precompute()
+        return other
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for array in [self._x_raw, self._y_raw, self._std_err_raw]:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            names=np.array(self.names),
+            log=self.log,
+            x=self._x_raw,
+            y=self._y_raw,
+            std_err=self._std_err_raw,
+            length_scales=self.length_scales,
+            signal_var=self.signal_var,
+            extra_noise=self.extra_noise,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> Emulator:
+        with np.load(path) as f:
+            emulator = cls(
+                [str(name) for name in f["names"]],
+                list(f["log"]),
+                f["x"],
+                f["y"],
+                f["std_err"],
+            )
+            emulator.length_scales = f["length_scales"]
+            emulator.signal_var = float(f["signal_var"])
+            emulator.extra_noise = float(f["extra_noise"])
+        emulator._precompute()
+        return emulator
+
+
+def fit_emulator(
+    data: SweepData, group: str, field: str, model_file: Optional[str] = None
+) -> Emulator:
+    """Fit an emulator of `field` of one compile version. With `model_file`, a
+    model that was fitted on the same data is loaded from that file instead,
+    and a newly fitted model is saved to it."""
+    emulator = Emulator(*training_data(data, group, field))
+    if model_file is not None and os.path.exists(model_file):
+        saved = Emulator.load(model_file)
+        if saved.fingerprint() == emulator.fingerprint():
+            return saved
+    emulator.fit()
+    if model_file is not None:
+        emulator.save(model_file)
+    return emulator
+
+
+def predict(
+    data_file: str,
+    field: str,
+    compile_versions: List[str],
+    points: List[List[float]],
+    max_std: float,
+    model_dir: Optional[str] = None,
+) -> List[Tuple[str, List[float]]]:
+    """Print the emulated `field` at `points` for every compile version and
+    return the (compile version, point) pairs whose standard deviation is
+    above `max_std`, which should be simulated instead."""
+    data = load_sweep_data(data_file)
+    flagged = []
+    for version in compile_versions:
+        model_file = None
+        if model_dir is not None:
+            os.makedirs(model_dir, exist_ok=True)
+            name = os.path.basename(data_file.rstrip("/"))
+            model_file = os.path.join(model_dir, f"{name}_{version}_{field}.npz")
+
+        start = time.perf_counter()
+        emulator = fit_emulator(data, version, field, model_file)
+        print(
+            f"{version}: emulator of {field} over {', '.join(emulator.names)} "
+            f"from {emulator.size} points ready in "
+            f"{time.perf_counter() - start:.3f} s"
+        )
+
+        for point in points:
+            if len(point) != len(emulator.names):
+                raise ValueError(
+                    f"expected {len(emulator.names)} coordinates, got {point}"
+                )
+            start = time.perf_counter()
+            mean, std = emulator.predict([point])
+            elapsed = time.perf_counter() - start
+            flag = ""
+            if std[0] > max_std:
+                flag = "  <-- uncertain, simulate this point"
+                flagged.append((version, point))
+            print(
+                f"{version} {point}: {field} = {mean[0]:.4f} +- {std[0]:.4f} "
+                f"({elapsed * 1e6:.0f} us){flag}"
+            )
+    return flagged
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import numpy as np
+
+# The breakpoint dumps hold the state of a qubit either as a 2x2 density matrix
+# or as a ket (in the KET formalism), as a NumPy array.
+State = Union[np.ndarray, Sequence]
+
+
+def as_density_matrix(state: State) -> np.ndarray:
+    array = np.asarray(state, dtype=complex)
+    if array.shape == (2, 2):
+        return array
+    ket = array.reshape(2)
+    return np.outer(ket, ket.conj())
+
+
+def as_density_matrices(states: Sequence[State]) -> np.ndarray:
+    """Stack single-qubit states into an `(N, 2, 2)` array of density
+    matrices."""
+    if isinstance(states, np.ndarray) and states.shape[1:] == (2, 2):
+        return states
+    if len(states) == 0:
+        return np.zeros((0, 2, 2), dtype=complex)
+    arrays = [np.asarray(state, dtype=complex) for state in states]
+    if all(a.shape == (2, 2) for a in arrays):
+        return np.stack(arrays)
+    if all(a.size == 2 for a in arrays):
+        kets = np.stack([a.reshape(2) for a in arrays])
+        return np.einsum("na,nb->nab", kets, kets.conj())
+    return np.stack([as_density_matrix(a) for a in arrays])
+
+
+def squared_fidelities(references: np.ndarray, states: Sequence[State]) -> np.ndarray:
+    """Squared fidelities of all `states` with pure reference density matrices.
+
+    `references` is either one `(2, 2)` density matrix or an `(N, 2, 2)` array
+    with one reference per state. For a pure reference |psi><psi| the squared
+    fidelity is <psi|rho|psi> = tr(|psi><psi| rho), which is computed for all
+    states in one einsum.
+    """
+    rhos = as_density_matrices(states)
+    references = np.asarray(references, dtype=complex)
+    if references.ndim == 2:
+        return np.real(np.einsum("ij,nji->n", references, rhos))
+    return np.real(np.einsum("nij,nji->n", references, rhos))
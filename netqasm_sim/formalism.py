@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Iterable
+
+# Quantum state formalisms that simulations can run in. Fidelities are computed
+# from the density matrices of dumped states, so only runs that need no state
+# dumps (e.g. the error rate of trap rounds, which only depends on measurement
+# outcomes) can use the cheaper ket or stabilizer formalisms. The stabilizer
+# formalism only supports Clifford gates and Pauli noise, which `check_formalism`
+# checks before a run.
+# The values are the names of the `QFormalism` members, so that NetSquid is only
+# imported when a formalism is set.
+FORMALISMS = {
+    "dm": "DM",
+    "ket": "KET",
+    "stab": "STAB",
+}
+
+DEFAULT_FORMALISM = "dm"
+
+
+def set_formalism(name: str) -> None:
+    if name not in FORMALISMS:
+        raise ValueError(f"unknown formalism {name}, choose from {list(FORMALISMS)}")
+    import netsquid as ns
+    from netsquid.qubits.qformalism import QFormalism
+
+    ns.set_qstate_formalism(getattr(QFormalism, FORMALISMS[name]))
+
+
+def check_formalism(name: str, cfg: Any, angles: Iterable[float] = ()) -> None:
+    """Raise a ValueError if programs that rotate by `angles` on the network
+    of `cfg` cannot be simulated in formalism `name`. The stabilizer formalism
+    needs Clifford gates and Pauli noise: NV devices decompose gates into
+    rotations by arbitrary angles and have amplitude damping, and generic
+    devices have amplitude damping if their T1 is nonzero."""
+    if name != "stab":
+        return
+    for stack in cfg.stacks:
+        if stack.qdevice_typ != "generic":
+            raise ValueError(
+                f"formalism stab only supports generic devices, not "
+                f"{stack.qdevice_typ} (of {stack.name})"
+            )
+        qdevice_cfg = stack.qdevice_cfg
+        if isinstance(qdevice_cfg, dict):
+            t1 = qdevice_cfg.get("T1", 0)
+        else:
+            t1 = getattr(qdevice_cfg, "T1", 0)
+        if t1:
+            raise ValueError(
+                f"formalism stab needs T1 = 0 (no amplitude damping), but "
+                f"{stack.name} has T1 = {t1}"
+            )
+    for angle in angles:
+        quarter_turns = angle / (math.pi / 2)
+        if not math.isclose(quarter_turns, round(quarter_turns), abs_tol=1e-9):
+            raise ValueError(
+                f"formalism stab needs rotations by multiples of pi/2, not {angle}"
+            )
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Opt-in instrumentation of simulation calls: wall-clock timers of their phases,
+# e.g. building the network ("setup"), the event loop ("run"), reading the
+# dumped states ("dump") and computing fidelities ("fidelity"), and counters of
+# what the programs do, e.g. EPR pairs, classical messages and subroutine
+# flushes. It is off by default, in which case `phase` and `count` only cost a
+# function call.
+#
+# Every process keeps its own totals. `recording` collects those of a block of
+# code into a report that can be sent back from a worker, and `merge_reports`
+# adds such reports up.
+
+# Key of the instrumentation report in the samples of a shard and in the
+# summary of a sweep point.
+REPORT_KEY = "instrumentation"
+
+_enabled = False
+_timeline = False
+_totals: Dict[str, float] = defaultdict(float)
+_counts: Dict[str, int] = defaultdict(int)
+# Time spent in the nested phases of every open phase.
+_nested: List[float] = []
+_events: List[Dict[str, Any]] = []
+
+
+def enable(on: bool = True, timeline: bool = False) -> None:
+    """Turn instrumentation on or off. With `timeline`, every phase is also
+    recorded as an event of a Chrome trace (see `write_trace`)."""
+    global _enabled, _timeline
+    _enabled = on
+    _timeline = on and timeline
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def timeline_enabled() -> bool:
+    return _timeline
+
+
+def reset() -> None:
+    _totals.clear()
+    _counts.clear()
+    _events.clear()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the wall time of the body to the total of phase `name`. The time
+    of phases nested in the body is only added to the nested phases, so that
+    the totals of all phases add up to the instrumented wall time."""
+    if not _enabled:
+        yield
+        return
+    _nested.append(0.0)
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _totals[name] += elapsed - _nested.pop()
+        if _nested:
+            _nested[-1] += elapsed
+        if _timeline:
+            _events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": wall_start * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                }
+            )
+
+
+def count(name: str, n: int = 1) -> None:
+    if _enabled:
+        _counts[name] += n
+
+
+def totals() -> Dict[str, float]:
+    """Seconds spent per phase since the last `reset`."""
+    return dict(_totals)
+
+
+def report() -> Dict[str, Any]:
+    """The phase totals, counts and (with a timeline) events since the last
+    `reset`."""
+    result: Dict[str, Any] = {"phases": dict(_totals), "counts": dict(_counts)}
+    if _timeline:
+        result["events"] = list(_events)
+    return result
+
+
+@contextmanager
+def recording() -> Iterator[Dict[str, Any]]:
+    """Record the body separately: the yielded dict is filled with the
+    `report` of the body on exit, after which the totals, counts and events
+    from before are restored."""
+    saved = dict(_totals), dict(_counts), list(_events)
+    reset()
+    result: Dict[str, Any] = {}
+    try:
+        yield result
+    finally:
+        result.update(report())
+        reset()
+        _totals.update(saved[0])
+        _counts.update(saved[1])
+        _events.extend(saved[2])
+
+
+def add_events(events: List[Dict[str, Any]]) -> None:
+    """Add events recorded in another process to the timeline."""
+    _events.extend(events)
+
+
+def merge_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up reports, and divide every count by the number of simulated
+    iterations (the "iterations" count) in "per_iteration"."""
+    phases: Dict[str, float] = defaultdict(float)
+    counts: Dict[str, int] = defaultdict(int)
+    events: List[Dict[str, Any]] = []
+    for r in reports:
+        for name, seconds in r["phases"].items():
+            phases[name] += seconds
+        for name, n in r["counts"].items():
+            counts[name] += n
+        events.extend(r.get("events", []))
+
+    merged: Dict[str, Any] = {"phases": dict(phases), "counts": dict(counts)}
+    iterations = counts.get("iterations", 0)
+    if iterations > 0:
+        merged["per_iteration"] = {
+            name: n / iterations
+            for name, n in counts.items()
+            if name not in ["iterations", "cached_iterations"]
+        }
+    if events:
+        merged["events"] = events
+    return merged
+
+
+def format_report(r: Dict[str, Any]) -> str:
+    lines = [f"  {name}: {seconds:.3f} s" for name, seconds in r["phases"].items()]
+    per_iteration = r.get("per_iteration", {})
+    for name, n in r["counts"].items():
+        line = f"  {name}: {n}"
+        if name in per_iteration:
+            line += f" ({per_iteration[name]:.2f} per iteration)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def write_trace(path: str, events: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Write the timeline (by default that of this process) as a Chrome trace,
+    which can be opened in chrome://tracing or https://ui.perfetto.dev."""
+    if events is None:
+        events = _events
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"timeline written to {path}")
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import importlib
+import multiprocessing
+import random
+from itertools import accumulate
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import instrument
+import profiling
+from cache import ResultCache
+from formalism import DEFAULT_FORMALISM, set_formalism
+
+SEED_BITS = 32
+
+# Default number of iterations per batch when sampling until a target standard
+# error is reached.
+ADAPTIVE_BATCH_SIZE = 50
+
+# Start methods of the worker pool. With "forkserver", `WARM_MODULES` are
+# imported once in the fork server, and every worker starts as a fork of it.
+START_METHODS = multiprocessing.get_all_start_methods()
+
+# The simulation stack, imported by every worker before its first job.
+WARM_MODULES = ["session", "bqc.bqc", "teleport.teleport"]
+
+# Number of times the pool is restarted during a `run_jobs` call after a worker
+# process died, before giving up.
+MAX_POOL_RESTARTS = 3
+
+
+def new_base_seed() -> int:
+    return random.SystemRandom().randrange(2**SEED_BITS)
+
+
+def derive_seed(base_seed: int, *keys: Any) -> int:
+    # Hash instead of e.g. `base_seed + index` so that nearby points do not get
+    # correlated random streams.
+    digest = hashlib.sha256(repr((base_seed,) + keys).encode()).digest()
+    return int.from_bytes(digest[: SEED_BITS // 8], "big")
+
+
+def reset_simulation(seed: Optional[int] = None) -> None:
+    # Start every job from simulation time 0 and a known random state, so that
+    # its outcome does not depend on which jobs ran before it in this process.
+    import netsquid as ns
+
+    ns.sim_reset()
+    if seed is not None:
+        ns.set_random_state(seed=seed)
+        np.random.seed(seed)
+        random.seed(seed)
+
+
+def _init_worker(
+    log_level: str,
+    instrumented: bool,
+    timeline: bool,
+    profile: Optional[Tuple[str, str]],
+) -> None:
+    from squidasm.sim.stack.common import LogManager
+
+    set_formalism(DEFAULT_FORMALISM)
+    LogManager.set_log_level(log_level)
+    instrument.enable(instrumented, timeline)
+    profiling.init_worker(profile)
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+
+
+class WorkerPool:
+    """A pool of worker processes that is kept alive between `run_jobs` calls,
+    so that the workers import the simulation stack only once and keep the
+    networks they built (see `session`) for the next jobs.
+
+    If a worker process dies, the pool is restarted and the jobs that did not
+    finish are submitted again. Since every job is seeded, this does not change
+    the results.
+    """
+
+    def __init__(
+        self, workers: int, initargs: Tuple, start_method: Optional[str] = None
+    ) -> None:
+        self.workers = workers
+        self.initargs = initargs
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _start(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context(self.start_method)
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload(WARM_MODULES)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=self.initargs,
+        )
+        return self._executor
+
+    def run(
+        self, func: Callable[[Any], Any], jobs: Sequence[Any]
+    ) -> Iterator[Tuple[int, Any]]:
+        pending = dict(enumerate(jobs))
+        restarts = 0
+        futures: Dict[Future, int] = {}
+        try:
+            while pending:
+                executor = self._executor or self._start()
+                try:
+                    futures = {
+                        executor.submit(profiling.call, func, job): i
+                        for i, job in pending.items()
+                    }
+                    for future in as_completed(futures):
+                        result = future.result()
+                        del pending[futures[future]]
+                        yield futures[future], result
+                except BrokenProcessPool:
+                    restarts += 1
+                    if restarts > MAX_POOL_RESTARTS:
+                        raise
+                    print(
+                        f"a worker process died, restarting the pool "
+                        f"({len(pending)} jobs left)"
+                    )
+                    self.shutdown()
+        finally:
+            # Do not leave jobs of an abandoned run in the queue of the pool.
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        """Let the running jobs finish and stop the workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[WorkerPool] = None
+_start_method: Optional[str] = None
+
+
+def set_start_method(method: Optional[str]) -> None:
+    """Start method of the worker pool (default: that of the platform)."""
+    global _start_method
+    if method is not None and method not in START_METHODS:
+        raise ValueError(f"unknown start method {method}, choose from {START_METHODS}")
+    _start_method = method
+
+
+def get_pool(workers: int, log_level: str = "WARNING") -> WorkerPool:
+    """The worker pool of this process, restarted if `workers`, the log level,
+    the instrumentation or profiling settings or the start method changed."""
+    global _pool
+    initargs = (
+        log_level,
+        instrument.enabled(),
+        instrument.timeline_enabled(),
+        profiling.worker_state(),
+    )
+    if _pool is not None and (
+        _pool.workers != workers
+        or _pool.initargs != initargs
+        or _pool.start_method != _start_method
+    ):
+        shutdown_pool()
+    if _pool is None:
+        _pool = WorkerPool(workers, initargs, _start_method)
+    return _pool
+
+
+@atexit.register
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def run_jobs(
+    func: Callable[[Any], Any],
+    jobs: Sequence[Any],
+    workers: int = 1,
+    log_level: str = "WARNING",
+) -> Iterator[Tuple[int, Any]]:
+    """Run `func` on every job and yield `(job index, result)` tuples in the
+    order in which the jobs finish.
+
+    With `workers <= 1` the jobs are run one after another in this process.
+    Otherwise they are distributed over the pool of `workers` processes (see
+    `get_pool`), each with its own NetSquid simulator. `func` and the jobs must
+    be picklable.
+    """
+    if workers <= 1:
+        for i, job in enumerate(jobs):
+            yield i, func(job)
+        return
+
+    yield from get_pool(workers, log_level).run(func, jobs)
+
+
+# A shard is a chunk of the `num_times` iterations of a single simulation call,
+# e.g. one `trap_round_samples` call. It is described by the function to call,
+# its keyword arguments (including the config), the number of iterations of the
+# chunk, its seed and an optional result cache. The function must return a dict
+# of per-iteration lists.
+ShardJob = Tuple[
+    Callable[..., Dict[str, List]], Dict[str, Any], int, int, Optional[ResultCache]
+]
+
+
+def shard_sizes(num_times: int, shard_size: Optional[int] = None) -> List[int]:
+    if shard_size is None or shard_size >= num_times:
+        return [num_times]
+    sizes = [shard_size] * (num_times // shard_size)
+    if num_times % shard_size > 0:
+        sizes.append(num_times % shard_size)
+    return sizes
+
+
+def shard_jobs(
+    func: Callable[..., Dict[str, List]],
+    kwargs: Dict[str, Any],
+    num_times: int,
+    seed: int,
+    point_id: Tuple,
+    shard_size: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+) -> List[ShardJob]:
+    # The shard boundaries only depend on `shard_size`, and the seed of each
+    # shard only on (base seed, point id, shard index). The merged samples are
+    # therefore the same for any number of workers.
+    return [
+        (func, kwargs, size, derive_seed(seed, *point_id, i), cache)
+        for i, size in enumerate(shard_sizes(num_times, shard_size))
+    ]
+
+
+def run_shard(job: ShardJob) -> Dict[str, List]:
+    func, kwargs, num_times, seed, cache = job
+
+    def run() -> Dict[str, List]:
+        reset_simulation(seed)
+        instrument.count("iterations", num_times)
+        return func(num_times=num_times, **kwargs)
+
+    if not instrument.enabled():
+        if cache is None:
+            return run()
+        return cache.call(func, kwargs, num_times, seed, run)
+
+    # The report of the shard is returned with its samples as a list, so that
+    # merging the samples of several shards also merges their reports. It is
+    # not stored in the result cache.
+    with instrument.recording() as report:
+        if cache is None:
+            samples = run()
+        else:
+            samples = cache.call(func, kwargs, num_times, seed, run)
+            if "iterations" not in instrument.report()["counts"]:
+                instrument.count("cached_iterations", num_times)
+    return {**samples, instrument.REPORT_KEY: [report]}
+
+
+def pop_reports(task_samples: List[Dict[str, List]]) -> List[Dict[str, Any]]:
+    """Remove the instrumentation reports of the shards from the samples of
+    the tasks of a point and return them."""
+    return [
+        report
+        for samples in task_samples
+        for report in samples.pop(instrument.REPORT_KEY, [])
+    ]
+
+
+def merge_samples(shards: List[Dict[str, List]]) -> Dict[str, List]:
+    merged: Dict[str, List] = {}
+    for shard in shards:
+        for name, values in shard.items():
+            merged.setdefault(name, []).extend(values)
+    return merged
+
+
+def split_inputs(samples: Dict[str, List], num_inputs: int) -> List[Dict[str, List]]:
+    """Split the samples of a multi-input simulation call, whose iterations
+    are tagged with the index of their input in `samples["inputs"]`, into the
+    samples of each input."""
+    skip = ["inputs", instrument.REPORT_KEY]
+    split: List[Dict[str, List]] = [
+        {name: [] for name in samples if name not in skip} for _ in range(num_inputs)
+    ]
+    for name, values in samples.items():
+        if name in skip:
+            continue
+        for i, value in zip(samples["inputs"], values):
+            split[i][name].append(value)
+    return split
+
+
+def run_groups(
+    groups: List[List[ShardJob]],
+    workers: int = 1,
+    log_level: str = "WARNING",
+) -> Iterator[Tuple[int, Dict[str, List]]]:
+    """Run the shards of all groups and yield `(group index, merged samples)`
+    as soon as all shards of a group have finished."""
+    jobs = [job for group in groups for job in group]
+    group_of_job = [g for g, group in enumerate(groups) for _ in group]
+    group_start = list(accumulate([0] + [len(group) for group in groups]))
+    remaining = [len(group) for group in groups]
+    shards: List[Any] = [None] * len(jobs)
+
+    for i, samples in run_jobs(run_shard, jobs, workers, log_level):
+        shards[i] = samples
+        g = group_of_job[i]
+        remaining[g] -= 1
+        if remaining[g] == 0:
+            start = group_start[g]
+            yield g, merge_samples(shards[start : start + len(groups[g])])
+
+
+def run_sharded(
+    func: Callable[..., Dict[str, List]],
+    kwargs: Dict[str, Any],
+    num_times: int,
+    seed: int,
+    point_id: Tuple = (),
+    shard_size: Optional[int] = None,
+    workers: int = 1,
+    log_level: str = "WARNING",
+    cache: Optional[ResultCache] = None,
+) -> Dict[str, List]:
+    group = shard_jobs(func, kwargs, num_times, seed, point_id, shard_size, cache)
+    for _, samples in run_groups([group], workers, log_level):
+        return samples
+
+
+# A task is one simulation call of a sweep point, e.g. the trap rounds of all
+# inputs for one compile version: the function, its keyword arguments and the id
+# from which the seeds of its shards are derived.
+Task = Tuple[Callable[..., Dict[str, List]], Dict[str, Any], Tuple]
+
+
+def run_points(
+    points: List[List[Task]],
+    num_times: int,
+    seed: int,
+    shard_size: Optional[int] = None,
+    workers: int = 1,
+    log_level: str = "WARNING",
+    cache: Optional[ResultCache] = None,
+    converged: Optional[Callable[[List[Dict[str, List]]], bool]] = None,
+    on_batch: Optional[Callable[[int, int, int, Dict[str, List]], None]] = None,
+) -> Iterator[Tuple[int, List[Dict[str, List]]]]:
+    """Simulate the tasks of all points and yield `(point index, samples of
+    each task)` as soon as all tasks of a point have finished.
+
+    If `on_batch` is given, it is called as `on_batch(point index, task index,
+    index of the first iteration, samples)` with the samples of every task as
+    soon as they are done, before the point is yielded: with all iterations
+    at once, or per batch if `converged` is given.
+
+    If `converged` is given, the points are simulated in batches of
+    `shard_size` iterations, and a point is finished as soon as
+    `converged(samples of each task)` returns True or `num_times` iterations
+    have been done. Batch `k` is seeded like shard `k` of a non-adaptive run,
+    so stopping after `n` iterations gives the same samples as a run with
+    `num_times = n`.
+    """
+    if converged is None:
+        groups = [
+            shard_jobs(func, kwargs, num_times, seed, point_id, shard_size, cache)
+            for tasks in points
+            for (func, kwargs, point_id) in tasks
+        ]
+        point_of_group = [p for p, tasks in enumerate(points) for _ in tasks]
+        group_start = list(accumulate([0] + [len(tasks) for tasks in points]))
+        remaining = [len(tasks) for tasks in points]
+        results: List[Any] = [None] * len(groups)
+        for g, samples in run_groups(groups, workers, log_level):
+            results[g] = samples
+            p = point_of_group[g]
+            if on_batch is not None:
+                on_batch(p, g - group_start[p], 0, samples)
+            remaining[p] -= 1
+            if remaining[p] == 0:
+                yield p, results[group_start[p] : group_start[p] + len(points[p])]
+        return
+
+    batch_sizes = shard_sizes(num_times, shard_size)
+    batch_starts = list(accumulate([0] + batch_sizes))
+    samples_of_point: List[List[Dict[str, List]]] = [
+        [{} for _ in tasks] for tasks in points
+    ]
+    active = list(range(len(points)))
+    for batch, batch_size in enumerate(batch_sizes):
+        jobs = []
+        job_task = []
+        for p in active:
+            for t, (func, kwargs, point_id) in enumerate(points[p]):
+                batch_seed = derive_seed(seed, *point_id, batch)
+                jobs.append((func, kwargs, batch_size, batch_seed, cache))
+                job_task.append((p, t))
+
+        batch_results: List[Any] = [None] * len(jobs)
+        for i, samples in run_jobs(run_shard, jobs, workers, log_level):
+            batch_results[i] = samples
+        for (p, t), samples in zip(job_task, batch_results):
+            if on_batch is not None:
+                on_batch(p, t, batch_starts[batch], samples)
+            task_samples = samples_of_point[p][t]
+            samples_of_point[p][t] = merge_samples([task_samples, samples])
+
+        last_batch = batch == len(batch_sizes) - 1
+        still_active = []
+        for p in active:
+            if last_batch or converged(samples_of_point[p]):
+                yield p, samples_of_point[p]
+            else:
+                still_active.append(p)
+        active = still_active
+        if not active:
+            break
@@ -1,9 +1,11 @@
-import json
 import os
 from argparse import ArgumentParser
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+from sweepdata import load_sweep_data
+
+# matplotlib is imported by the plot functions, so that --help does not pay for
+# it.
 
 COMPILE_VERSIONS = ["vanilla", "nv"]
 FORMATS = {
@@ -38,6 +40,8 @@ X_LABELS = {
 
 
 def create_png(param_name):
+    import matplotlib.pyplot as plt
+
     output_dir = os.path.join(os.path.dirname(__file__), "plots_bqc")
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     output_path = os.path.join(output_dir, f"bqc_sweep_{param_name}.png")
@@ -46,15 +50,14 @@ def create_png(param_name):
 
 
 def plot_gate_noise_trap(data: str):
+    import matplotlib.pyplot as plt
+
     param_name = "gate_noise_trap"
 
-    data_path = os.path.join(
-        os.path.dirname(__file__), f"sweep_data_bqc/sweep_bqc_{data}.json"
+    all_data = load_sweep_data(
+        os.path.join(os.path.dirname(__file__), f"sweep_data_bqc/sweep_bqc_{data}")
     )
 
-    with open(data_path, "r") as f:
-        all_data = json.load(f)
-
     fig, ax = plt.subplots()
 
     ax.grid()
@@ -63,13 +66,10 @@ def plot_gate_noise_trap(data: str):
 
     for version in COMPILE_VERSIONS:
         data = all_data[version]
-        sweep_values = [v["sweep_value"] for v in data]
-        error_rates = [v["error_rate"] for v in data]
-        std_errs = [v["std_err"] for v in data]
         ax.errorbar(
-            x=sweep_values,
-            y=error_rates,
-            yerr=std_errs,
+            x=data["sweep_value"],
+            y=data["error_rate"],
+            yerr=data["std_err"],
             fmt=FORMATS[version],
             label=VERSION_LABELS[version],
         )
@@ -85,15 +85,14 @@ def plot_gate_noise_trap(data: str):
     create_png(param_name)
 
 def plot_gate_noise_epr_fidelity(data: str):
+    import matplotlib.pyplot as plt
+
     param_name = "gate_noise_epr_fidelity"
 
-    data_path = os.path.join(
-        os.path.dirname(__file__), f"sweep_data_bqc/sweep_bqc_{data}.json"
+    all_data = load_sweep_data(
+        os.path.join(os.path.dirname(__file__), f"sweep_data_bqc/sweep_bqc_{data}")
     )
 
-    with open(data_path, "r") as f:
-        all_data = json.load(f)
-
     fig, ax = plt.subplots()
 
     ax.grid()
@@ -102,23 +101,18 @@ def plot_gate_noise_epr_fidelity(data: str):
 
     for version in COMPILE_VERSIONS:
         data = all_data[version]
-        sweep_values = [v["sweep_value"] for v in data]
-        epr_fid1s = [v["epr_fid1"] for v in data]
-        epr_fid1_std_errs = [v["epr_fid1_std_err"] for v in data]
-        epr_fid2s = [v["epr_fid2"] for v in data]
-        epr_fid2_std_errs = [v["epr_fid2_std_err"] for v in data]
         if version == "vanilla":
             ax.errorbar(
-                x=sweep_values,
-                y=epr_fid1s,
-                yerr=epr_fid1_std_errs,
+                x=data["sweep_value"],
+                y=data["epr_fid1"],
+                yerr=data["epr_fid1_std_err"],
                 fmt=FORMATS_EPR1[version],
                 label=LABEL_EPR_FID1[version],
             )
         ax.errorbar(
-            x=sweep_values,
-            y=epr_fid2s,
-            yerr=epr_fid2_std_errs,
+            x=data["sweep_value"],
+            y=data["epr_fid2"],
+            yerr=data["epr_fid2_std_err"],
             fmt=FORMATS_EPR2[version],
             label=LABEL_EPR_FID2[version],
         )
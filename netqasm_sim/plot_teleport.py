@@ -1,9 +1,11 @@
-import json
 import os
 from argparse import ArgumentParser
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+from sweepdata import load_sweep_data
+
+# matplotlib is imported by the plot functions, so that --help does not pay for
+# it.
 
 COMPILE_VERSIONS = ["meas_epr_first", "meas_epr_last"]
 FORMATS = {
@@ -39,6 +41,8 @@ X_LABELS = {
 
 
 def create_png(param_name):
+    import matplotlib.pyplot as plt
+
     output_dir = os.path.join(os.path.dirname(__file__), "plots_teleport")
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     output_path = os.path.join(output_dir, f"teleport_sweep_{param_name}.png")
@@ -47,15 +51,16 @@ def create_png(param_name):
 
 
 def plot_gate_noise(data: str):
+    import matplotlib.pyplot as plt
+
     param_name = "gate_noise"
 
-    data_path = os.path.join(
-        os.path.dirname(__file__), f"sweep_data_teleport/sweep_{param_name}_{data}.json"
+    all_data = load_sweep_data(
+        os.path.join(
+            os.path.dirname(__file__), f"sweep_data_teleport/sweep_{param_name}_{data}"
+        )
     )
 
-    with open(data_path, "r") as f:
-        all_data = json.load(f)
-
     fig, ax = plt.subplots()
 
     ax.grid()
@@ -64,13 +69,10 @@ def plot_gate_noise(data: str):
 
     for version in COMPILE_VERSIONS:
         data = all_data[version]
-        sweep_values = [v["sweep_value"] for v in data]
-        error_rates = [v["fidelity"] for v in data]
-        std_errs = [v["std_err"] for v in data]
         ax.errorbar(
-            x=sweep_values,
-            y=error_rates,
-            yerr=std_errs,
+            x=data["sweep_value"],
+            y=data["fidelity"],
+            yerr=data["std_err"],
             fmt=FORMATS[version],
             label=VERSION_LABELS[version],
         )
@@ -89,15 +91,16 @@ def plot_gate_noise(data: str):
 
 
 def plot_gate_time(data: str):
+    import matplotlib.pyplot as plt
+
     param_name = "gate_time"
 
-    data_path = os.path.join(
-        os.path.dirname(__file__), f"sweep_data_teleport/sweep_{param_name}_{data}.json"
+    all_data = load_sweep_data(
+        os.path.join(
+            os.path.dirname(__file__), f"sweep_data_teleport/sweep_{param_name}_{data}"
+        )
     )
 
-    with open(data_path, "r") as f:
-        all_data = json.load(f)
-
     fig, ax = plt.subplots()
 
     ax.grid()
@@ -109,15 +112,13 @@ def plot_gate_time(data: str):
 
     for version in COMPILE_VERSIONS:
         data = all_data[version]
-        sweep_values = [v["sweep_value"] / 1e6 for v in data]  # ns -> ms
-        fidelities = [v["fidelity"] for v in data]
-        fid_std_errs = [v["fid_std_err"] for v in data]
-        durations = [v["duration"] / 1e6 for v in data]  # ns -> ms
-        dur_std_errs = [v["dur_std_err"] / 1e6 for v in data]
+        sweep_values = data["sweep_value"] / 1e6  # ns -> ms
+        durations = data["duration"] / 1e6  # ns -> ms
+        dur_std_errs = data["dur_std_err"] / 1e6
         ax.errorbar(
             x=sweep_values,
-            y=fidelities,
-            yerr=fid_std_errs,
+            y=data["fidelity"],
+            yerr=data["fid_std_err"],
             fmt=FORMATS[version],
             label=VERSION_LABELS_1[version],
         )
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import cProfile
+import glob
+import os
+import pstats
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+# cProfile hooks for the simulate_* commands. The command itself is profiled in
+# the main process, and every job that `parallel.run_jobs` sends to a worker
+# process is profiled in that worker. Every process writes its own pstats file,
+# `<run>_main.pstats` or `<run>_worker_<pid>.pstats`, into the output directory,
+# and the files of a run are merged into `<run>_merged.pstats`. They can be
+# loaded with e.g. `pstats.Stats(path)` or snakeviz.
+
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+
+DEFAULT_TOP = 25
+
+# (output directory, run id) of the profiled run, or None.
+_run: Optional[Tuple[str, str]] = None
+_profiler: Optional[cProfile.Profile] = None
+
+
+def enabled() -> bool:
+    return _run is not None
+
+
+def worker_state() -> Optional[Tuple[str, str]]:
+    """What `init_worker` needs to profile the jobs of a worker process."""
+    return _run
+
+
+def init_worker(state: Optional[Tuple[str, str]]) -> None:
+    global _run
+    _run = state
+
+
+def call(func: Callable[[Any], Any], job: Any) -> Any:
+    """Run `func(job)` under the profiler of this worker process, and write
+    the stats of all its jobs so far."""
+    global _profiler
+    if _run is None:
+        return func(job)
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+    out_dir, run_id = _run
+    try:
+        return _profiler.runcall(func, job)
+    finally:
+        # Written after every job, since pool workers are not always shut down
+        # cleanly.
+        _profiler.dump_stats(
+            os.path.join(out_dir, f"{run_id}_worker_{os.getpid()}.pstats")
+        )
+
+
+def run(
+    func: Callable[..., Any],
+    *args: Any,
+    out_dir: Optional[str] = None,
+    top: int = DEFAULT_TOP,
+) -> Any:
+    """Run `func(*args)` with profiling on, then merge the stats of the main
+    process and all workers and print the `top` functions by cumulative and by
+    own time."""
+    global _run
+    if out_dir is None:
+        out_dir = PROFILE_DIR
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    # Unique, so that the files of runs started in the same second (e.g. in
+    # other processes) are not merged into this one.
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    _run = (out_dir, run_id)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        _run = None
+        profiler.dump_stats(os.path.join(out_dir, f"{run_id}_main.pstats"))
+        paths = sorted(glob.glob(os.path.join(out_dir, f"{run_id}_*.pstats")))
+        stats = pstats.Stats(*paths)
+        merged_path = os.path.join(out_dir, f"{run_id}_merged.pstats")
+        stats.dump_stats(merged_path)
+        print(f"profiles of {len(paths)} processes written to {out_dir}")
+        print(f"merged profile written to {merged_path}")
+        stats.sort_stats("cumulative").print_stats(top)
+        stats.sort_stats("tottime").print_stats(top)
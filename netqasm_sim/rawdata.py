@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+import numpy as np
+
+RAW_FORMATS = ["jsonl", "npz"]
+
+# Default number of per-iteration records per JSON Lines shard.
+DEFAULT_SHARD_RECORDS = 100_000
+
+
+class RawSampleWriter:
+    """Streams the raw per-iteration samples of a sweep to sharded files.
+
+    Every call to `write` appends the samples of a batch of iterations of one
+    simulation call (e.g. one trap round input of one sweep point), labelled
+    with `key`. With the "jsonl" format every iteration becomes one line, and a
+    new shard is started once a shard holds `shard_records` lines. With the
+    "npz" format every call becomes one compressed NPZ file. Only the current
+    shard is kept open, so memory use does not grow with the size of the
+    sweep.
+
+    The directory holds a `meta.json` with the metadata of the sweep, like a
+    `Checkpoint`, and an `index.jsonl` with one line per finished write: its
+    key, iterations and the end of its shard. When resuming, the metadata must
+    match, whatever an interrupted write left behind is removed, and new
+    shards are added next to the existing ones. Iterations of a key that are
+    already in the files are not written again, so the batches of a point that
+    was not finished when the sweep stopped are not duplicated when the point
+    is simulated again.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        meta: Dict[str, Any],
+        fmt: str = "jsonl",
+        resume: bool = False,
+        shard_records: int = DEFAULT_SHARD_RECORDS,
+    ) -> None:
+        if fmt not in RAW_FORMATS:
+            raise ValueError(f"unknown raw data format {fmt}")
+        self._directory = directory
+        self._fmt = fmt
+        self._shard_records = shard_records
+        self._file: Optional[TextIO] = None
+        self._path: Optional[str] = None
+        self._records_in_shard = 0
+        # Number of iterations written per key, as JSON.
+        self._written: Dict[str, int] = {}
+        self._index_path = os.path.join(directory, "index.jsonl")
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        shards = _shard_paths(directory)
+        if shards and not resume:
+            raise ValueError(
+                f"{directory} already holds raw samples, "
+                "use another directory or resume the sweep"
+            )
+        if os.path.exists(meta_path) and shards:
+            with open(meta_path, "r") as f:
+                saved_meta = json.load(f)
+            if json.loads(json.dumps(meta)) != saved_meta:
+                raise ValueError(
+                    f"the raw samples in {directory} were written for a different "
+                    "sweep, cannot append to them"
+                )
+            self._restore()
+        else:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=4)
+            open(self._index_path, "w").close()
+        self._next_shard = len(_shard_paths(directory))
+
+    def _restore(self) -> None:
+        if not os.path.exists(self._index_path):
+            # Written before the index was added.
+            return
+        entries = []
+        with open(self._index_path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # The process was killed while writing this line.
+                    continue
+        ends: Dict[str, int] = {}
+        for entry in entries:
+            self._written[entry["key"]] = entry["end"]
+            ends[entry["shard"]] = max(ends.get(entry["shard"], 0), entry["offset"])
+
+        # Remove what interrupted writes left behind: the shards they started
+        # and the lines they appended to the last shard.
+        for path in _shard_paths(self._directory):
+            name = os.path.basename(path)
+            if name not in ends:
+                os.remove(path)
+            elif path.endswith(".jsonl"):
+                with open(path, "r+") as f:
+                    f.truncate(ends[name])
+
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(tmp_path, self._index_path)
+
+    def _new_path(self) -> str:
+        path = os.path.join(self._directory, f"part-{self._next_shard:05d}.{self._fmt}")
+        self._next_shard += 1
+        return path
+
+    def write(
+        self, key: Dict[str, Any], samples: Dict[str, List], start: int = 0
+    ) -> None:
+        """Append the samples of iterations `start, start + 1, ...` of the
+        simulation call labelled with `key`."""
+        key_id = json.dumps(key, sort_keys=True)
+        skip = max(self._written.get(key_id, 0) - start, 0)
+        num_times = len(next(iter(samples.values()))) - skip
+        if num_times <= 0:
+            return
+        samples = {name: values[skip:] for name, values in samples.items()}
+        start += skip
+
+        if self._fmt == "npz":
+            arrays = {name: np.asarray(values) for name, values in samples.items()}
+            path = self._new_path()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, key=json.dumps(key), start=start, **arrays)
+            os.replace(tmp_path, path)
+            offset = 0
+        else:
+            # A new shard is only started between writes, so that the lines of
+            # a write that was interrupted are at the end of the last shard.
+            if self._file is None or self._records_in_shard >= self._shard_records:
+                self.close()
+                self._path = self._new_path()
+                self._file = open(self._path, "w")
+            for i in range(num_times):
+                record = dict(key)
+                record["iteration"] = start + i
+                for name, values in samples.items():
+                    record[name] = values[i]
+                self._file.write(json.dumps(record) + "\n")
+                self._records_in_shard += 1
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            path = self._path
+            offset = self._file.tell()
+
+        self._written[key_id] = start + num_times
+        entry = {
+            "key": key_id,
+            "start": start,
+            "end": start + num_times,
+            "shard": os.path.basename(path),
+            "offset": offset,
+        }
+        with open(self._index_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._records_in_shard = 0
+
+
+def _shard_paths(directory: str) -> List[str]:
+    return sorted(
+        path
+        for fmt in RAW_FORMATS
+        for path in glob.glob(os.path.join(directory, f"part-*.{fmt}"))
+    )
+
+
+def read_raw_samples(directory: str) -> Iterator[Dict[str, Any]]:
+    """Yield the per-iteration records in `directory`, one dict per iteration
+    with the fields of its key, its iteration index and its sample values."""
+    for path in _shard_paths(directory):
+        if path.endswith(".jsonl"):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # The process was killed while writing this line.
+                        continue
+        else:
+            with np.load(path) as data:
+                key = json.loads(str(data["key"]))
+                start = int(data["start"]) if "start" in data.files else 0
+                names = [name for name in data.files if name not in ["key", "start"]]
+                arrays = {name: data[name] for name in names}
+            num_times = len(arrays[names[0]]) if names else 0
+            for i in range(num_times):
+                record = dict(key)
+                record["iteration"] = start + i
+                for name in names:
+                    record[name] = arrays[name][i].item()
+                yield record
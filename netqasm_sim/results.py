@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+# dtype and per-iteration shape of the fields of an IterationResults.
+FieldSpec = Tuple[type, Tuple[int, ...]]
+
+OUTCOME: FieldSpec = (np.int8, ())
+TIME: FieldSpec = (np.float64, ())
+STATE: FieldSpec = (np.complex128, (2, 2))
+
+
+class IterationResults:
+    """Per-iteration results of a simulation, with one preallocated NumPy
+    array of length `num_times` per field.
+
+    Programs write the values of each iteration in place with `record`, and
+    the analysis code reads (slices of) the arrays with `results[name]`.
+    """
+
+    def __init__(self, num_times: int, fields: Dict[str, FieldSpec]) -> None:
+        self._num_times = num_times
+        self._arrays = {
+            name: np.zeros((num_times,) + shape, dtype=dtype)
+            for name, (dtype, shape) in fields.items()
+        }
+
+    @property
+    def num_times(self) -> int:
+        return self._num_times
+
+    def record(self, iteration: int, **values) -> None:
+        for name, value in values.items():
+            self._arrays[name][iteration] = value
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def durations(
+        self, start_fields: Tuple[str, ...], end_fields: Tuple[str, ...]
+    ) -> np.ndarray:
+        """Time from the first start to the last end of every iteration."""
+        start = np.min([self._arrays[f] for f in start_fields], axis=0)
+        end = np.max([self._arrays[f] for f in end_fields], axis=0)
+        return end - start
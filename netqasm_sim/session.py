@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import copy
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from netsquid.components.instructions import INSTR_CXDIR, INSTR_CYDIR
+from squidasm.run.stack import run as stack_run
+from squidasm.run.stack.config import StackNetworkConfig
+from squidasm.sim.stack.context import NetSquidContext
+from squidasm.sim.stack.globals import GlobalSimData
+from squidasm.sim.stack.program import Program
+
+import instrument
+import parallel
+
+# `squidasm.run.stack.run.run` builds the whole network (nodes, quantum
+# devices, links and classical connections) on every call. A session keeps the
+# network of a config and only restarts its protocols for the next batch of
+# iterations. Configs of NV devices ("nv", not "nv_vanilla", whose gates are
+# built differently) that differ only in the fields below are run on the same
+# network, with new noise models and durations for its INSTR_CXDIR and
+# INSTR_CYDIR instructions. Any other change builds a new network.
+#
+# squidasm has no public API to run programs on a network more than once, so
+# sessions use the private `_setup_network` and `_run` of
+# `squidasm.run.stack.run`. Without them, every call builds a new network with
+# the public `run`.
+CAN_REUSE = hasattr(stack_run, "_setup_network") and hasattr(stack_run, "_run")
+IN_PLACE_NV_FIELDS = [
+    "ec_gate_depolar_prob",
+    "ec_controlled_dir_x",
+    "ec_controlled_dir_y",
+]
+
+# Number of networks kept per process.
+MAX_SESSIONS = 4
+
+
+def _in_place(stack: Any) -> bool:
+    return stack.qdevice_typ == "nv" and isinstance(stack.qdevice_cfg, dict)
+
+
+def network_key(cfg: StackNetworkConfig) -> str:
+    """Configs with the same key can share a network."""
+    data = json.loads(cfg.json())
+    for stack, stack_data in zip(cfg.stacks, data["stacks"]):
+        if _in_place(stack):
+            for name in IN_PLACE_NV_FIELDS:
+                stack_data["qdevice_cfg"].pop(name, None)
+    return json.dumps(data, sort_keys=True)
+
+
+class NetworkSession:
+    """A network built once for a config and reused for many runs."""
+
+    def __init__(self, cfg: StackNetworkConfig) -> None:
+        with instrument.phase("setup"):
+            self._network = stack_run._setup_network(cfg)
+        self._cfg = copy.deepcopy(cfg)
+        self.num_runs = 0
+
+    def apply(self, cfg: StackNetworkConfig) -> None:
+        """Set the in-place fields of `cfg` (which must have the same
+        `network_key`) on the quantum devices. The noise models of the
+        instructions are replaced by modified copies rather than modified,
+        since squidasm may share them between instructions."""
+        for stack_cfg, old_cfg in zip(cfg.stacks, self._cfg.stacks):
+            if not _in_place(stack_cfg):
+                continue
+            new = {name: stack_cfg.qdevice_cfg.get(name) for name in IN_PLACE_NV_FIELDS}
+            old = {name: old_cfg.qdevice_cfg.get(name) for name in IN_PLACE_NV_FIELDS}
+            if new == old:
+                continue
+            qdevice = self._network.stacks[stack_cfg.name].qdevice
+            for instruction in qdevice.get_physical_instructions():
+                if instruction.instruction not in (INSTR_CXDIR, INSTR_CYDIR):
+                    continue
+                if new["ec_gate_depolar_prob"] is not None:
+                    noise_model = copy.deepcopy(instruction.q_noise_model)
+                    noise_model.depolar_rate = new["ec_gate_depolar_prob"]
+                    instruction.q_noise_model = noise_model
+                if instruction.instruction == INSTR_CXDIR:
+                    duration = new["ec_controlled_dir_x"]
+                else:
+                    duration = new["ec_controlled_dir_y"]
+                if duration is not None:
+                    instruction.duration = duration
+        self._cfg = copy.deepcopy(cfg)
+
+    def run(self, programs: Dict[str, Program], num_times: int) -> List[List[Dict]]:
+        """Like `squidasm.run.stack.run.run`, on the network of this session.
+        The simulator itself is reset and seeded by `run_programs`."""
+        network = self._network
+        if self.num_runs > 0:
+            for stack in network.stacks.values():
+                stack.stop()
+            for link in network.links:
+                link.stop()
+
+        NetSquidContext.set_nodes({})
+        for name, stack in network.stacks.items():
+            NetSquidContext.add_node(stack.node.ID, name)
+        GlobalSimData.set_network(network)
+
+        # The hosts keep the results of earlier runs.
+        start = {
+            name: len(stack.host.get_results())
+            for name, stack in network.stacks.items()
+        }
+        for name, program in programs.items():
+            network.stacks[name].host.enqueue_program(program, num_times)
+        with instrument.phase("run"):
+            stack_run._run(network)
+        self.num_runs += 1
+        return [
+            stack.host.get_results()[start[name] :]
+            for name, stack in network.stacks.items()
+        ]
+
+
+_sessions: OrderedDict[str, NetworkSession] = OrderedDict()
+
+
+def get_session(cfg: StackNetworkConfig) -> NetworkSession:
+    """The session of this process for `cfg`, built if needed."""
+    key = network_key(cfg)
+    session = _sessions.get(key)
+    if session is None:
+        session = NetworkSession(cfg)
+        _sessions[key] = session
+        if len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    else:
+        session.apply(cfg)
+        _sessions.move_to_end(key)
+    return session
+
+
+def clear_sessions() -> None:
+    _sessions.clear()
+
+
+def run_programs(
+    cfg: StackNetworkConfig,
+    programs: Dict[str, Program],
+    num_times: int = 1,
+    reuse_network: bool = True,
+    seed: Optional[int] = None,
+) -> List[List[Dict]]:
+    """Run `programs` on the network of `cfg`, reusing a network that was
+    built before for the same config (up to the in-place fields) if
+    `reuse_network` is set.
+
+    The simulator is reset and seeded with `seed` after the network is built,
+    so that the results do not depend on whether the network was reused. If
+    no seed is given, it is drawn from the NumPy random state, which e.g.
+    `parallel.run_shard` seeds.
+    """
+    if seed is None:
+        seed = int(np.random.randint(2**parallel.SEED_BITS, dtype=np.int64))
+    if not CAN_REUSE:
+        parallel.reset_simulation(seed)
+        # Includes building the network.
+        with instrument.phase("run"):
+            return stack_run.run(cfg, programs, num_times=num_times)
+
+    session = get_session(cfg) if reuse_network else NetworkSession(cfg)
+    parallel.reset_simulation(seed)
+    return session.run(programs, num_times)
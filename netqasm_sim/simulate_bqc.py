@@ -2,12 +2,23 @@ import math
 import os
 import time
 from argparse import ArgumentParser
+from typing import Optional
 
-import netsquid as ns
-from squidasm.run.stack.config import LinkConfig, StackConfig, StackNetworkConfig
+import emulator
+import instrument
+import parallel
+import profiling
+import sweep_engine
+from bqc import COMPILE_VERSIONS
+from cache import ResultCache
+from formalism import DEFAULT_FORMALISM, FORMALISMS, check_formalism
+from rawdata import RAW_FORMATS
+from sweepdata import COLUMNAR_SUFFIX
 
-import sweep_bqc as sweep
-from bqc import bqc
+# NetSquid, squidasm and the simulation modules that use them are imported by
+# the commands that need them, so that e.g. --help and the analytic commands
+# start quickly, and so that spawned worker processes, which import this script
+# again, only import what their jobs need.
 
 
 def get_config_file(name: str) -> str:
@@ -16,7 +27,27 @@ def get_config_file(name: str) -> str:
     return os.path.join(os.path.dirname(__file__), f"configs/{name}")
 
 
+def get_data_file(name: str) -> str:
+    for path in [name, name + ".json", name + COLUMNAR_SUFFIX]:
+        if os.path.exists(path):
+            return name
+    return os.path.join(os.path.dirname(__file__), "sweep_data_bqc", name)
+
+
+def get_spec_file(name: str) -> str:
+    if os.path.exists(name):
+        return name
+    if not name.endswith(".yaml"):
+        name += ".yaml"
+    return os.path.join(os.path.dirname(__file__), f"sweeps/{name}")
+
+
 def command_trap(args):
+    from squidasm.run.stack.config import StackNetworkConfig
+    from squidasm.sim.stack.common import LogManager
+
+    from bqc import bqc
+
     cfg_file = get_config_file(args.config)
     n = args.num
     theta1 = args.theta1 * math.pi / 4
@@ -24,32 +55,104 @@ def command_trap(args):
     dummy = args.dummy
     log_level = args.log_level
 
-    bqc.n_trap_rounds(
-        cfg_file=cfg_file,
-        n=n,
-        theta1=theta1,
-        theta2=theta2,
-        dummy=dummy,
+    if args.workers == 1 and args.shard_size is None and args.seed is None:
+        bqc.n_trap_rounds(
+            cfg_file=cfg_file,
+            n=n,
+            theta1=theta1,
+            theta2=theta2,
+            dummy=dummy,
+            log_level=log_level,
+            formalism=args.formalism,
+        )
+        return
+
+    seed = args.seed if args.seed is not None else parallel.new_base_seed()
+    print(f"base seed: {seed}")
+    LogManager.set_log_level(log_level)
+    cfg = StackNetworkConfig.from_file(cfg_file)
+    samples = parallel.run_sharded(
+        bqc.trap_round_samples,
+        {
+            "cfg": cfg,
+            "theta1": theta1,
+            "theta2": theta2,
+            "dummy": dummy,
+            "formalism": args.formalism,
+        },
+        num_times=n,
+        seed=seed,
+        point_id=(theta1, theta2, dummy),
+        shard_size=args.shard_size,
+        workers=args.workers,
         log_level=log_level,
+        cache=get_cache(args),
     )
+    error_rate, _, fid1s, fid2s = bqc.trap_round_result(samples)
+    print(f"error rate: {error_rate}")
+    print(f"fidelities of EPR 1: {fid1s}")
+    print(f"fidelities of EPR 2: {fid2s}")
 
 
 def command_sweep(args):
+    import sweep_bqc as sweep
+
     cfg_file = get_config_file(args.config)
     num_times = args.num
     log_level = args.log_level
 
     if args.param == "gate_noise_trap":
         sweep.sweep_gate_noise_error_rate(
-            cfg_file=cfg_file, num_times=num_times, log_level=log_level
+            cfg_file=cfg_file,
+            num_times=num_times,
+            log_level=log_level,
+            workers=args.workers,
+            seed=args.seed,
+            shard_size=args.shard_size,
+            resume=args.resume,
+            cache=get_cache(args),
+            target_std_err=args.target_std_err,
+            engine=args.engine,
+            raw_dir=args.raw_dir,
+            raw_format=args.raw_format,
+            formalism=args.formalism,
         )
 
 
+def command_validate(args):
+    import sweep_bqc as sweep
+
+    if not sweep.validate_analytic(args.data, max_z=args.max_z):
+        raise SystemExit(1)
+
+
+def command_crosscheck(args):
+    import sweep_bqc as sweep
+
+    ok = sweep.crosscheck(
+        cfg_file=get_config_file(args.config),
+        num_times=args.num,
+        workers=args.workers,
+        seed=args.seed,
+        shard_size=args.shard_size,
+        cache=get_cache(args),
+        max_z=args.max_z,
+    )
+    if not ok:
+        raise SystemExit(1)
+
+
 def command_test(args):
+    from bqc import bqc
+
     bqc.test_perfect_config()
 
 
 def command_computation(args):
+    from squidasm.run.stack.config import StackNetworkConfig
+
+    from bqc import bqc
+
     cfg_file = get_config_file(args.config)
     alpha = args.alpha * math.pi / 4
     beta = args.beta * math.pi / 4
@@ -63,7 +166,7 @@ def command_computation(args):
 
     cfg = StackNetworkConfig.from_file(cfg_file)
 
-    bqc.computation_round(
+    fidelities, _ = bqc.computation_round(
         cfg=cfg,
         num_times=num,
         alpha=alpha,
@@ -74,6 +177,72 @@ def command_computation(args):
         r2=r2,
         log_level=log_level,
     )
+    print(f"fidelities: {fidelities}")
+
+
+def command_spec(args):
+    from squidasm.run.stack.config import StackNetworkConfig
+
+    import active
+    import sweep_bqc as sweep
+
+    instrument.enable(
+        args.instrument or args.trace_out is not None,
+        timeline=args.trace_out is not None,
+    )
+    spec_file = get_spec_file(args.spec) if args.spec is not None else None
+    spec = sweep_engine.spec_from_args(
+        spec_file,
+        args.vary,
+        args.product,
+        args.name,
+        design=args.design,
+        samples=args.samples,
+        seed=args.design_seed,
+    )
+    executor = sweep_engine.make_executor(
+        args.engine,
+        args.num,
+        seed=args.seed,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        log_level=args.log_level,
+        cache=get_cache(args),
+        target_std_err=args.target_std_err,
+    )
+    base_cfg = StackNetworkConfig.from_file(get_config_file(args.config))
+    check_formalism(args.formalism, base_cfg)
+    protocol = sweep.TrapRoundProtocol(formalism=args.formalism)
+    if args.budget is not None:
+        active.run_active(
+            spec,
+            base_cfg,
+            protocol,
+            executor,
+            budget=args.budget,
+            batch_size=args.batch_size,
+            field=args.field,
+            resume=args.resume,
+        )
+    else:
+        sweep_engine.run_spec(spec, base_cfg, protocol, executor, resume=args.resume)
+    if args.trace_out is not None:
+        instrument.write_trace(args.trace_out)
+
+
+def command_predict(args):
+    compile_versions = COMPILE_VERSIONS
+    if args.compile_version is not None:
+        compile_versions = [args.compile_version]
+    points = [[float(v) for v in point.split(",")] for point in args.point]
+    emulator.predict(
+        get_data_file(args.data),
+        args.field,
+        compile_versions,
+        points,
+        max_std=args.max_std,
+        model_dir=args.model_dir,
+    )
 
 
 def add_input_args(parser) -> None:
@@ -86,6 +255,212 @@ def add_input_args(parser) -> None:
     parser.add_argument("--compile-version", type=str, default="None")
 
 
+def add_instrument_args(parser) -> None:
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help=(
+            "Time the phases of the simulations (network setup, event loop, "
+            "state dumps, fidelities) and count EPR pairs, classical messages "
+            "and subroutine flushes. The report of every point is stored in "
+            "the metadata of the sweep data."
+        ),
+    )
+    parser.add_argument(
+        "--trace-out",
+        type=str,
+        default=None,
+        help=(
+            "Also write the timeline of the phases of all workers to this file "
+            "as a Chrome trace (implies --instrument)."
+        ),
+    )
+
+
+def add_formalism_args(parser) -> None:
+    parser.add_argument(
+        "--formalism",
+        type=str,
+        choices=list(FORMALISMS),
+        default=DEFAULT_FORMALISM,
+        help=(
+            "Quantum state formalism of the trap rounds. The error rate only "
+            "needs measurement outcomes, so it can be simulated faster with "
+            "'ket' or 'stab' (only generic devices with T1 = 0); the EPR "
+            "fidelities need the states and are only computed with 'dm'."
+        ),
+    )
+
+
+def add_spec_args(parser) -> None:
+    parser.add_argument(
+        "--spec",
+        type=str,
+        default=None,
+        help=(
+            "YAML sweep spec, given as a path or as the name of a file in the "
+            "netqasm_sim/sweeps directory."
+        ),
+    )
+    parser.add_argument(
+        "--vary",
+        type=str,
+        action="append",
+        default=None,
+        help=(
+            "Config path and values to sweep over, as PATH=v1,v2,... or "
+            "PATH=start:stop:num, e.g. "
+            "'stacks[*].qdevice_cfg.ec_gate_depolar_prob=0:0.1:10', or as "
+            "PATH=low:high or PATH=low:high:log for the lhs and sobol designs. "
+            "Can be given multiple times instead of --spec."
+        ),
+    )
+    parser.add_argument(
+        "--product",
+        type=str,
+        choices=sweep_engine.PRODUCTS,
+        default=None,
+        help="Combine the parameter values as a cartesian product or zip them.",
+    )
+    parser.add_argument(
+        "--design",
+        type=str,
+        choices=sweep_engine.designs.DESIGNS,
+        default=None,
+        help=(
+            "Use the grid of parameter values (default), or sample --samples "
+            "points from the parameter ranges with a Latin hypercube or "
+            "scrambled Sobol design."
+        ),
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=None,
+        help="Number of points of the lhs and sobol designs.",
+    )
+    parser.add_argument(
+        "--design-seed",
+        type=int,
+        default=None,
+        help="Seed of the lhs and sobol designs (default 0).",
+    )
+    parser.add_argument(
+        "--name",
+        type=str,
+        default=None,
+        help="Name of the output files. Defaults to the name in the spec.",
+    )
+
+
+def add_parallel_args(parser) -> None:
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes to distribute the simulation jobs over.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Base seed of the simulation. A random seed is used if not given.",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=None,
+        help=(
+            "Split the iterations of every simulation into chunks of this size, "
+            "which are run as separate jobs. The result only depends on the "
+            "shard size and the seed, not on the number of workers."
+        ),
+    )
+    parser.add_argument(
+        "--start-method",
+        type=str,
+        choices=parallel.START_METHODS,
+        default=None,
+        help=(
+            "How the worker processes are started (default: the platform "
+            "default). With 'forkserver', the simulation stack is imported "
+            "once and every worker starts as a copy of that process."
+        ),
+    )
+
+
+def add_cache_args(parser) -> None:
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always simulate instead of loading results from the result cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the result cache (default: netqasm_sim/result_cache).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="Maximum size of the result cache in MB.",
+    )
+
+
+def add_raw_args(parser) -> None:
+    parser.add_argument(
+        "--raw-dir",
+        type=str,
+        default=None,
+        help=(
+            "Stream the raw per-iteration samples of the sweep to sharded files "
+            "in this directory."
+        ),
+    )
+    parser.add_argument(
+        "--raw-format",
+        type=str,
+        choices=RAW_FORMATS,
+        default="jsonl",
+        help="Format of the raw sample shards.",
+    )
+
+
+def get_cache(args) -> Optional[ResultCache]:
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, max_size=args.cache_size * 2**20)
+
+
+def add_profile_args(parser) -> None:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Profile the command with cProfile, in the main process and in "
+            "every worker, and print the hottest functions of the merged "
+            "profile."
+        ),
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        default=None,
+        help=(
+            "Directory for the pstats files of the processes and their merge "
+            "(implies --profile, default: netqasm_sim/profiles)."
+        ),
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=profiling.DEFAULT_TOP,
+        help="Number of functions to print per sort order.",
+    )
+
+
 def add_global_args(parser) -> None:
     parser.add_argument(
         "--config",
@@ -103,12 +478,14 @@ if __name__ == "__main__":
     parser = ArgumentParser(prog="BQC simulation")
     subparsers = parser.add_subparsers(dest="cmd")
     subparsers.required = True
+    parser.set_defaults(profile=False, profile_out=None, start_method=None)
 
     comp_parser = subparsers.add_parser("computation")
     comp_parser.set_defaults(func=command_computation)
     add_input_args(comp_parser)
     add_global_args(comp_parser)
     comp_parser.add_argument("--num", type=int, default=1)
+    add_profile_args(comp_parser)
 
     trap_parser = subparsers.add_parser("trap")
     trap_parser.set_defaults(func=command_trap)
@@ -116,6 +493,10 @@ if __name__ == "__main__":
     add_global_args(trap_parser)
     trap_parser.add_argument("--dummy", type=int, default=1)
     trap_parser.add_argument("--num", type=int, default=1)
+    add_parallel_args(trap_parser)
+    add_cache_args(trap_parser)
+    add_formalism_args(trap_parser)
+    add_profile_args(trap_parser)
 
     sweep_parser = subparsers.add_parser("sweep")
     sweep_parser.set_defaults(func=command_sweep)
@@ -128,15 +509,189 @@ if __name__ == "__main__":
         required=True,
     )
     sweep_parser.add_argument("--num", type=int, default=1)
+    sweep_parser.add_argument(
+        "--engine",
+        type=str,
+        choices={"netsquid", "analytic"},
+        default="netsquid",
+        help=(
+            "Simulate the trap rounds with NetSquid, or compute the expected "
+            "error rate and RSP fidelities with the closed-form model."
+        ),
+    )
+    add_parallel_args(sweep_parser)
+    add_cache_args(sweep_parser)
+    add_raw_args(sweep_parser)
+    add_formalism_args(sweep_parser)
+    sweep_parser.add_argument(
+        "--target-std-err",
+        type=float,
+        default=None,
+        help=(
+            "Simulate every sweep point in batches of --shard-size iterations "
+            "until the standard error is below this target. "
+            "--num is then the maximum number of iterations."
+        ),
+    )
+    sweep_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the sweep points that are recorded in the checkpoint file.",
+    )
+    add_profile_args(sweep_parser)
+
+    spec_parser = subparsers.add_parser("spec")
+    spec_parser.set_defaults(func=command_spec)
+    add_global_args(spec_parser)
+    add_spec_args(spec_parser)
+    spec_parser.add_argument("--num", type=int, default=1)
+    spec_parser.add_argument(
+        "--engine",
+        type=str,
+        choices={"netsquid", "analytic"},
+        default="netsquid",
+        help=(
+            "Simulate the trap rounds with NetSquid, or compute the expected "
+            "error rate and RSP fidelities with the closed-form model."
+        ),
+    )
+    add_parallel_args(spec_parser)
+    add_cache_args(spec_parser)
+    add_instrument_args(spec_parser)
+    add_formalism_args(spec_parser)
+    spec_parser.add_argument(
+        "--target-std-err",
+        type=float,
+        default=None,
+        help=(
+            "Simulate every sweep point in batches of --shard-size iterations "
+            "until the standard error is below this target. "
+            "--num is then the maximum number of iterations."
+        ),
+    )
+    spec_parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        help=(
+            "Total number of points to simulate. The points of the spec are "
+            "then only a coarse pass, after which batches of points are added "
+            "(or repeated) where the emulated output is most uncertain or "
+            "curved."
+        ),
+    )
+    spec_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4,
+        help="Number of points added per round of the --budget scheduler.",
+    )
+    spec_parser.add_argument(
+        "--field",
+        type=str,
+        default=None,
+        help="Output the --budget scheduler focuses on (default error_rate).",
+    )
+    spec_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the sweep points that are recorded in the checkpoint file.",
+    )
+    add_profile_args(spec_parser)
+
+    validate_parser = subparsers.add_parser("validate")
+    validate_parser.set_defaults(func=command_validate)
+    validate_parser.add_argument(
+        "--data",
+        type=str,
+        default=os.path.join(
+            os.path.dirname(__file__),
+            "..",
+            "final_data",
+            "sweep_data_paper_bqc",
+            "sweep_bqc_20220413_222400.json",
+        ),
+        help="Simulated sweep data to compare the analytic model with.",
+    )
+    validate_parser.add_argument(
+        "--max-z",
+        type=float,
+        default=3.0,
+        help="Flag error rates that are more than this many standard errors away.",
+    )
+
+    check_parser = subparsers.add_parser("crosscheck")
+    check_parser.set_defaults(func=command_crosscheck)
+    add_global_args(check_parser)
+    check_parser.add_argument("--num", type=int, default=100)
+    check_parser.add_argument(
+        "--max-z",
+        type=float,
+        default=3.0,
+        help="Flag results that are more than this many standard errors away.",
+    )
+    add_parallel_args(check_parser)
+    add_cache_args(check_parser)
 
     comp_parser = subparsers.add_parser("test")
     comp_parser.set_defaults(func=command_test)
 
-    ns.set_qstate_formalism(ns.qubits.qformalism.QFormalism.DM)
+    predict_parser = subparsers.add_parser("predict")
+    predict_parser.set_defaults(func=command_predict)
+    predict_parser.add_argument(
+        "--data",
+        type=str,
+        required=True,
+        help=(
+            "Sweep data to train the emulator on, as a path or as a name in "
+            "the netqasm_sim/sweep_data_bqc directory, e.g. spec_sobol_5d_LAST."
+        ),
+    )
+    predict_parser.add_argument(
+        "--point",
+        type=str,
+        action="append",
+        required=True,
+        help=(
+            "Comma-separated coordinates to predict at, in the order of the "
+            "sweep parameters. Can be given multiple times."
+        ),
+    )
+    predict_parser.add_argument("--field", type=str, default="error_rate")
+    predict_parser.add_argument(
+        "--compile-version",
+        type=str,
+        choices=COMPILE_VERSIONS,
+        default=None,
+        help="Only predict for this compile version.",
+    )
+    predict_parser.add_argument(
+        "--max-std",
+        type=float,
+        default=0.01,
+        help=(
+            "Flag points where the standard deviation of the prediction is "
+            "above this value, so they can be simulated instead."
+        ),
+    )
+    predict_parser.add_argument(
+        "--model-dir",
+        type=str,
+        default=None,
+        help=(
+            "Save fitted emulators in this directory and reuse them as long as "
+            "the sweep data does not change."
+        ),
+    )
 
     start = time.perf_counter()
 
     args = parser.parse_args()
-    args.func(args)
+    parallel.set_start_method(args.start_method)
+    if args.profile or args.profile_out is not None:
+        # Only the command is profiled, not the imports and argument parsing.
+        profiling.run(args.func, args, out_dir=args.profile_out, top=args.profile_top)
+    else:
+        args.func(args)
 
     print(f"finished in {round(time.perf_counter() - start, 2)} seconds")
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional
+
+import parallel
+
+# Sampling until a target standard error is reached stops no earlier than after
+# this many iterations per input, so that a point is not decided on the standard
+# error of a single batch.
+MIN_ADAPTIVE_ITERATIONS = 2 * parallel.ADAPTIVE_BATCH_SIZE
+
+
+class Metric:
+    """Mean and standard error of `data`.
+
+    If `num_samples` is given, `data` are means of values in [0, 1] (e.g. per
+    input error rates or fidelities) over `num_samples` values in total. The
+    standard error is then at least that of a rate of (k + 1) / (n + 2) for k
+    of n values being 1, so that e.g. a batch without any fails does not give
+    a standard error of 0."""
+
+    def __init__(
+        self, name: str, data: List[Any], num_samples: Optional[int] = None
+    ) -> None:
+        self._name = name
+        self._data = data
+        self._num_samples = num_samples
+
+        self._mean: Optional[float] = None
+        self._std_error: Optional[float] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    @property
+    def data(self) -> List[Any]:
+        return self._data
+
+    @property
+    def mean(self) -> float:
+        if self._mean is None:
+            self._mean = sum(self._data) / self.size
+        return self._mean
+
+    @property
+    def std_error(self) -> float:
+        if self._std_error is None:
+            variance = (
+                sum((d - self.mean) * (d - self.mean) for d in self.data) / self.size
+            )
+            self._std_error = math.sqrt(variance) / math.sqrt(self.size)
+            if self._num_samples is not None:
+                self._std_error = max(self._std_error, self.min_std_error)
+        return self._std_error
+
+    @property
+    def min_std_error(self) -> float:
+        n = self._num_samples
+        rate = (n * self.mean + 1) / (n + 2)
+        return math.sqrt(rate * (1 - rate) / n)
+
+    def serialize(self) -> Dict:
+        return {"mean": self.mean, "std_error": self.std_error}
+
+
+def converged(metric: Metric, num_times: int, target_std_err: float) -> bool:
+    """Whether sampling of a point can stop after `num_times` iterations per
+    input, with `metric` over all iterations so far."""
+    return num_times >= MIN_ADAPTIVE_ITERATIONS and metric.std_error < target_std_err
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import json
 import math
 import os
@@ -7,53 +8,37 @@ import random
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 from netsquid.qubits.qubitapi import fidelity
 from squidasm.run.stack.config import StackNetworkConfig
 from squidasm.sim.stack.common import LogManager
 
-from bqc import bqc
+import parallel
+import stats
+import sweep_engine
+from bqc import COMPILE_VERSIONS, analytic, bqc
+from cache import ResultCache
+from formalism import DEFAULT_FORMALISM, check_formalism
+from checkpoint import Checkpoint, read_checkpoint_meta
+from rawdata import RawSampleWriter
+from sweepdata import COLUMNAR_SUFFIX, json_compatible, write_columnar
 
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 
-COMPILE_VERSIONS = ["vanilla", "nv"]
+# (theta1, theta2, dummy) inputs of the trap rounds that are averaged over.
+TRAP_INPUTS = [
+    (theta1, theta2, dummy)
+    for theta1 in [0, PI_OVER_2]
+    for theta2 in [0, PI_OVER_2]
+    for dummy in [1]
+    # for dummy in [1, 2]
+]
 
-class Metric:
-    def __init__(self, name: str, data: List[Any]) -> None:
-        self._name = name
-        self._data = data
-
-        self._mean: Optional[float] = None
-        self._std_error: Optional[float] = None
-
-    @property
-    def size(self) -> int:
-        return len(self._data)
-
-    @property
-    def data(self) -> List[Any]:
-        return self._data
-
-    @property
-    def mean(self) -> float:
-        if self._mean is None:
-            self._mean = sum(self._data) / self.size
-        return self._mean
-
-    @property
-    def std_error(self) -> float:
-        if self._std_error is None:
-            variance = (
-                sum((d - self.mean) * (d - self.mean) for d in self.data) / self.size
-            )
-            self._std_error = math.sqrt(variance) / math.sqrt(self.size)
-        return self._std_error
-
-    def serialize(self) -> Dict:
-        return {"mean": self.mean, "std_error": self.std_error}
+# Sweep values of `sweep_gate_noise_error_rate`.
+GATE_NOISE_PROBS = [float(p) for p in np.linspace(0, 0.1, 10)]
 
 
 def dump_data(data: Any, filename: str) -> None:
@@ -65,45 +50,67 @@ def dump_data(data: Any, filename: str) -> None:
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     path_timestamp = os.path.join(output_dir, filename_timestamp)
     path_last = os.path.join(output_dir, filename_last)
+    json_data = json_compatible(data)
     with open(path_timestamp, "w") as f:
-        json.dump(data, f, indent=4)
+        json.dump(json_data, f, indent=4)
     # copy (i.e. write again) data to "LAST" file
     with open(path_last, "w") as f:
-        json.dump(data, f, indent=4)
+        json.dump(json_data, f, indent=4)
     print(f"data written to {path_timestamp} and {path_last}")
 
+    for name in [f"{filename}_{timestamp}", f"{filename}_LAST"]:
+        write_columnar(data, os.path.join(output_dir, name + COLUMNAR_SUFFIX))
+    print(f"columnar data written to {output_dir}")
 
-def get_avg_error_rate(
-    cfg, num_times: int = 5, return_time: bool = False
-) -> Tuple[Metric, Metric, Metric]:
+
+def version_config(cfg: StackNetworkConfig, version: str) -> StackNetworkConfig:
+    cfg = copy.deepcopy(cfg)
+    if version == "vanilla":
+        cfg.stacks[0].qdevice_typ = "nv_vanilla"
+        cfg.stacks[1].qdevice_typ = "nv_vanilla"
+    else:
+        cfg.stacks[0].qdevice_typ = "nv"
+        cfg.stacks[1].qdevice_typ = "nv"
+    return cfg
+
+
+def point_config(
+    cfg: StackNetworkConfig, version: str, depolar_prob: float
+) -> StackNetworkConfig:
+    cfg = version_config(cfg, version)
+    cfg.stacks[0].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
+    cfg.stacks[1].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
+    return cfg
+
+
+def error_rate_metric(fail_rates: List[float], num_times: int) -> stats.Metric:
+    """The error rate over the fail rates of all inputs, with `num_times`
+    iterations each."""
+    return stats.Metric(
+        "error_rate", fail_rates, num_samples=len(fail_rates) * num_times
+    )
+
+
+def summarize_trap_rounds(
+    round_results: List[Tuple[float, List[float], List[float], List[float]]],
+    num_times: int,
+    return_time: bool = False,
+) -> Tuple[stats.Metric, stats.Metric, stats.Metric]:
     fail_rates = []
     times = []
     epr1_fids = []
     epr2_fids = []
 
-    theta1s = [0, PI_OVER_2]
-    theta2s = [0, PI_OVER_2]
-    dummies = [1]
-    # dummies = [1, 2]
-    # theta1s = [0]
-    # theta2s = [0]
-    # dummies = [1]
-
-    nr_of_combis = len(theta1s) * len(theta2s) * len(dummies)
+    nr_of_combis = len(round_results)
 
     inner_times = []
     inner_fid1s = []
     inner_fid2s = []
-    for theta1 in theta1s:
-        for theta2 in theta2s:
-            for dummy in dummies:
-                rate, dur, fid1s, fid2s = bqc.trap_round(
-                    cfg, num_times, theta1=theta1, theta2=theta2, dummy=dummy
-                )
-                fail_rates.append(rate)
-                inner_times += dur
-                inner_fid1s += fid1s
-                inner_fid2s += fid2s
+    for rate, dur, fid1s, fid2s in round_results:
+        fail_rates.append(rate)
+        inner_times += dur
+        inner_fid1s += fid1s
+        inner_fid2s += fid2s
 
     for i in range(num_times):
         times_for_run_i = []
@@ -128,9 +135,9 @@ def get_avg_error_rate(
     epr2_fid_mean = round(sum(epr2_fids) / len(epr2_fids), 3)
 
     result_dict = {}
-    fail_rates_metric = Metric("error_rate", fail_rates)
-    epr1_fids_metric = Metric("epr1_fid", epr1_fids)
-    epr2_fids_metric = Metric("epr2_fid", epr2_fids)
+    fail_rates_metric = error_rate_metric(fail_rates, num_times)
+    epr1_fids_metric = stats.Metric("epr1_fid", epr1_fids)
+    epr2_fids_metric = stats.Metric("epr2_fid", epr2_fids)
     # fr = fail_rates
     # mean = round(sum(fr) / len(fr), 3)
     # variance = sum((r - mean) * (r - mean) for r in fr) / len(fr)
@@ -154,61 +161,415 @@ def get_avg_error_rate(
         return result_dict, times_result_dict
 
 
+def get_avg_error_rate(
+    cfg,
+    num_times: int = 5,
+    return_time: bool = False,
+    formalism: str = DEFAULT_FORMALISM,
+) -> Tuple[stats.Metric, stats.Metric, stats.Metric]:
+    # All inputs are simulated in a single run.
+    samples = bqc.trap_round_samples_multi(
+        cfg, num_times, inputs=TRAP_INPUTS, formalism=formalism
+    )
+    round_results = [
+        bqc.trap_round_result(s)
+        for s in parallel.split_inputs(samples, len(TRAP_INPUTS))
+    ]
+    return summarize_trap_rounds(round_results, num_times, return_time)
+
+
+def trap_task(
+    cfg: StackNetworkConfig,
+    version: str,
+    point_id: Tuple,
+    formalism: str = DEFAULT_FORMALISM,
+) -> parallel.Task:
+    """A task that simulates the trap rounds of all `TRAP_INPUTS` in a single
+    run."""
+    kwargs = {"cfg": cfg, "inputs": TRAP_INPUTS, "formalism": formalism}
+    return (bqc.trap_round_samples_multi, kwargs, (version,) + tuple(point_id))
+
+
+def error_rate_converged(
+    target_std_err: float,
+) -> Callable[[List[Dict[str, List]]], bool]:
+    """A `converged` check for `parallel.run_points` whose tasks are
+    `trap_task`s, e.g. one per compile version. The standard error of the
+    error rate of every task, as `summarize_trap_rounds` computes it, must be
+    below the target."""
+
+    def converged(task_samples: List[Dict[str, List]]) -> bool:
+        for samples in task_samples:
+            input_samples = parallel.split_inputs(samples, len(TRAP_INPUTS))
+            fail_rates = [bqc.trap_round_result(s)[0] for s in input_samples]
+            num_times = len(input_samples[0]["fails"])
+            error_rate = error_rate_metric(fail_rates, num_times)
+            if not stats.converged(error_rate, num_times, target_std_err):
+                return False
+        return True
+
+    return converged
+
+
+def analytic_sweep_data(base_cfg: StackNetworkConfig, probs: List[float]) -> Dict:
+    # Same format as the simulated sweep, with all points of a compile version
+    # computed in one call. The values are exact expectations, so the standard
+    # errors are 0.
+    data = {}
+    for version in COMPILE_VERSIONS:
+        cfg = point_config(base_cfg, version, 0.0)
+        model = analytic.expected_trap_rounds_cfg(cfg, version, np.array(probs))
+        data[version] = [
+            {
+                "sweep_value": float(prob),
+                "error_rate": float(error_rate),
+                "std_err": 0.0,
+                "epr_fid1": float(epr_fid1),
+                "epr_fid1_std_err": 0.0,
+                "epr_fid2": float(epr_fid2),
+                "epr_fid2_std_err": 0.0,
+            }
+            for prob, error_rate, epr_fid1, epr_fid2 in zip(
+                probs, model.error_rate, model.epr_fid1, model.epr_fid2
+            )
+        ]
+    data["meta"] = {}
+    data["meta"]["config"] = point_config(
+        base_cfg, COMPILE_VERSIONS[-1], probs[-1]
+    ).json()
+    data["meta"]["engine"] = "analytic"
+    return data
+
+
+def validate_analytic(data_file: str, max_z: float = 3.0) -> bool:
+    """Compare a simulated sweep with the analytic model for the config
+    stored in its metadata. Returns False if any error rate is more than
+    `max_z` standard errors away from the model. The model was fitted to the
+    sweep in final_data, so that sweep does not test it; use `crosscheck`
+    or a newly simulated sweep for that."""
+    with open(data_file, "r") as f:
+        data = json.load(f)
+    base_cfg = StackNetworkConfig.parse_raw(data["meta"]["config"])
+
+    ok = True
+    for version in COMPILE_VERSIONS:
+        entries = data[version]
+        # The EPR fidelities are null (NaN as floats) without state dumps.
+        fids1 = np.array([entry["epr_fid1"] for entry in entries], dtype=float)
+        fids2 = np.array([entry["epr_fid2"] for entry in entries], dtype=float)
+        probs = np.array([entry["sweep_value"] for entry in entries])
+        cfg = point_config(base_cfg, version, 0.0)
+        model = analytic.expected_trap_rounds_cfg(cfg, version, probs)
+        for i, entry in enumerate(entries):
+            diff = entry["error_rate"] - model.error_rate[i]
+            z = diff / entry["std_err"] if entry["std_err"] > 0 else 0.0
+            flag = ""
+            if abs(z) > max_z:
+                flag = "  <-- MISMATCH"
+                ok = False
+            print(
+                f"{version} depolar_prob = {entry['sweep_value']:.4f}: "
+                f"error rate = {entry['error_rate']:.4f} +- {entry['std_err']:.4f}, "
+                f"analytic = {model.error_rate[i]:.4f}, z = {z:.2f}{flag}"
+            )
+            print(
+                f"{version} depolar_prob = {entry['sweep_value']:.4f}: "
+                f"epr_fid1 = {fids1[i]:.6f} "
+                f"(analytic {model.epr_fid1[i]:.6f}), "
+                f"epr_fid2 = {fids2[i]:.6f} "
+                f"(analytic {model.epr_fid2[i]:.6f})"
+            )
+
+    print("analytic model agrees with the simulation" if ok else "MISMATCH found")
+    return ok
+
+
+def crosscheck(
+    cfg_file: str,
+    num_times: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+    max_z: float = 3.0,
+) -> bool:
+    """Compare fresh NetSquid trap rounds with the analytic model, for every
+    compile version at the gate noise halfway between the sweep values of
+    `sweep_gate_noise_error_rate`, which the model was not fitted to. Returns
+    False if any error rate or RSP fidelity is more than `max_z` standard
+    errors away from the model."""
+    base_cfg = StackNetworkConfig.from_file(cfg_file)
+    if seed is None:
+        seed = parallel.new_base_seed()
+    print(f"base seed: {seed}")
+
+    probs = [(a + b) / 2 for a, b in zip(GATE_NOISE_PROBS, GATE_NOISE_PROBS[1:])]
+    points = [(version, prob) for version in COMPILE_VERSIONS for prob in probs]
+    tasks = [
+        [trap_task(point_config(base_cfg, version, prob), version, (prob,))]
+        for version, prob in points
+    ]
+
+    ok = True
+    for p, (samples,) in parallel.run_points(
+        tasks, num_times, seed, shard_size=shard_size, workers=workers, cache=cache
+    ):
+        version, prob = points[p]
+        round_results = [
+            bqc.trap_round_result(s)
+            for s in parallel.split_inputs(samples, len(TRAP_INPUTS))
+        ]
+        metrics = summarize_trap_rounds(round_results, num_times)
+        cfg = point_config(base_cfg, version, prob)
+        model = analytic.expected_trap_rounds_cfg(cfg, version, prob)
+        for name, metric, analytic_value in zip(
+            ["error_rate", "epr_fid1", "epr_fid2"],
+            metrics,
+            [model.error_rate, model.epr_fid1, model.epr_fid2],
+        ):
+            diff = metric.mean - float(analytic_value)
+            if metric.std_error > 0:
+                z = diff / metric.std_error
+            else:
+                z = 0.0 if math.isclose(diff, 0, abs_tol=1e-9) else math.inf
+            flag = ""
+            if abs(z) > max_z:
+                flag = "  <-- MISMATCH"
+                ok = False
+            print(
+                f"{version} depolar_prob = {prob:.4f} {name}: "
+                f"netsquid = {metric.mean:.4f} +- {metric.std_error:.4f}, "
+                f"analytic = {float(analytic_value):.4f}, z = {z:.2f}{flag}"
+            )
+
+    print("analytic model agrees with NetSquid" if ok else "MISMATCH found")
+    return ok
+
 
 def sweep_gate_noise_error_rate(
-    cfg_file: str, num_times: int, log_level: str = "WARNING"
+    cfg_file: str,
+    num_times: int,
+    log_level: str = "WARNING",
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    resume: bool = False,
+    cache: Optional[ResultCache] = None,
+    target_std_err: Optional[float] = None,
+    engine: str = "netsquid",
+    raw_dir: Optional[str] = None,
+    raw_format: str = "jsonl",
+    formalism: str = DEFAULT_FORMALISM,
 ) -> None:
     LogManager.set_log_level(log_level)
     # LogManager.log_to_file("dump.log")
 
-    cfg = StackNetworkConfig.from_file(cfg_file)
-
-    probs = list(np.linspace(0, 0.1, 10))
+    probs = GATE_NOISE_PROBS
     # probs = list(np.linspace(0, 0.1, 3))
 
-    nr_of_calls_to_get_avg_error_rate = len(probs) * len(COMPILE_VERSIONS)
-    iteration = 0
+    if engine == "analytic":
+        base_cfg = StackNetworkConfig.from_file(cfg_file)
+        data = analytic_sweep_data(base_cfg, [float(p) for p in probs])
+        dump_data(data, "sweep_bqc")
+        return
+
+    checkpoint_path = os.path.join(
+        os.path.dirname(__file__), "sweep_data_bqc", "sweep_bqc_checkpoint.jsonl"
+    )
+
+    base_cfg = StackNetworkConfig.from_file(cfg_file)
+    # Fail before any point is simulated.
+    check_formalism(formalism, base_cfg)
+    if seed is None and resume:
+        saved_meta = read_checkpoint_meta(checkpoint_path)
+        if saved_meta is not None:
+            seed = saved_meta["seed"]
+    if seed is None:
+        seed = parallel.new_base_seed()
+    print(f"base seed: {seed}")
+
+    converged = None
+    if target_std_err is not None:
+        converged = error_rate_converged(target_std_err)
+        if shard_size is None:
+            shard_size = parallel.ADAPTIVE_BATCH_SIZE
+
+    meta = {
+        "config": base_cfg.json(),
+        "num_times": num_times,
+        "seed": seed,
+        "shard_size": shard_size,
+        "target_std_err": target_std_err,
+        "formalism": formalism,
+    }
+    checkpoint = Checkpoint(checkpoint_path, meta=meta, resume=resume)
+    raw_writer = None
+    if raw_dir is not None:
+        raw_writer = RawSampleWriter(
+            os.path.join(raw_dir, "sweep_bqc"), meta, fmt=raw_format, resume=resume
+        )
+
+    # One point per (compile version, sweep value), each with its own config.
+    # Points that are already in the checkpoint are not simulated again.
+    points = [(version, float(prob)) for version in COMPILE_VERSIONS for prob in probs]
+    point_cfgs = [point_config(base_cfg, v, prob) for (v, prob) in points]
+    entries: List[Dict] = [
+        checkpoint.get(point) if point in checkpoint else None for point in points
+    ]
+    todo = [i for i, point in enumerate(points) if point not in checkpoint]
+
+    # Every point has a single task that runs all trap round inputs.
+    point_tasks = []
+    for i in todo:
+        version, depolar_prob = points[i]
+        task = trap_task(point_cfgs[i], version, (depolar_prob,), formalism)
+        point_tasks.append([task])
+
+    def write_raw(t: int, _: int, start: int, samples: Dict[str, List]) -> None:
+        version, depolar_prob = points[todo[t]]
+        split = parallel.split_inputs(samples, len(TRAP_INPUTS))
+        for (theta1, theta2, dummy), input_samples in zip(TRAP_INPUTS, split):
+            key = {
+                "compile_version": version,
+                "depolar_prob": depolar_prob,
+                "theta1": theta1,
+                "theta2": theta2,
+                "dummy": dummy,
+            }
+            raw_writer.write(key, input_samples, start)
+
+    iteration = len(points) - len(todo)
     start_time = time.time()
 
+    for t, (samples,) in parallel.run_points(
+        point_tasks,
+        num_times,
+        seed,
+        shard_size=shard_size,
+        workers=workers,
+        log_level=log_level,
+        cache=cache,
+        converged=converged,
+        on_batch=write_raw if raw_writer is not None else None,
+    ):
+        input_samples = parallel.split_inputs(samples, len(TRAP_INPUTS))
+        round_results = [bqc.trap_round_result(s) for s in input_samples]
+        point_num_times = len(input_samples[0]["fails"])
+        error_rate, epr1_fid, epr2_fid = summarize_trap_rounds(
+            round_results, point_num_times
+        )
+        version, depolar_prob = points[todo[t]]
+        iteration += 1
+        print(f"iteration {iteration} out of {len(points)}")
+        print(f"time since start: {time.time() - start_time}")
+        print(
+            f"depolar_prob = {depolar_prob}: error rate = {error_rate.mean}, std_err = {error_rate.std_error}"
+        )
+
+        entries[todo[t]] = {
+            "sweep_value": depolar_prob,
+            "error_rate": error_rate.mean,
+            "std_err": error_rate.std_error,
+            "epr_fid1": epr1_fid.mean,
+            "epr_fid1_std_err": epr1_fid.std_error,
+            "epr_fid2": epr2_fid.mean,
+            "epr_fid2_std_err": epr2_fid.std_error,
+        }
+        if target_std_err is not None:
+            entries[todo[t]]["num_times"] = point_num_times
+        checkpoint.record(points[todo[t]], entries[todo[t]])
+
+    if raw_writer is not None:
+        raw_writer.close()
+
     data = {}
     for version in COMPILE_VERSIONS:
         data[version] = []
+    for (version, _), entry in zip(points, entries):
+        data[version].append(entry)
+    data["meta"] = {}
+    data["meta"]["config"] = point_cfgs[-1].json()
+    data["meta"]["num_times"] = num_times
+    data["meta"]["seed"] = seed
+    data["meta"]["shard_size"] = shard_size
+    data["meta"]["formalism"] = formalism
+    if target_std_err is not None:
+        data["meta"]["target_std_err"] = target_std_err
 
-    for version in COMPILE_VERSIONS:
-        if version == "vanilla":
-            cfg.stacks[0].qdevice_typ = "nv_vanilla"
-            cfg.stacks[1].qdevice_typ = "nv_vanilla"
-        else:
-            cfg.stacks[0].qdevice_typ = "nv"
-            cfg.stacks[1].qdevice_typ = "nv"
-
-        for depolar_prob in probs:
-            cfg.stacks[0].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
-            cfg.stacks[1].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
-            print(f"iteration {iteration} out of {nr_of_calls_to_get_avg_error_rate}")
-            print(f"time since start: {time.time() - start_time}")
-            # result, fid1, fid2 = get_avg_error_rate(cfg, num_times=num_times)
-            error_rate, epr1_fid, epr2_fid = get_avg_error_rate(cfg, num_times=num_times)
-            iteration += 1
+    dump_data(data, "sweep_bqc")
 
-            print(
-                f"depolar_prob = {depolar_prob}: error rate = {error_rate.mean}, std_err = {error_rate.std_error}"
-            )
 
-            data[version].append(
-                {
-                    "sweep_value": depolar_prob,
-                    "error_rate": error_rate.mean,
-                    "std_err": error_rate.std_error,
-                    "epr_fid1": epr1_fid.mean,
-                    "epr_fid1_std_err": epr1_fid.std_error,
-                    "epr_fid2": epr2_fid.mean,
-                    "epr_fid2_std_err": epr2_fid.std_error,
-                }
-            )
-            data["meta"] = {}
-            data["meta"]["config"] = cfg.json()
-            data["meta"]["num_times"] = num_times
+class TrapRoundProtocol(sweep_engine.SweepProtocol):
+    """Trap rounds with all `TRAP_INPUTS` and every compile version, for
+    `sweep_engine.run_spec`."""
 
-    dump_data(data, "sweep_bqc")
+    name = "bqc"
+    compile_versions = COMPILE_VERSIONS
+    primary_field = "error_rate"
+
+    def __init__(self, formalism: str = DEFAULT_FORMALISM) -> None:
+        self.formalism = formalism
 
+    def meta(self) -> Dict[str, Any]:
+        return {"formalism": self.formalism}
+
+    def tasks(self, cfg: StackNetworkConfig, point_id: Tuple) -> List[parallel.Task]:
+        return [
+            trap_task(version_config(cfg, version), version, point_id, self.formalism)
+            for version in COMPILE_VERSIONS
+        ]
+
+    def _split(self, task_samples: List[Dict[str, List]]) -> Dict[str, List[Dict]]:
+        return {
+            version: parallel.split_inputs(samples, len(TRAP_INPUTS))
+            for version, samples in zip(COMPILE_VERSIONS, task_samples)
+        }
+
+    def summarize(self, task_samples: List[Dict[str, List]]) -> Dict[str, Dict]:
+        entries = {}
+        for version, samples in self._split(task_samples).items():
+            round_results = [bqc.trap_round_result(s) for s in samples]
+            num_times = len(samples[0]["fails"])
+            error_rate, epr1_fid, epr2_fid = summarize_trap_rounds(
+                round_results, num_times
+            )
+            entries[version] = {
+                "error_rate": error_rate.mean,
+                "std_err": error_rate.std_error,
+                "epr_fid1": epr1_fid.mean,
+                "epr_fid1_std_err": epr1_fid.std_error,
+                "epr_fid2": epr2_fid.mean,
+                "epr_fid2_std_err": epr2_fid.std_error,
+                "num_times": num_times,
+            }
+        return entries
+
+    def converged(
+        self, target_std_err: float
+    ) -> Callable[[List[Dict[str, List]]], bool]:
+        return error_rate_converged(target_std_err)
+
+    def analytic(self, cfg: StackNetworkConfig) -> Dict[str, Dict]:
+        depolar_prob = cfg.stacks[1].qdevice_cfg.get("ec_gate_depolar_prob", 0.0)
+        entries = {}
+        for version in COMPILE_VERSIONS:
+            model = analytic.expected_trap_rounds_cfg(
+                version_config(cfg, version), version, depolar_prob
+            )
+            entries[version] = {
+                "error_rate": float(model.error_rate),
+                "std_err": 0.0,
+                "epr_fid1": float(model.epr_fid1),
+                "epr_fid1_std_err": 0.0,
+                "epr_fid2": float(model.epr_fid2),
+                "epr_fid2_std_err": 0.0,
+            }
+        return entries
+
+    def dump_data(self, data: Any, filename: str) -> None:
+        dump_data(data, filename)
+
+    def checkpoint_path(self, name: str) -> str:
+        return os.path.join(
+            os.path.dirname(__file__), "sweep_data_bqc", f"{name}_checkpoint.jsonl"
+        )
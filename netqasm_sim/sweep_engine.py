@@ -0,0 +1,564 @@
+from __future__ import annotations
+
+import copy
+import itertools
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+import yaml
+
+import designs
+import instrument
+import parallel
+from cache import ResultCache
+from checkpoint import Checkpoint, read_checkpoint_meta
+
+if TYPE_CHECKING:
+    from squidasm.run.stack.config import StackNetworkConfig
+
+# A declarative sweep is described by a spec, e.g. in YAML:
+#
+#   name: gate_noise_and_fidelity
+#   product: cartesian  # or zip
+#   parameters:
+#     - path: stacks[*].qdevice_cfg.ec_gate_depolar_prob
+#       linspace: [0, 0.15, 10]
+#     - path: links[0].cfg.fidelity
+#       values: [0.8, 0.9, 1.0]
+#
+# or, to sample the space with a Latin hypercube or scrambled Sobol design:
+#
+#   design: sobol  # or lhs
+#   samples: 256
+#   parameters:
+#     - path: links[0].cfg.fidelity
+#       range: [0.8, 1.0]
+#     - path: stacks[*].qdevice_cfg.carbon_T2
+#       range: [1.e+8, 1.e+10]
+#       log: true
+#
+# All points are planned up front and handed to an executor, which simulates
+# them (or evaluates an analytic model) and yields one summary per point.
+
+PRODUCTS = ["cartesian", "zip"]
+
+_SEGMENT = re.compile(r"^(\w+)((?:\[(?:\d+|\*)\])*)$")
+_INDEX = re.compile(r"\[(\d+|\*)\]")
+
+
+def _parse_path(path: str) -> List[Tuple[str, List[str]]]:
+    segments = []
+    for part in path.split("."):
+        match = _SEGMENT.match(part)
+        if match is None:
+            raise ValueError(f"invalid config path {path}")
+        segments.append((match.group(1), _INDEX.findall(match.group(2))))
+    if segments[-1][1]:
+        raise ValueError(f"config path {path} must end in a field name")
+    return segments
+
+
+def _get(obj: Any, name: str) -> Any:
+    if isinstance(obj, dict):
+        return obj[name]
+    return getattr(obj, name)
+
+
+def set_config_value(cfg: StackNetworkConfig, path: str, value: Any) -> None:
+    """Set the field at `path` in `cfg`, e.g. "links[0].cfg.fidelity".
+    `[*]` selects all elements of a list, e.g. "stacks[*].qdevice_cfg.T2"."""
+    segments = _parse_path(path)
+    targets = [cfg]
+    for name, indices in segments[:-1]:
+        targets = [_get(t, name) for t in targets]
+        for index in indices:
+            if index == "*":
+                targets = [element for t in targets for element in t]
+            else:
+                targets = [t[int(index)] for t in targets]
+
+    name = segments[-1][0]
+    for target in targets:
+        if isinstance(target, dict):
+            # Unknown keys would be silently ignored by the simulator.
+            if name not in target:
+                raise ValueError(f"config path {path}: no field {name}")
+            target[name] = value
+        else:
+            if not hasattr(target, name):
+                raise ValueError(f"config path {path}: no field {name}")
+            setattr(target, name, value)
+
+
+def _as_list(path: Union[str, List[str]]) -> List[str]:
+    return [path] if isinstance(path, str) else list(path)
+
+
+def parse_values(spec: Dict[str, Any]) -> List[float]:
+    if "values" in spec:
+        return [float(v) for v in spec["values"]]
+    if "linspace" in spec:
+        start, stop, num = spec["linspace"]
+        return [float(v) for v in np.linspace(start, stop, int(num))]
+    if "logspace" in spec:
+        start, stop, num = spec["logspace"]
+        return [float(v) for v in np.logspace(start, stop, int(num))]
+    raise ValueError(f"no values given for {spec.get('path')}")
+
+
+@dataclass
+class SweepParameter:
+    # One config path, or a list of paths that are all set to the same value
+    # (e.g. the x and y gate times).
+    path: Union[str, List[str]]
+    # The values of a grid design, or the bounds of a sampled design.
+    values: Optional[List[float]] = None
+    bounds: Optional[Tuple[float, float]] = None
+    log: bool = False
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any], design: str) -> SweepParameter:
+        for path in _as_list(spec["path"]):
+            _parse_path(path)
+        if design == "grid":
+            return cls(path=spec["path"], values=parse_values(spec))
+        if "range" not in spec:
+            raise ValueError(f"{design} design needs a range for {spec['path']}")
+        low, high = (float(v) for v in spec["range"])
+        log = bool(spec.get("log", False))
+        if log and low <= 0:
+            raise ValueError(f"log range of {spec['path']} must be positive")
+        return cls(path=spec["path"], bounds=(low, high), log=log)
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.values is not None:
+            return {"path": self.path, "values": self.values}
+        return {"path": self.path, "range": list(self.bounds), "log": self.log}
+
+
+@dataclass
+class SweepSpec:
+    name: str
+    parameters: List[SweepParameter]
+    product: str = "cartesian"
+    # With a sampled design ("lhs" or "sobol"), `samples` points are drawn
+    # from the box spanned by the parameter ranges. The points only depend on
+    # `seed`, so a resumed sweep plans the same points.
+    design: str = "grid"
+    samples: Optional[int] = None
+    seed: int = 0
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> SweepSpec:
+        product = spec.get("product", "cartesian")
+        if product not in PRODUCTS:
+            raise ValueError(f"unknown product {product}, choose from {PRODUCTS}")
+        design = spec.get("design", "grid")
+        if design not in designs.DESIGNS:
+            raise ValueError(f"unknown design {design}, choose from {designs.DESIGNS}")
+        samples = spec.get("samples")
+        if design != "grid" and samples is None:
+            raise ValueError(f"{design} design needs a number of samples")
+        parameters = [SweepParameter.from_dict(p, design) for p in spec["parameters"]]
+        return cls(
+            name=spec["name"],
+            parameters=parameters,
+            product=product,
+            design=design,
+            samples=None if samples is None else int(samples),
+            seed=int(spec.get("seed", 0)),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> SweepSpec:
+        with open(path, "r") as f:
+            spec = yaml.safe_load(f)
+        spec.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+        return cls.from_dict(spec)
+
+    def to_dict(self) -> Dict[str, Any]:
+        spec = {
+            "name": self.name,
+            "design": self.design,
+            "parameters": [p.to_dict() for p in self.parameters],
+        }
+        if self.design == "grid":
+            spec["product"] = self.product
+        else:
+            spec["samples"] = self.samples
+            spec["seed"] = self.seed
+        return spec
+
+    @property
+    def paths(self) -> List[Union[str, List[str]]]:
+        return [p.path for p in self.parameters]
+
+    def points(self) -> List[Tuple[float, ...]]:
+        if self.design != "grid":
+            unit = designs.unit_points(
+                self.design, self.samples, len(self.parameters), self.seed
+            )
+            return designs.scale_points(
+                unit,
+                [p.bounds for p in self.parameters],
+                [p.log for p in self.parameters],
+            )
+
+        values = [p.values for p in self.parameters]
+        if self.product == "zip":
+            if len(set(len(v) for v in values)) > 1:
+                raise ValueError(
+                    "zipped parameters must have the same number of values"
+                )
+            return list(zip(*values))
+        return list(itertools.product(*values))
+
+    def apply(
+        self, cfg: StackNetworkConfig, point: Tuple[float, ...]
+    ) -> StackNetworkConfig:
+        cfg = copy.deepcopy(cfg)
+        for path, value in zip(self.paths, point):
+            for p in _as_list(path):
+                set_config_value(cfg, p, value)
+        return cfg
+
+
+def parse_vary_arg(arg: str) -> Dict[str, Any]:
+    """Parse a CLI parameter "PATH=v1,v2,..." or "PATH=start:stop:num" (grid
+    designs), or "PATH=low:high" or "PATH=low:high:log" (sampled designs)."""
+    path, _, values = arg.partition("=")
+    if not values:
+        raise ValueError(f"expected PATH=VALUES, got {arg}")
+    if ":" in values:
+        parts = values.split(":")
+        if len(parts) == 2:
+            return {"path": path, "range": [float(parts[0]), float(parts[1])]}
+        start, stop, num = parts
+        if num == "log":
+            return {"path": path, "range": [float(start), float(stop)], "log": True}
+        return {"path": path, "linspace": [float(start), float(stop), int(num)]}
+    return {"path": path, "values": [float(v) for v in values.split(",")]}
+
+
+def spec_from_args(
+    spec_file: Optional[str],
+    vary: Optional[List[str]],
+    product: Optional[str],
+    name: Optional[str],
+    design: Optional[str] = None,
+    samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> SweepSpec:
+    if spec_file is not None:
+        if vary:
+            raise ValueError("give either a spec file or --vary parameters, not both")
+        with open(spec_file, "r") as f:
+            spec = yaml.safe_load(f)
+        spec.setdefault("name", os.path.splitext(os.path.basename(spec_file))[0])
+    elif vary:
+        spec = {
+            "name": "spec_sweep",
+            "parameters": [parse_vary_arg(v) for v in vary],
+        }
+    else:
+        raise ValueError("give a spec file or at least one --vary parameter")
+
+    overrides = {
+        "product": product,
+        "name": name,
+        "design": design,
+        "samples": samples,
+        "seed": seed,
+    }
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    return SweepSpec.from_dict(spec)
+
+
+class SweepProtocol(ABC):
+    """What is simulated at every point of a sweep, and how it is summarized.
+
+    Summaries map every compile version to a dict of output fields. With
+    instrumentation on, the executor adds the instrumentation report of the
+    point under `instrument.REPORT_KEY`.
+    """
+
+    name: str
+    compile_versions: List[str]
+    # The output that the active-learning scheduler focuses on.
+    primary_field: str
+
+    @abstractmethod
+    def tasks(self, cfg: StackNetworkConfig, point_id: Tuple) -> List[parallel.Task]:
+        """The simulation calls of the point with config `cfg`."""
+
+    @abstractmethod
+    def summarize(self, task_samples: List[Dict[str, List]]) -> Dict[str, Dict]:
+        """The summary of a point from the samples of its tasks."""
+
+    @abstractmethod
+    def converged(
+        self, target_std_err: float
+    ) -> Callable[[List[Dict[str, List]]], bool]:
+        """A function that tells if the samples of the tasks of a point reach
+        `target_std_err`."""
+
+    def meta(self) -> Dict[str, Any]:
+        """Settings of the protocol that are stored with the sweep."""
+        return {}
+
+    @abstractmethod
+    def analytic(self, cfg: StackNetworkConfig) -> Dict[str, Dict]:
+        """The summary of a point computed with the analytic model."""
+
+    @abstractmethod
+    def dump_data(self, data: Any, filename: str) -> None:
+        """Write the sweep data to the output directory of the protocol."""
+
+    @abstractmethod
+    def checkpoint_path(self, name: str) -> str:
+        """Path of the checkpoint file of the sweep `name`."""
+
+
+class SimulationExecutor:
+    """Simulates the points with NetSquid, using `parallel.run_points`."""
+
+    def __init__(
+        self,
+        num_times: int,
+        seed: Optional[int] = None,
+        shard_size: Optional[int] = None,
+        workers: int = 1,
+        log_level: str = "WARNING",
+        cache: Optional[ResultCache] = None,
+        target_std_err: Optional[float] = None,
+    ) -> None:
+        self.num_times = num_times
+        self.seed = seed
+        self.shard_size = shard_size
+        self.workers = workers
+        self.log_level = log_level
+        self.cache = cache
+        self.target_std_err = target_std_err
+        if target_std_err is not None and shard_size is None:
+            self.shard_size = parallel.ADAPTIVE_BATCH_SIZE
+
+    def prepare(self, checkpoint_path: str, resume: bool) -> None:
+        if self.seed is None and resume:
+            saved_meta = read_checkpoint_meta(checkpoint_path)
+            if saved_meta is not None:
+                self.seed = saved_meta["seed"]
+        if self.seed is None:
+            self.seed = parallel.new_base_seed()
+        print(f"base seed: {self.seed}")
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "engine": "netsquid",
+            "num_times": self.num_times,
+            "seed": self.seed,
+            "shard_size": self.shard_size,
+            "target_std_err": self.target_std_err,
+        }
+
+    def run(
+        self,
+        protocol: SweepProtocol,
+        cfgs: List[StackNetworkConfig],
+        point_ids: List[Tuple],
+    ) -> Iterator[Tuple[int, Dict[str, Dict]]]:
+        point_tasks = [protocol.tasks(cfg, pid) for cfg, pid in zip(cfgs, point_ids)]
+        converged = None
+        if self.target_std_err is not None:
+            converged = protocol.converged(self.target_std_err)
+        for i, task_samples in parallel.run_points(
+            point_tasks,
+            self.num_times,
+            self.seed,
+            shard_size=self.shard_size,
+            workers=self.workers,
+            log_level=self.log_level,
+            cache=self.cache,
+            converged=converged,
+        ):
+            reports = parallel.pop_reports(task_samples)
+            summary = protocol.summarize(task_samples)
+            if reports:
+                report = instrument.merge_reports(reports)
+                instrument.add_events(report.pop("events", []))
+                summary[instrument.REPORT_KEY] = report
+            yield i, summary
+
+
+class AnalyticExecutor:
+    """Evaluates the analytic model of the protocol at every point."""
+
+    def prepare(self, checkpoint_path: str, resume: bool) -> None:
+        pass
+
+    def meta(self) -> Dict[str, Any]:
+        return {"engine": "analytic"}
+
+    def run(
+        self,
+        protocol: SweepProtocol,
+        cfgs: List[StackNetworkConfig],
+        point_ids: List[Tuple],
+    ) -> Iterator[Tuple[int, Dict[str, Dict]]]:
+        for i, cfg in enumerate(cfgs):
+            yield i, protocol.analytic(cfg)
+
+
+def open_checkpoint(
+    spec: SweepSpec,
+    base_cfg: StackNetworkConfig,
+    protocol: SweepProtocol,
+    executor: Any,
+    resume: bool = False,
+    **extra_meta: Any,
+) -> Tuple[Checkpoint, Dict[str, Any]]:
+    """The checkpoint of a sweep and the metadata it was opened with."""
+    checkpoint_path = protocol.checkpoint_path(spec.name)
+    executor.prepare(checkpoint_path, resume)
+    meta = {
+        "spec": spec.to_dict(),
+        "config": base_cfg.json(),
+        **executor.meta(),
+        **protocol.meta(),
+    }
+    meta.update(extra_meta)
+    return Checkpoint(checkpoint_path, meta=meta, resume=resume), meta
+
+
+def run_points(
+    spec: SweepSpec,
+    base_cfg: StackNetworkConfig,
+    protocol: SweepProtocol,
+    executor: Any,
+    checkpoint: Checkpoint,
+    points: List[Tuple[float, ...]],
+    keys: Optional[List[Tuple]] = None,
+) -> List[Dict[str, Dict]]:
+    """Summaries of all `points`. The points are identified by `keys` (by
+    default the points themselves) in the checkpoint and in the seeds of the
+    simulation; points that are already in the checkpoint are not run again."""
+    if keys is None:
+        keys = points
+    summaries: List[Any] = [
+        checkpoint.get(key) if key in checkpoint else None for key in keys
+    ]
+    todo = [i for i, key in enumerate(keys) if key not in checkpoint]
+    cfgs = [spec.apply(base_cfg, points[i]) for i in todo]
+
+    iteration = len(points) - len(todo)
+    start_time = time.time()
+    for t, summary in executor.run(protocol, cfgs, [keys[i] for i in todo]):
+        summaries[todo[t]] = summary
+        checkpoint.record(keys[todo[t]], summary)
+        iteration += 1
+        print(f"iteration {iteration} out of {len(points)}")
+        print(f"time since start: {time.time() - start_time}")
+    return summaries
+
+
+def sweep_data(
+    spec: SweepSpec,
+    protocol: SweepProtocol,
+    points: List[Tuple[float, ...]],
+    summaries: List[Dict[str, Dict]],
+    meta: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Sweep data in the format of the other sweeps: a list of entries per
+    compile version, where every entry holds the coordinates of its point
+    (and a "sweep_value" for one-dimensional sweeps, like the fixed sweeps)."""
+    # The coordinates of a point are stored in the order of `spec.paths`, which
+    # are in the metadata, so that they form an (N, D) array in columnar form.
+    data: Dict[str, Any] = {version: [] for version in protocol.compile_versions}
+    for point, summary in zip(points, summaries):
+        for version in protocol.compile_versions:
+            entry: Dict[str, Any] = {"point": list(point)}
+            if len(spec.paths) == 1:
+                entry["sweep_value"] = point[0]
+            entry.update(summary[version])
+            data[version].append(entry)
+    data["meta"] = meta
+
+    reports = [
+        {"point": list(point), **summary[instrument.REPORT_KEY]}
+        for point, summary in zip(points, summaries)
+        if instrument.REPORT_KEY in summary
+    ]
+    if reports:
+        data["meta"] = {
+            **meta,
+            instrument.REPORT_KEY: {
+                "total": instrument.merge_reports(reports),
+                "points": reports,
+            },
+        }
+    return data
+
+
+def dump_sweep_data(protocol: SweepProtocol, data: Dict[str, Any], name: str) -> None:
+    with instrument.phase("dump_data"):
+        protocol.dump_data(data, name)
+    if not instrument.enabled():
+        return
+    if instrument.REPORT_KEY in data["meta"]:
+        print("instrumentation of the simulated points:")
+        print(instrument.format_report(data["meta"][instrument.REPORT_KEY]["total"]))
+    print(f"dump_data: {instrument.totals()['dump_data']:.3f} s")
+
+
+def run_spec(
+    spec: SweepSpec,
+    base_cfg: StackNetworkConfig,
+    protocol: SweepProtocol,
+    executor: Any,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    """Run all points of `spec` with `executor` and dump the results."""
+    checkpoint, meta = open_checkpoint(spec, base_cfg, protocol, executor, resume)
+    points = spec.points()
+    print(f"{len(points)} points planned")
+    summaries = run_points(spec, base_cfg, protocol, executor, checkpoint, points)
+    data = sweep_data(spec, protocol, points, summaries, meta)
+    dump_sweep_data(protocol, data, spec.name)
+    return data
+
+
+def make_executor(
+    engine: str,
+    num_times: int,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    workers: int = 1,
+    log_level: str = "WARNING",
+    cache: Optional[ResultCache] = None,
+    target_std_err: Optional[float] = None,
+) -> Any:
+    if engine == "analytic":
+        return AnalyticExecutor()
+    return SimulationExecutor(
+        num_times,
+        seed=seed,
+        shard_size=shard_size,
+        workers=workers,
+        log_level=log_level,
+        cache=cache,
+        target_std_err=target_std_err,
+    )
@@ -1,24 +1,50 @@
 from __future__ import annotations
 
+import copy
 import json
 import math
 import os
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 from squidasm.run.stack.config import StackNetworkConfig
 
-from teleport import teleport
+import parallel
+import stats
+import sweep_engine
+from cache import ResultCache
+from checkpoint import Checkpoint, read_checkpoint_meta
+from rawdata import RawSampleWriter
+from sweepdata import COLUMNAR_SUFFIX, json_compatible, write_columnar
+from teleport import COMPILE_VERSIONS, analytic, teleport
 
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 PI_OVER_4 = math.pi / 2
 THREE_PI_OVER_4 = math.pi / 2
 
-# COMPILE_VERSIONS = ["None"]
-COMPILE_VERSIONS = ["meas_epr_first", "meas_epr_last"]
+THETA_PHIS = [
+    (0, 0),  # |0>
+    (PI, 0),  # |1>
+    (PI_OVER_2, 0),  # |+>
+    (PI_OVER_2, PI),  # |->
+    (PI_OVER_2, PI_OVER_2),  # |i>
+    (PI_OVER_2, -PI_OVER_2),  # |-i>
+]
+
+# (compile version, (theta, phi)) pairs that are simulated for every sweep value.
+INPUTS = [(version, tp) for version in COMPILE_VERSIONS for tp in THETA_PHIS]
+
+# Sweep values of `sweep_gate_noise` and `sweep_gate_time`.
+GATE_NOISE_PROBS = [float(p) for p in np.linspace(0, 0.15, 10)]
+GATE_TIMES = [float(t) for t in np.linspace(0, 1_000_000, 10)]
+
+
+def midpoints(values: List[float]) -> List[float]:
+    return [(a + b) / 2 for a, b in zip(values, values[1:])]
 
 
 def dump_data(data: Any, filename: str) -> None:
@@ -30,15 +56,27 @@ def dump_data(data: Any, filename: str) -> None:
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     path_timestamp = os.path.join(output_dir, filename_timestamp)
     path_last = os.path.join(output_dir, filename_last)
+    json_data = json_compatible(data)
     with open(path_timestamp, "w") as f:
-        json.dump(data, f, indent=4)
+        json.dump(json_data, f, indent=4)
     with open(path_last, "w") as f:
-        json.dump(data, f, indent=4)
+        json.dump(json_data, f, indent=4)
     print(f"data written to {path_timestamp} and {path_last}")
 
+    for name in [f"{filename}_{timestamp}", f"{filename}_LAST"]:
+        write_columnar(data, os.path.join(output_dir, name + COLUMNAR_SUFFIX))
+    print(f"columnar data written to {output_dir}")
 
-def get_avg_fidelity(
-    cfg: StackNetworkConfig, num_times: int = 1, return_time: bool = False
+
+def fidelity_metric(fidelities: List[float]) -> stats.Metric:
+    """The fidelity over all iterations of all inputs of a compile version."""
+    return stats.Metric("fidelity", fidelities, num_samples=len(fidelities))
+
+
+def summarize_teleportation(
+    round_results: Dict[str, List[Tuple[List[float], List[float]]]],
+    num_times: int,
+    return_time: bool = False,
 ):
     fidelities = {}
     for version in COMPILE_VERSIONS:
@@ -48,33 +86,15 @@ def get_avg_fidelity(
     for version in COMPILE_VERSIONS:
         times[version] = []
 
-    thetas = [0, PI_OVER_2, PI]
-    phis = [0, PI_OVER_2, PI]
-    theta_phis = [
-        (0, 0),  # |0>
-        (PI, 0),  # |1>
-        (PI_OVER_2, 0),  # |+>
-        (PI_OVER_2, PI),  # |->
-        (PI_OVER_2, PI_OVER_2),  # |i>
-        (PI_OVER_2, -PI_OVER_2),  # |-i>
-    ]
-    # nr_of_theta_phi_combis = len(thetas) * len(phis)
-
     for version in COMPILE_VERSIONS:
         inner_times = []
-        for (theta, phi) in theta_phis:
-            fid, durations = teleport.do_teleportation(
-                cfg=cfg,
-                num_times=num_times,
-                theta=theta,
-                phi=phi,
-                compile_version=version,
-            )
+        for fid, durations in round_results[version]:
             fidelities[version] += fid
             inner_times += durations
+        nr_of_inputs = len(round_results[version])
         for i in range(num_times):
             times_for_run_i = []
-            for j in range(len(theta_phis)):
+            for j in range(nr_of_inputs):
                 times_for_run_i.append(inner_times[j * num_times + i])
             avg_for_run_i = sum(times_for_run_i) / len(times_for_run_i)
             times[version].append(avg_for_run_i)
@@ -84,13 +104,8 @@ def get_avg_fidelity(
 
     result_dict = {}
     for version in COMPILE_VERSIONS:
-        fid = fidelities[version]
-        mean = round(sum(fid) / len(fid), 3)
-        variance = sum((r - mean) * (r - mean) for r in fid) / len(fid)
-        std_deviation = math.sqrt(variance)
-        std_error = round(std_deviation / math.sqrt(len(fid)), 3)
-
-        result_dict[version] = (mean, std_error)
+        fid = fidelity_metric(fidelities[version])
+        result_dict[version] = (round(fid.mean, 3), round(fid.std_error, 3))
 
     if not return_time:
         return result_dict
@@ -108,57 +123,334 @@ def get_avg_fidelity(
     return result_dict, times_result_dict
 
 
-def sweep_gate_noise(cfg_file: str, num_times: int) -> None:
-    cfg = StackNetworkConfig.from_file(cfg_file)
-    # cfg.links[0].cfg["fidelity"] = 0.85
+def get_avg_fidelity(
+    cfg: StackNetworkConfig, num_times: int = 1, return_time: bool = False
+):
+    # All input states of a compile version are teleported in a single run.
+    round_results = {}
+    for version in COMPILE_VERSIONS:
+        samples = teleport.teleportation_samples_multi(
+            cfg=cfg,
+            num_times=num_times,
+            theta_phis=THETA_PHIS,
+            compile_version=version,
+        )
+        round_results[version] = [
+            (s["fidelities"], s["durations"])
+            for s in parallel.split_inputs(samples, len(THETA_PHIS))
+        ]
+    return summarize_teleportation(round_results, num_times, return_time)
+
+
+def set_gate_noise(cfg: StackNetworkConfig, depolar_prob: float) -> None:
+    cfg.stacks[0].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
+    cfg.stacks[1].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
+
+
+def set_gate_time(cfg: StackNetworkConfig, gate_time: float) -> None:
+    cfg.stacks[0].qdevice_cfg["ec_controlled_dir_x"] = gate_time
+    cfg.stacks[0].qdevice_cfg["ec_controlled_dir_y"] = gate_time
+    cfg.stacks[1].qdevice_cfg["ec_controlled_dir_x"] = gate_time
+    cfg.stacks[1].qdevice_cfg["ec_controlled_dir_y"] = gate_time
+
+
+def point_tasks(
+    cfg: StackNetworkConfig, point_id: Tuple, dump: str = "all"
+) -> List[parallel.Task]:
+    """One task per compile version, each simulating all `THETA_PHIS` inputs
+    in a single run."""
+    tasks = []
+    for version in COMPILE_VERSIONS:
+        kwargs = {
+            "cfg": cfg,
+            "theta_phis": THETA_PHIS,
+            "compile_version": version,
+            "dump": dump,
+        }
+        task_id = (version,) + tuple(point_id)
+        tasks.append((teleport.teleportation_samples_multi, kwargs, task_id))
+    return tasks
+
+
+def input_samples_of(task_samples: List[Dict[str, List]]) -> List[Dict[str, List]]:
+    """The samples of the tasks of `point_tasks`, split per pair of `INPUTS`."""
+    return [
+        samples
+        for version_samples in task_samples
+        for samples in parallel.split_inputs(version_samples, len(THETA_PHIS))
+    ]
+
 
+def fidelity_converged(
+    target_std_err: float, dump: str = "all"
+) -> Callable[[List[Dict[str, List]]], bool]:
+    if dump == "none":
+        raise ValueError("a target standard error needs the dumped states")
+
+    def converged(task_samples: List[Dict[str, List]]) -> bool:
+        # The standard error of the fidelity of every compile version over all
+        # its input states, as `summarize_teleportation` computes it, must be
+        # below the target.
+        input_samples = input_samples_of(task_samples)
+        num_times = len(input_samples[0]["fidelities"])
+        for version in COMPILE_VERSIONS:
+            fid = [
+                f
+                for (v, _), samples in zip(INPUTS, input_samples)
+                if v == version
+                for f in samples["fidelities"]
+            ]
+            if not stats.converged(fidelity_metric(fid), num_times, target_std_err):
+                return False
+        return True
+
+    return converged
+
+
+def analytic_summary(cfg: StackNetworkConfig, return_time: bool = False):
+    # Same format as `summarize_teleportation`. The values are exact
+    # expectations, so the standard errors are 0.
+    result_dict = {}
+    times_result_dict = {}
+    for version in COMPILE_VERSIONS:
+        result = analytic.expected_teleportation(cfg, THETA_PHIS, version)
+        result_dict[version] = (round(float(result.fidelities.mean()), 3), 0.0)
+        times_result_dict[version] = (round(float(result.durations.mean()), 3), 0.0)
+    if not return_time:
+        return result_dict
+    return result_dict, times_result_dict
+
+
+def run_sweep(
+    name: str,
+    cfg_file: str,
+    num_times: int,
+    sweep_values: List[float],
+    set_value: Callable[[StackNetworkConfig, float], None],
+    return_time: bool = False,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    resume: bool = False,
+    cache: Optional[ResultCache] = None,
+    target_std_err: Optional[float] = None,
+    engine: str = "netsquid",
+    raw_dir: Optional[str] = None,
+    raw_format: str = "jsonl",
+    dump: str = "all",
+) -> Tuple[List[Any], List[int], Dict[str, Any]]:
+    """Simulate all sweep values, and return the summary and number of
+    iterations of each value, and the seed and shard size that were used."""
+    if engine == "analytic":
+        summaries = []
+        for value in sweep_values:
+            cfg = StackNetworkConfig.from_file(cfg_file)
+            set_value(cfg, value)
+            summaries.append(analytic_summary(cfg, return_time))
+        return summaries, [0] * len(sweep_values), {}
+
+    checkpoint_path = os.path.join(
+        os.path.dirname(__file__), "sweep_data_teleport", f"{name}_checkpoint.jsonl"
+    )
+
+    base_cfg = StackNetworkConfig.from_file(cfg_file)
+    if seed is None and resume:
+        saved_meta = read_checkpoint_meta(checkpoint_path)
+        if saved_meta is not None:
+            seed = saved_meta["seed"]
+    if seed is None:
+        seed = parallel.new_base_seed()
+    print(f"base seed: {seed}")
+
+    converged = None
+    if target_std_err is not None:
+        converged = fidelity_converged(target_std_err, dump)
+        if shard_size is None:
+            shard_size = parallel.ADAPTIVE_BATCH_SIZE
+
+    meta = {
+        "config": base_cfg.json(),
+        "num_times": num_times,
+        "seed": seed,
+        "shard_size": shard_size,
+        "target_std_err": target_std_err,
+        "dump": dump,
+    }
+    checkpoint = Checkpoint(checkpoint_path, meta=meta, resume=resume)
+    raw_writer = None
+    if raw_dir is not None:
+        raw_writer = RawSampleWriter(
+            os.path.join(raw_dir, name), meta, fmt=raw_format, resume=resume
+        )
+    summaries: List[Any] = [
+        checkpoint.get((value,)) if (value,) in checkpoint else None
+        for value in sweep_values
+    ]
+    todo = [i for i, value in enumerate(sweep_values) if (value,) not in checkpoint]
+
+    # One config per sweep value, with one task per compile version.
+    tasks_of_point = []
+    for i in todo:
+        cfg = copy.deepcopy(base_cfg)
+        set_value(cfg, sweep_values[i])
+        tasks_of_point.append(point_tasks(cfg, (float(sweep_values[i]),), dump))
+
+    def write_raw(t: int, v: int, start: int, samples: Dict[str, List]) -> None:
+        split = parallel.split_inputs(samples, len(THETA_PHIS))
+        for (theta, phi), input_samples in zip(THETA_PHIS, split):
+            key = {
+                "sweep_value": sweep_values[todo[t]],
+                "compile_version": COMPILE_VERSIONS[v],
+                "theta": theta,
+                "phi": phi,
+            }
+            raw_writer.write(key, input_samples, start)
+
+    iteration = len(sweep_values) - len(todo)
+    start_time = time.time()
+
+    for t, task_samples in parallel.run_points(
+        tasks_of_point,
+        num_times,
+        seed,
+        shard_size=shard_size,
+        workers=workers,
+        cache=cache,
+        converged=converged,
+        on_batch=write_raw if raw_writer is not None else None,
+    ):
+        input_samples = input_samples_of(task_samples)
+        round_results = {version: [] for version in COMPILE_VERSIONS}
+        for (version, _), samples in zip(INPUTS, input_samples):
+            round_results[version].append((samples["fidelities"], samples["durations"]))
+        point_num_times = len(input_samples[0]["fidelities"])
+        summary = summarize_teleportation(round_results, point_num_times, return_time)
+        summaries[todo[t]] = {"summary": summary, "num_times": point_num_times}
+        checkpoint.record((sweep_values[todo[t]],), summaries[todo[t]])
+        iteration += 1
+        print(f"iteration {iteration} out of {len(sweep_values)}")
+        print(f"time since start: {time.time() - start_time}")
+
+    if raw_writer is not None:
+        raw_writer.close()
+
+    return (
+        [s["summary"] for s in summaries],
+        [s["num_times"] for s in summaries],
+        {"seed": seed, "shard_size": shard_size},
+    )
+
+
+def sweep_meta(
+    cfg_file: str, num_times: int, engine: str, run_meta: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "config": StackNetworkConfig.from_file(cfg_file).json(),
+        "num_times": num_times,
+        "engine": engine,
+        **run_meta,
+    }
+
+
+def sweep_gate_noise(
+    cfg_file: str,
+    num_times: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    resume: bool = False,
+    cache: Optional[ResultCache] = None,
+    target_std_err: Optional[float] = None,
+    engine: str = "netsquid",
+    raw_dir: Optional[str] = None,
+    raw_format: str = "jsonl",
+    dump: str = "all",
+) -> None:
     data = {}
     for version in COMPILE_VERSIONS:
         data[version] = []
 
     # for depolar_prob in [0.0, 0.1, 0.3, 0.4]:
-    probs = list(np.linspace(0, 0.15, 10))
-    for depolar_prob in probs:
-        cfg.stacks[0].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
-        cfg.stacks[1].qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
-        result = get_avg_fidelity(cfg, num_times=num_times)
-
+    probs = GATE_NOISE_PROBS
+    results, used_num_times, run_meta = run_sweep(
+        "sweep_gate_noise",
+        cfg_file,
+        num_times,
+        probs,
+        set_gate_noise,
+        workers=workers,
+        seed=seed,
+        shard_size=shard_size,
+        resume=resume,
+        cache=cache,
+        target_std_err=target_std_err,
+        engine=engine,
+        raw_dir=raw_dir,
+        raw_format=raw_format,
+        dump=dump,
+    )
+    for depolar_prob, result, n in zip(probs, results, used_num_times):
         for version in COMPILE_VERSIONS:
             fidelity, std_err = result[version]
             print(
                 f"depolar_prob = {depolar_prob}: fidelity = {fidelity}, std_err = {std_err}"
             )
 
-            data[version].append(
-                {
-                    "sweep_value": depolar_prob,
-                    "fidelity": fidelity,
-                    "std_err": std_err,
-                }
-            )
-
+            entry = {
+                "sweep_value": depolar_prob,
+                "fidelity": fidelity,
+                "std_err": std_err,
+            }
+            if target_std_err is not None:
+                entry["num_times"] = n
+            data[version].append(entry)
+
+    data["meta"] = sweep_meta(cfg_file, num_times, engine, run_meta)
+    data["meta"]["dump"] = dump
     dump_data(data, "sweep_gate_noise")
 
 
-def sweep_gate_time(cfg_file: str, num_times: int) -> None:
-    cfg = StackNetworkConfig.from_file(cfg_file)
-    # cfg.links[0].cfg["fidelity"] = 0.85
-
+def sweep_gate_time(
+    cfg_file: str,
+    num_times: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    resume: bool = False,
+    cache: Optional[ResultCache] = None,
+    target_std_err: Optional[float] = None,
+    engine: str = "netsquid",
+    raw_dir: Optional[str] = None,
+    raw_format: str = "jsonl",
+    dump: str = "all",
+) -> None:
     data = {}
     for version in COMPILE_VERSIONS:
         data[version] = []
 
-    times = list(np.linspace(0, 1_000_000, 10))
-    for gate_time in times:
-        cfg.stacks[0].qdevice_cfg["ec_controlled_dir_x"] = gate_time
-        cfg.stacks[0].qdevice_cfg["ec_controlled_dir_y"] = gate_time
-        cfg.stacks[1].qdevice_cfg["ec_controlled_dir_x"] = gate_time
-        cfg.stacks[1].qdevice_cfg["ec_controlled_dir_y"] = gate_time
-        result, time = get_avg_fidelity(cfg, num_times=num_times, return_time=True)
-
+    times = GATE_TIMES
+    results, used_num_times, run_meta = run_sweep(
+        "sweep_gate_time",
+        cfg_file,
+        num_times,
+        times,
+        set_gate_time,
+        return_time=True,
+        workers=workers,
+        seed=seed,
+        shard_size=shard_size,
+        resume=resume,
+        cache=cache,
+        target_std_err=target_std_err,
+        engine=engine,
+        raw_dir=raw_dir,
+        raw_format=raw_format,
+        dump=dump,
+    )
+    for gate_time, (result, durations), n in zip(times, results, used_num_times):
         for version in COMPILE_VERSIONS:
             fidelity, fid_std_err = result[version]
-            duration, dur_std_err = time[version]
+            duration, dur_std_err = durations[version]
             print(
                 f"gate_time = {gate_time}: fidelity = {fidelity}, std_err = {fid_std_err}"
             )
@@ -166,15 +458,154 @@ def sweep_gate_time(cfg_file: str, num_times: int) -> None:
                 f"gate_time = {gate_time}: duration = {duration}, std_err = {dur_std_err}"
             )
 
-            data[version].append(
-                {
-                    "sweep_value": gate_time,
-                    "fidelity": fidelity,
-                    "duration": duration,
-                    "fid_std_err": fid_std_err,
-                    "dur_std_err": dur_std_err,
-                }
-            )
-
+            entry = {
+                "sweep_value": gate_time,
+                "fidelity": fidelity,
+                "duration": duration,
+                "fid_std_err": fid_std_err,
+                "dur_std_err": dur_std_err,
+            }
+            if target_std_err is not None:
+                entry["num_times"] = n
+            data[version].append(entry)
+
+    data["meta"] = sweep_meta(cfg_file, num_times, engine, run_meta)
+    data["meta"]["dump"] = dump
     dump_data(data, "sweep_gate_time")
 
+
+def crosscheck(
+    cfg_file: str,
+    num_times: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+    max_z: float = 3.0,
+    held_out: bool = True,
+) -> bool:
+    """Compare the NetSquid results of every (compile version, input state)
+    pair with the analytic engine, for the config itself and, with
+    `held_out`, for the gate noise and gate time halfway between the sweep
+    values of `sweep_gate_noise` and `sweep_gate_time`. The gate counts of the
+    analytic engine were fitted to those sweeps, so these points test it on
+    data it was not fitted to. Returns False if any mean fidelity or duration
+    is more than `max_z` standard errors away from the analytic value."""
+    base_cfg = StackNetworkConfig.from_file(cfg_file)
+    if seed is None:
+        seed = parallel.new_base_seed()
+    print(f"base seed: {seed}")
+
+    points: List[Tuple[str, StackNetworkConfig]] = [("config", base_cfg)]
+    if held_out:
+        for param, values, set_value in [
+            ("gate_noise", GATE_NOISE_PROBS, set_gate_noise),
+            ("gate_time", GATE_TIMES, set_gate_time),
+        ]:
+            for value in midpoints(values):
+                cfg = copy.deepcopy(base_cfg)
+                set_value(cfg, value)
+                points.append((f"{param}={value:g}", cfg))
+
+    ok = True
+    for p, task_samples in parallel.run_points(
+        [point_tasks(cfg, (label,)) for label, cfg in points],
+        num_times,
+        seed,
+        shard_size=shard_size,
+        workers=workers,
+        cache=cache,
+    ):
+        label, cfg = points[p]
+        expected = {
+            version: analytic.expected_teleportation(cfg, THETA_PHIS, version)
+            for version in COMPILE_VERSIONS
+        }
+        input_samples = input_samples_of(task_samples)
+        for (version, (theta, phi)), samples in zip(INPUTS, input_samples):
+            i = THETA_PHIS.index((theta, phi))
+            for name, values, analytic_value in [
+                ("fidelity", samples["fidelities"], expected[version].fidelities[i]),
+                ("duration", samples["durations"], expected[version].durations[i]),
+            ]:
+                values = np.array(values, dtype=float)
+                mean = values.mean()
+                std_err = values.std() / math.sqrt(len(values))
+                diff = mean - analytic_value
+                if std_err > 0:
+                    z = diff / std_err
+                else:
+                    z = 0.0 if math.isclose(diff, 0, abs_tol=1e-9) else math.inf
+                flag = ""
+                if abs(z) > max_z:
+                    flag = "  <-- MISMATCH"
+                    ok = False
+                print(
+                    f"{label} {version} theta={theta:.3f} phi={phi:.3f} {name}: "
+                    f"netsquid = {mean:.4f} +- {std_err:.4f}, "
+                    f"analytic = {analytic_value:.4f}, z = {z:.2f}{flag}"
+                )
+
+    print("analytic engine agrees with NetSquid" if ok else "MISMATCH found")
+    return ok
+
+
+class TeleportProtocol(sweep_engine.SweepProtocol):
+    """Teleportation of all `THETA_PHIS` inputs with every compile version, for
+    `sweep_engine.run_spec`."""
+
+    name = "teleport"
+    compile_versions = COMPILE_VERSIONS
+    primary_field = "fidelity"
+
+    def __init__(self, dump: str = "all") -> None:
+        self.dump = dump
+
+    def meta(self) -> Dict[str, Any]:
+        return {"dump": self.dump}
+
+    def tasks(self, cfg: StackNetworkConfig, point_id: Tuple) -> List[parallel.Task]:
+        return point_tasks(cfg, point_id, self.dump)
+
+    def summarize(self, task_samples: List[Dict[str, List]]) -> Dict[str, Dict]:
+        input_samples = input_samples_of(task_samples)
+        round_results = {version: [] for version in COMPILE_VERSIONS}
+        for (version, _), samples in zip(INPUTS, input_samples):
+            round_results[version].append((samples["fidelities"], samples["durations"]))
+        num_times = len(input_samples[0]["fidelities"])
+        fidelities, times = summarize_teleportation(
+            round_results, num_times, return_time=True
+        )
+        return self._entries(fidelities, times, num_times)
+
+    def converged(
+        self, target_std_err: float
+    ) -> Callable[[List[Dict[str, List]]], bool]:
+        return fidelity_converged(target_std_err, self.dump)
+
+    def analytic(self, cfg: StackNetworkConfig) -> Dict[str, Dict]:
+        fidelities, times = analytic_summary(cfg, return_time=True)
+        return self._entries(fidelities, times)
+
+    def _entries(self, fidelities, times, num_times: Optional[int] = None):
+        entries = {}
+        for version in COMPILE_VERSIONS:
+            fidelity, fid_std_err = fidelities[version]
+            duration, dur_std_err = times[version]
+            entries[version] = {
+                "fidelity": fidelity,
+                "fid_std_err": fid_std_err,
+                "duration": duration,
+                "dur_std_err": dur_std_err,
+            }
+            if num_times is not None:
+                entries[version]["num_times"] = num_times
+        return entries
+
+    def dump_data(self, data: Any, filename: str) -> None:
+        dump_data(data, filename)
+
+    def checkpoint_path(self, name: str) -> str:
+        return os.path.join(
+            os.path.dirname(__file__), "sweep_data_teleport", f"{name}_checkpoint.jsonl"
+        )
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# A columnar sweep file is a directory with a `meta.json` and one `.npy` array
+# per field per group (compile version), e.g. `nv/error_rate.npy`. The arrays
+# are memory-mapped when loaded, so only the fields that are used are read.
+COLUMNAR_SUFFIX = ".cols"
+
+
+def json_compatible(data: Any) -> Any:
+    """`data` with NaN floats (e.g. the EPR fidelities of runs without state
+    dumps) replaced by None, since NaN is not valid JSON. `_load_json` reads
+    them back as NaN."""
+    if isinstance(data, float) and math.isnan(data):
+        return None
+    if isinstance(data, dict):
+        return {key: json_compatible(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [json_compatible(value) for value in data]
+    return data
+
+
+def write_columnar(data: Dict[str, Any], path: str) -> None:
+    """Write sweep data in the format of the JSON exports (a list of entries
+    per compile version, plus an optional "meta" dict) as columns."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    Path(tmp_path).mkdir(parents=True)
+
+    groups = {name: entries for name, entries in data.items() if name != "meta"}
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"meta": data.get("meta", {}), "groups": list(groups)}, f, indent=4)
+
+    for name, entries in groups.items():
+        group_dir = os.path.join(tmp_path, name)
+        Path(group_dir).mkdir()
+        fields: List[str] = []
+        for entry in entries:
+            fields += [field for field in entry if field not in fields]
+        for field in fields:
+            values = np.asarray([entry.get(field, np.nan) for entry in entries])
+            np.save(os.path.join(group_dir, f"{field}.npy"), values)
+
+    # Replace an older version (e.g. of the "LAST" file) only when the new one
+    # is complete.
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class SweepData:
+    """Sweep data with one NumPy array per field per group."""
+
+    def __init__(self, meta: Dict[str, Any], columns: Dict[str, Dict[str, Any]]):
+        self.meta = meta
+        self._columns = columns
+
+    @property
+    def groups(self) -> List[str]:
+        return list(self._columns)
+
+    def __getitem__(self, group: str) -> Dict[str, np.ndarray]:
+        return self._columns[group]
+
+
+def _load_columnar(path: str) -> SweepData:
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        header = json.load(f)
+    columns = {}
+    for name in header["groups"]:
+        group_dir = os.path.join(path, name)
+        columns[name] = {
+            file[: -len(".npy")]: np.load(os.path.join(group_dir, file), mmap_mode="r")
+            for file in sorted(os.listdir(group_dir))
+            if file.endswith(".npy")
+        }
+    return SweepData(header["meta"], columns)
+
+
+def _load_json(path: str) -> SweepData:
+    with open(path, "r") as f:
+        data = json.load(f)
+    columns = {}
+    for name, entries in data.items():
+        if name == "meta":
+            continue
+        fields: List[str] = []
+        for entry in entries:
+            fields += [field for field in entry if field not in fields]
+        columns[name] = {
+            field: np.asarray([_value(entry, field) for entry in entries])
+            for field in fields
+        }
+    return SweepData(data.get("meta", {}), columns)
+
+
+def _value(entry: Dict[str, Any], field: str) -> Any:
+    value = entry.get(field)
+    return np.nan if value is None else value
+
+
+def load_sweep_data(path: str) -> SweepData:
+    """Load sweep data from `path`, given with or without extension. The
+    columnar format is used if it exists, otherwise the JSON export."""
+    if path.endswith(".json"):
+        path = path[: -len(".json")]
+    if path.endswith(COLUMNAR_SUFFIX):
+        return _load_columnar(path)
+    if os.path.isdir(path + COLUMNAR_SUFFIX):
+        return _load_columnar(path + COLUMNAR_SUFFIX)
+    if os.path.exists(path + ".json"):
+        return _load_json(path + ".json")
+    return _load_json(path)
@@ -0,0 +1,10 @@
+# Constants of the teleportation simulation that are needed without importing
+# NetSquid and squidasm, e.g. to build the command line parsers.
+
+COMPILE_VERSIONS = ["meas_epr_first", "meas_epr_last"]
+
+# Breakpoints at which the global state is dumped: "all" dumps after the EPR
+# pair is created and after the correction, "final" only after the correction
+# (the state from which the fidelity is computed) and "none" never, in which
+# case the fidelities are NaN. Sender and receiver must use the same mode.
+DUMPS = ["all", "final", "none"]
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, List, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from squidasm.run.stack.config import StackNetworkConfig
+
+# Analytic density-matrix model of the teleportation of SenderProgram and
+# ReceiverProgram on two NV nodes connected by a depolarising link.
+#
+# The input qubit q, the sender's EPR half e_s and the receiver's EPR half e_r
+# are tracked as one 8x8 density matrix per input state. Noise of the native NV
+# gates into which the NetQASM instructions are compiled is accounted for by
+# counting how many depolarising applications hit each qubit in each stage of
+# the protocol (see `GateCounts`). Memory decoherence uses the expected waiting
+# times, where the waiting time for the EPR pair is geometrically distributed.
+# The receiver's X and Z corrections are applied per measurement outcome, with
+# the electron single-qubit gate noise and duration.
+
+I2 = np.eye(2, dtype=complex)
+X = np.array([[0, 1], [1, 0]], dtype=complex)
+Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+Z = np.array([[1, 0], [0, -1]], dtype=complex)
+H = np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2)
+CNOT = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]], dtype=complex)
+PHI_PLUS = np.array([1, 0, 0, 1], dtype=complex) / np.sqrt(2)
+# Receiver corrections Z^m1 X^m2 for measurement outcomes (m1, m2).
+CORRECTIONS = {(0, 0): I2, (0, 1): X, (1, 0): Z, (1, 1): Z @ X}
+
+
+@dataclass(frozen=True)
+class GateCounts:
+    # Depolarising applications of the electron-carbon gate noise that act on
+    # the state to be teleported (before the CNOT), on q between the CNOT and its
+    # measurement, and on e_s between the CNOT and its measurement.
+    ec_noise_input: int
+    ec_noise_q: int
+    ec_noise_epr: int
+    # Electron initializations needed to move q or e_s to the electron before
+    # measuring it.
+    electron_inits_q: int
+    electron_inits_epr: int
+    # Native operations on the critical path, used for the duration.
+    carbon_inits: int
+    carbon_rots: int
+    ec_gates: int
+    electron_inits: int
+    measurements: int
+    flushes: int
+
+
+# The counts depend on how the NV compiler maps the program and were fitted to
+# the NetSquid results in final_data/sweep_data_paper_teleport. They are
+# validated against fresh NetSquid runs at sweep values that are not in that
+# data by `sweep_teleport.crosscheck`.
+GATE_COUNTS = {
+    "meas_epr_first": GateCounts(
+        ec_noise_input=2,
+        ec_noise_q=2,
+        ec_noise_epr=4,
+        electron_inits_q=1,
+        electron_inits_epr=0,
+        carbon_inits=1,
+        carbon_rots=7,
+        ec_gates=5,
+        electron_inits=2,
+        measurements=3,
+        flushes=4,
+    ),
+    "meas_epr_last": GateCounts(
+        ec_noise_input=1,
+        ec_noise_q=9,
+        ec_noise_epr=5,
+        electron_inits_q=1,
+        electron_inits_epr=0,
+        carbon_inits=2,
+        carbon_rots=7,
+        ec_gates=9,
+        electron_inits=2,
+        measurements=3,
+        flushes=4,
+    ),
+}
+GATE_COUNTS["None"] = GATE_COUNTS["meas_epr_last"]
+
+
+@dataclass
+class AnalyticResult:
+    fidelities: np.ndarray
+    durations: np.ndarray
+    # The part of the durations that depends on neither the EPR generation nor
+    # the correction, i.e. on the measurement outcomes.
+    deterministic_duration: float
+
+
+def _value(cfg: Any, name: str, default: float = 0.0) -> float:
+    if cfg is None:
+        return default
+    if isinstance(cfg, dict):
+        value = cfg.get(name, default)
+    else:
+        value = getattr(cfg, name, default)
+    return default if value is None else float(value)
+
+
+def _embed(op: np.ndarray, qubit: int, num_qubits: int) -> np.ndarray:
+    ops = [I2] * num_qubits
+    ops[qubit] = op
+    full = ops[0]
+    for o in ops[1:]:
+        full = np.kron(full, o)
+    return full
+
+
+def _conjugate(rho: np.ndarray, op: np.ndarray) -> np.ndarray:
+    return op @ rho @ op.conj().T
+
+
+def _depolarize(rho: np.ndarray, prob: float, qubit: int, num_qubits: int):
+    # NetSquid convention: with probability `prob` the qubit is replaced by the
+    # maximally mixed state.
+    if prob == 0:
+        return rho
+    paulis = [_embed(p, qubit, num_qubits) for p in (X, Y, Z)]
+    twirled = sum(_conjugate(rho, p) for p in paulis)
+    return (1 - 3 * prob / 4) * rho + (prob / 4) * twirled
+
+
+def _t1t2(rho: np.ndarray, decay_t1: float, decay_t2: float) -> np.ndarray:
+    # Single-qubit T1/T2 channel given exp(-t/T1) and exp(-t/T2). It is linear
+    # in both factors, so expected factors give the expected channel.
+    out = rho.copy()
+    out[..., 1, 1] = rho[..., 1, 1] * decay_t1
+    out[..., 0, 0] = rho[..., 0, 0] + rho[..., 1, 1] * (1 - decay_t1)
+    out[..., 0, 1] = rho[..., 0, 1] * decay_t2
+    out[..., 1, 0] = rho[..., 1, 0] * decay_t2
+    return out
+
+
+def _decay(t: float, t_decay: float) -> float:
+    return 1.0 if t_decay == 0 else float(np.exp(-t / t_decay))
+
+
+def _geometric_decay(t_cycle: float, prob_success: float, t_decay: float) -> float:
+    # E[exp(-k * t_cycle / T)] for k ~ Geometric(prob_success), k >= 1.
+    if t_decay == 0:
+        return 1.0
+    d = np.exp(-t_cycle / t_decay)
+    return float(prob_success * d / (1 - (1 - prob_success) * d))
+
+
+def input_states(theta_phis: List[Tuple[float, float]]) -> np.ndarray:
+    # Rz(phi) Ry(theta) |0>, as prepared by set_qubit_state.
+    thetas = np.array([tp[0] for tp in theta_phis], dtype=float)
+    phis = np.array([tp[1] for tp in theta_phis], dtype=float)
+    return np.stack(
+        [
+            np.exp(-0.5j * phis) * np.cos(thetas / 2),
+            np.exp(0.5j * phis) * np.sin(thetas / 2),
+        ],
+        axis=-1,
+    )
+
+
+def expected_teleportation(
+    cfg: StackNetworkConfig,
+    theta_phis: List[Tuple[float, float]],
+    compile_version: str = "None",
+) -> AnalyticResult:
+    """Expected fidelity and duration of the teleportation of each of the
+    (theta, phi) input states, computed for all inputs at once."""
+    sender, receiver = cfg.stacks[0], cfg.stacks[1]
+    for stack in (sender, receiver):
+        if not stack.qdevice_typ.startswith("nv"):
+            raise ValueError(
+                f"analytic engine only supports NV devices, not {stack.qdevice_typ}"
+            )
+    link = cfg.links[0]
+    if link.typ not in ("depolarise", "perfect"):
+        raise ValueError(f"analytic engine does not support {link.typ} links")
+
+    counts = GATE_COUNTS[compile_version]
+    sq = sender.qdevice_cfg
+    rq = receiver.qdevice_cfg
+
+    if link.typ == "perfect":
+        fidelity, prob_success, t_cycle = 1.0, 1.0, 0.0
+    else:
+        fidelity = _value(link.cfg, "fidelity")
+        prob_success = _value(link.cfg, "prob_success", 1.0)
+        t_cycle = _value(link.cfg, "t_cycle")
+    latency = _value(link.classical_cfg, "latency")
+    host_qnos_latency = _value(sender.classical_cfg, "host_qnos_latency")
+
+    # Durations.
+    prep_time = _value(sq, "carbon_init") + _value(sq, "carbon_rot_y")
+    gate_time = (
+        counts.carbon_inits * _value(sq, "carbon_init")
+        + counts.carbon_rots * _value(sq, "carbon_rot_x")
+        + counts.ec_gates * _value(sq, "ec_controlled_dir_x")
+        + counts.electron_inits * _value(sq, "electron_init")
+        + counts.measurements * _value(sq, "measure")
+        + counts.flushes * 2 * host_qnos_latency
+    )
+    deterministic_duration = gate_time + latency
+    expected_epr_time = t_cycle / prob_success
+    after_epr_time = gate_time - prep_time + latency
+
+    # Input state, with carbon initialization and rotation noise.
+    kets = input_states(theta_phis)
+    num_inputs = len(kets)
+    p_ec = _value(sq, "ec_gate_depolar_prob")
+    rho_q = np.einsum("ka,kb->kab", kets, kets.conj())
+    rho_q = _depolarize(rho_q, _value(sq, "carbon_init_depolar_prob"), 0, 1)
+    rho_q = _depolarize(rho_q, _value(sq, "carbon_z_rot_depolar_prob"), 0, 1)
+    rho_q = _depolarize(rho_q, 1 - (1 - p_ec) ** counts.ec_noise_input, 0, 1)
+
+    # q waits in a carbon while the EPR pair is generated.
+    rho_q = _t1t2(
+        rho_q,
+        _geometric_decay(t_cycle, prob_success, _value(sq, "carbon_T1")),
+        _geometric_decay(t_cycle, prob_success, _value(sq, "carbon_T2")),
+    )
+
+    # Werner state of the depolarising link.
+    prob_max_mixed = (1 - fidelity) * 4.0 / 3.0
+    rho_epr = (1 - prob_max_mixed) * np.outer(PHI_PLUS, PHI_PLUS.conj())
+    rho_epr = rho_epr + prob_max_mixed * np.eye(4) / 4
+
+    rho = np.einsum("kab,cd->kacbd", rho_q, rho_epr).reshape(num_inputs, 8, 8)
+    rho = _conjugate(rho, np.kron(CNOT, I2))
+    rho = _conjugate(rho, np.kron(H, np.eye(4)))
+
+    p_ei = _value(sq, "electron_init_depolar_prob")
+    p_q = 1 - (1 - p_ec) ** counts.ec_noise_q * (1 - p_ei) ** counts.electron_inits_q
+    p_e = (
+        1 - (1 - p_ec) ** counts.ec_noise_epr * (1 - p_ei) ** counts.electron_inits_epr
+    )
+    rho = _depolarize(rho, p_q, 0, 3)
+    rho = _depolarize(rho, p_e, 1, 3)
+
+    # Measure q (m1) and e_s (m2), with readout errors, and correct e_r.
+    readout = np.array(
+        [
+            [1 - _value(sq, "prob_error_0"), _value(sq, "prob_error_0")],
+            [_value(sq, "prob_error_1"), 1 - _value(sq, "prob_error_1")],
+        ]
+    )
+    decay_t1 = _decay(after_epr_time, _value(rq, "electron_T1"))
+    decay_t2 = _decay(after_epr_time, _value(rq, "electron_T2"))
+    p_rot = _value(rq, "electron_single_qubit_depolar_prob")
+    rot_x_time = _value(rq, "electron_rot_x")
+    rot_z_time = _value(rq, "electron_rot_z")
+    rho_out = np.zeros((num_inputs, 2, 2), dtype=complex)
+    correction_time = np.zeros(num_inputs)
+    rho = rho.reshape(num_inputs, 2, 2, 2, 2, 2, 2)
+    for m1 in (0, 1):
+        for m2 in (0, 1):
+            sigma = rho[:, m1, m2, :, m1, m2, :]
+            sigma = _t1t2(sigma, decay_t1, decay_t2)
+            prob_outcome = np.real(np.trace(sigma, axis1=-2, axis2=-1))
+            for r1 in (0, 1):
+                for r2 in (0, 1):
+                    prob = readout[m1, r1] * readout[m2, r2]
+                    # X if r2 == 1, then Z if r1 == 1, each a noisy electron
+                    # rotation.
+                    corrected = _conjugate(sigma, CORRECTIONS[(r1, r2)])
+                    corrected = _depolarize(
+                        corrected, 1 - (1 - p_rot) ** (r1 + r2), 0, 1
+                    )
+                    rho_out += prob * corrected
+                    correction_time += (
+                        prob * prob_outcome * (r2 * rot_x_time + r1 * rot_z_time)
+                    )
+
+    fidelities = np.real(np.einsum("ka,kab,kb->k", kets.conj(), rho_out, kets))
+    durations = deterministic_duration + expected_epr_time + correction_time
+    return AnalyticResult(
+        fidelities=fidelities,
+        durations=durations,
+        deterministic_duration=deterministic_duration,
+    )
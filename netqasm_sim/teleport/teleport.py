@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import math
 import os
-from typing import Any, Dict, Generator, final
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple, final
 
 import netsquid as ns
+import numpy as np
 from netqasm.lang.ir import BreakpointAction, BreakpointRole
 from netqasm.sdk.qubit import Qubit
 from netqasm.sdk.toolbox import set_qubit_state
@@ -18,12 +19,18 @@ from squidasm.run.stack.config import (
     StackConfig,
     StackNetworkConfig,
 )
-from squidasm.run.stack.run import run
 from squidasm.sim.stack.common import LogManager
 from squidasm.sim.stack.csocket import ClassicalSocket
 from squidasm.sim.stack.globals import GlobalSimData
 from squidasm.sim.stack.program import Program, ProgramContext, ProgramMeta
 
+import instrument
+from fidelity import as_density_matrix, squared_fidelities
+from formalism import set_formalism
+from results import OUTCOME, STATE, TIME, IterationResults
+from session import run_programs
+from teleport import DUMPS, analytic
+
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 
@@ -36,10 +43,28 @@ class SenderProgram(Program):
         theta: float,
         phi: float,
         meas_epr_first: bool,
+        results: Optional[IterationResults] = None,
+        schedule: Optional[Sequence[Tuple[float, float]]] = None,
+        dump: str = "all",
     ):
         self._theta = theta
         self._phi = phi
         self._meas_epr_first = meas_epr_first
+        # If given, the results of every iteration are written to `results`
+        # instead of being returned.
+        self._results = results
+        # If given, iteration i teleports the state schedule[i] = (theta, phi)
+        # instead of (theta, phi).
+        self._schedule = schedule
+        # One of `DUMPS`; must match the receiver. Each pair of breakpoints is
+        # counted as one state dump by the sender, as by the BQC client.
+        self._dump = dump
+        self._iteration = 0
+
+    def _input(self) -> Tuple[float, float]:
+        if self._schedule is None:
+            return self._theta, self._phi
+        return self._schedule[self._iteration]
 
     @property
     def meta(self) -> ProgramMeta:
@@ -62,14 +87,18 @@ class SenderProgram(Program):
         epr_socket = context.epr_sockets[self.PEER]
         csocket: ClassicalSocket = context.csockets[self.PEER]
 
+        theta, phi = self._input()
         start_time = ns.sim_time()
         q = Qubit(conn)
-        set_qubit_state(q, self._phi, self._theta)
+        set_qubit_state(q, phi, theta)
 
         e = epr_socket.create()[0]
-        conn.insert_breakpoint(
-            BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.RECEIVE
-        )
+        instrument.count("epr_pairs")
+        if self._dump == "all":
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.RECEIVE
+            )
+            instrument.count("state_dumps")
         q.cnot(e)
 
         if self._meas_epr_first:
@@ -81,25 +110,46 @@ class SenderProgram(Program):
             m1 = q.measure()
             m2 = e.measure()
 
+        instrument.count("flushes")
         yield from conn.flush()
 
         m1, m2 = int(m1), int(m2)
 
         csocket.send_int(m1)
         csocket.send_int(m2)
+        instrument.count("classical_messages", 2)
 
-        conn.insert_breakpoint(
-            BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.RECEIVE
-        )
-        yield from conn.flush()
+        if self._dump != "none":
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.RECEIVE
+            )
+            instrument.count("state_dumps")
+            instrument.count("flushes")
+            yield from conn.flush()
 
         end_time = ns.sim_time()
+        iteration = self._iteration
+        self._iteration += 1
+        if self._results is not None:
+            self._results.record(
+                iteration,
+                m1=m1,
+                m2=m2,
+                sender_start=start_time,
+                sender_end=end_time,
+            )
+            return {}
         return {"m1": m1, "m2": m2, "start_time": start_time, "end_time": end_time}
 
 
 class ReceiverProgram(Program):
     PEER = "sender"
 
+    def __init__(self, results: Optional[IterationResults] = None, dump: str = "all"):
+        self._results = results
+        self._dump = dump
+        self._iteration = 0
+
     @property
     def meta(self) -> ProgramMeta:
         return ProgramMeta(
@@ -120,9 +170,11 @@ class ReceiverProgram(Program):
         start_time = ns.sim_time()
 
         e = epr_socket.recv()[0]
-        conn.insert_breakpoint(
-            BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.CREATE
-        )
+        if self._dump == "all":
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.CREATE
+            )
+        instrument.count("flushes")
         yield from conn.flush()
 
         m1 = yield from csocket.recv_int()
@@ -133,53 +185,171 @@ class ReceiverProgram(Program):
         if m1 == 1:
             e.Z()
 
-        conn.insert_breakpoint(
-            BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.CREATE
-        )
+        if self._dump != "none":
+            conn.insert_breakpoint(
+                BreakpointAction.DUMP_GLOBAL_STATE, BreakpointRole.CREATE
+            )
         e.measure()
+        instrument.count("flushes")
         yield from conn.flush()
 
         end_time = ns.sim_time()
 
-        all_states = GlobalSimData.get_last_breakpoint_state()
-        state = all_states["receiver"][0]
+        state = None
+        if self._dump != "none":
+            with instrument.phase("dump"):
+                all_states = GlobalSimData.get_last_breakpoint_state()
+                state = all_states["receiver"][0]
+                if self._results is not None:
+                    state = as_density_matrix(state)
+        if self._results is not None:
+            self._results.record(
+                self._iteration, receiver_start=start_time, receiver_end=end_time
+            )
+            if state is not None:
+                self._results.record(self._iteration, state=state)
+            self._iteration += 1
+            return {}
         return {"state": state, "start_time": start_time, "end_time": end_time}
 
 
-def do_teleportation(
+# Per-iteration results of the sender and receiver programs.
+TELEPORTATION_FIELDS = {
+    "m1": OUTCOME,
+    "m2": OUTCOME,
+    "state": STATE,
+    "sender_start": TIME,
+    "sender_end": TIME,
+    "receiver_start": TIME,
+    "receiver_end": TIME,
+}
+
+
+def reference_state(theta: float, phi: float) -> np.ndarray:
+    """Density matrix of the state that is teleported for (theta, phi)."""
+    q = qubitapi.create_qubits(1)[0]
+    rot_theta = operators.create_rotation_op(theta, (0, 1, 0))
+    rot_phi = operators.create_rotation_op(phi, (0, 0, 1))
+    qubitapi.operate(q, rot_theta)
+    qubitapi.operate(q, rot_phi)
+    return qubitapi.reduced_dm(q)
+
+
+def teleportation_samples_multi(
     cfg: StackNetworkConfig,
     num_times: int = 1,
-    theta: float = 0.0,
-    phi: float = 0.0,
+    theta_phis: Sequence[Tuple[float, float]] = ((0.0, 0.0),),
     compile_version: str = "None",
     log_level: str = "WARNING",
-) -> float:
+    reuse_network: bool = True,
+    dump: str = "all",
+) -> Dict[str, List]:
+    """Teleport each of `theta_phis` `num_times` times, all in a single
+    simulation run of `len(theta_phis) * num_times` iterations. The samples
+    of each iteration are tagged with the index of its input in `theta_phis`.
+    `dump` is one of `DUMPS`."""
+    if dump not in DUMPS:
+        raise ValueError(f"unknown dump mode {dump}, choose from {DUMPS}")
     LogManager.set_log_level(log_level)
+    # The fidelities are computed from the dumped density matrices.
+    set_formalism("dm")
 
+    inputs = np.repeat(np.arange(len(theta_phis)), num_times)
+    schedule = [tuple(theta_phis[i]) for i in inputs]
+    results = IterationResults(len(schedule), TELEPORTATION_FIELDS)
     meas_epr_first = True if compile_version == "meas_epr_first" else False
-    sender_program = SenderProgram(theta=theta, phi=phi, meas_epr_first=meas_epr_first)
-    receiver_program = ReceiverProgram()
+    theta, phi = theta_phis[0]
+    sender_program = SenderProgram(
+        theta=theta,
+        phi=phi,
+        meas_epr_first=meas_epr_first,
+        results=results,
+        schedule=schedule,
+        dump=dump,
+    )
+    receiver_program = ReceiverProgram(results=results, dump=dump)
 
-    client_results, server_results = run(
+    run_programs(
         cfg,
         {"sender": sender_program, "receiver": receiver_program},
-        num_times=num_times,
+        num_times=len(schedule),
+        reuse_network=reuse_network,
+    )
+
+    durations = results.durations(
+        ("sender_start", "receiver_start"), ("sender_end", "receiver_end")
+    )
+
+    fidelities = np.full(len(schedule), np.nan)
+    if dump != "none":
+        with instrument.phase("fidelity"):
+            references = np.stack(
+                [reference_state(theta, phi) for theta, phi in theta_phis]
+            )
+            fidelities = squared_fidelities(references[inputs], results["state"])
+    return {
+        "fidelities": fidelities.tolist(),
+        "durations": durations.tolist(),
+        "m1s": results["m1"].tolist(),
+        "m2s": results["m2"].tolist(),
+        "inputs": inputs.tolist(),
+    }
+
+
+def teleportation_samples(
+    cfg: StackNetworkConfig,
+    num_times: int = 1,
+    theta: float = 0.0,
+    phi: float = 0.0,
+    compile_version: str = "None",
+    log_level: str = "WARNING",
+    reuse_network: bool = True,
+    dump: str = "all",
+) -> Dict[str, List]:
+    samples = teleportation_samples_multi(
+        cfg,
+        num_times,
+        theta_phis=[(theta, phi)],
+        compile_version=compile_version,
+        log_level=log_level,
+        reuse_network=reuse_network,
+        dump=dump,
     )
+    del samples["inputs"]
+    return samples
 
-    durations = []
-    for c_result, s_result in zip(client_results, server_results):
-        start_time = min(c_result["start_time"], s_result["start_time"])
-        end_time = max(c_result["end_time"], s_result["end_time"])
-        durations.append(end_time - start_time)
 
-    final_states = [r["state"] for r in server_results]
-    # print(f"final states: {final_states}")
-    # print(f"durations: {durations}")
+def do_teleportation(
+    cfg: StackNetworkConfig,
+    num_times: int = 1,
+    theta: float = 0.0,
+    phi: float = 0.0,
+    compile_version: str = "None",
+    log_level: str = "WARNING",
+    dump: str = "all",
+) -> Tuple[List[float], List[float]]:
+    """The fidelities and durations of `num_times` teleportations. See
+    `expected_teleportation` for the analytic engine."""
+    samples = teleportation_samples(
+        cfg,
+        num_times,
+        theta=theta,
+        phi=phi,
+        compile_version=compile_version,
+        log_level=log_level,
+        dump=dump,
+    )
+    return samples["fidelities"], samples["durations"]
 
-    q = qubitapi.create_qubits(1)[0]
-    rot_theta = operators.create_rotation_op(theta, (0, 1, 0))
-    rot_phi = operators.create_rotation_op(phi, (0, 0, 1))
-    qubitapi.operate(q, rot_theta)
-    qubitapi.operate(q, rot_phi)
-    fidelities = [qubitapi.fidelity(q, f, squared=True) for f in final_states]
-    return fidelities, durations
+
+def expected_teleportation(
+    cfg: StackNetworkConfig,
+    theta: float = 0.0,
+    phi: float = 0.0,
+    compile_version: str = "None",
+) -> Tuple[float, float]:
+    """The expected fidelity and duration of a teleportation, computed by the
+    analytic engine. They are exact, not a mean of samples, so there are no
+    standard errors."""
+    result = analytic.expected_teleportation(cfg, [(theta, phi)], compile_version)
+    return float(result.fidelities[0]), float(result.durations[0])
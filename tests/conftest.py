@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules of netqasm_sim import each other as top-level modules, like the
+# scripts in it do.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "netqasm_sim"))
@@ -0,0 +1,175 @@
+import json
+
+import numpy as np
+import pytest
+
+import active
+import parallel
+from emulator import Emulator
+from sweep_engine import SweepProtocol, SweepSpec
+
+SPEC = {"name": "active", "parameters": [{"path": "x", "values": [0.0, 0.5, 1.0]}]}
+
+
+class Config:
+    def __init__(self, x=0.0):
+        self.x = x
+
+    def json(self):
+        return json.dumps({"x": self.x})
+
+
+class Protocol(SweepProtocol):
+    name = "test"
+    compile_versions = ["v1", "v2"]
+    primary_field = "fidelity"
+
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.dumped = []
+
+    def tasks(self, cfg, point_id):
+        return []
+
+    def summarize(self, task_samples):
+        return {}
+
+    def converged(self, target_std_err):
+        return lambda task_samples: True
+
+    def analytic(self, cfg):
+        return {}
+
+    def dump_data(self, data, filename):
+        self.dumped.append(data)
+
+    def checkpoint_path(self, name):
+        return str(self.tmp_path / f"{name}_checkpoint.jsonl")
+
+
+class Executor:
+    """Summaries of a curved function with noise seeded by the point id, like
+    the seeds of `parallel.run_points`."""
+
+    def __init__(self, std_err=0.01, fail_after=None):
+        self.std_err = std_err
+        self.fail_after = fail_after
+        self.calls = []
+        self.ran = []
+
+    def prepare(self, checkpoint_path, resume):
+        pass
+
+    def meta(self):
+        return {"engine": "stub", "seed": 7}
+
+    def run(self, protocol, cfgs, point_ids):
+        self.calls.append(list(point_ids))
+        for i, (cfg, point_id) in enumerate(zip(cfgs, point_ids)):
+            if self.fail_after is not None and self.num_run >= self.fail_after:
+                raise RuntimeError("interrupted")
+            rng = np.random.default_rng(parallel.derive_seed(7, *point_id))
+            summary = {}
+            for version, scale in [("v1", 1.0), ("v2", 0.5)]:
+                value = scale * np.exp(-5 * cfg.x**2) + rng.normal(0, self.std_err)
+                summary[version] = {"fidelity": value, "fid_std_err": self.std_err}
+            self.ran.append(point_id)
+            yield i, summary
+
+    @property
+    def num_run(self):
+        return len(self.ran)
+
+
+def run(tmp_path, executor, budget=9, batch_size=4, resume=False):
+    protocol = Protocol(tmp_path)
+    spec = SweepSpec.from_dict(SPEC)
+    return active.run_active(
+        spec, Config(), protocol, executor, budget, batch_size, resume=resume
+    )
+
+
+def keys(data):
+    return [tuple(e["point"]) + (e["repetition"],) for e in data["v1"]]
+
+
+def test_coarse_pass_first(tmp_path):
+    executor = Executor()
+    run(tmp_path, executor)
+    assert executor.calls[0] == [(0.0, 0), (0.5, 0), (1.0, 0)]
+    assert all(len(call) <= 4 for call in executor.calls[1:])
+
+
+@pytest.mark.parametrize("budget, batch_size", [(3, 4), (8, 4), (9, 4), (10, 3)])
+def test_budget_is_not_exceeded(tmp_path, budget, batch_size):
+    executor = Executor()
+    data = run(tmp_path, executor, budget, batch_size)
+    assert executor.num_run == budget
+    assert len(data["v1"]) == len(data["v2"]) == budget
+
+
+def test_budget_below_coarse_pass(tmp_path):
+    with pytest.raises(ValueError, match="budget"):
+        run(tmp_path, Executor(), budget=2)
+
+
+def test_new_points_keep_min_gap(tmp_path):
+    executor = Executor(std_err=0.0)
+    data = run(tmp_path, executor, budget=11)
+    points = [e["point"][0] for e in data["v1"] if e["repetition"] == 0]
+    # Without noise, no point is repeated.
+    assert len(points) == 11
+    planned = [0.0, 0.5, 1.0]
+    for call in executor.calls[1:]:
+        new = [point_id[0] for point_id in call]
+        min_gap = active.MIN_GAP * len(planned) ** -1.0
+        for x in new:
+            assert min(abs(x - p) for p in planned) > min_gap - 1e-12
+        planned += new
+
+
+def test_select_points_respects_min_gap():
+    x = np.array([[0.0], [0.5], [1.0]])
+    emulators = {
+        "v1": Emulator(["x"], [False], x, np.array([1.0, 0.2, 0.0]), np.zeros(3))
+    }
+    emulators["v1"].fit()
+    points = [(0.0,), (0.5,), (1.0,)]
+    candidates = [(v,) for v in np.linspace(0, 1, 101)]
+    selected = active.select_points(emulators, points, candidates, 4)
+    min_gap = active.MIN_GAP * 3**-1.0
+    for (value,) in selected:
+        assert min(abs(value - p) for (p,) in points) > min_gap
+
+
+def test_repeated_points_get_distinct_keys(tmp_path, monkeypatch):
+    # No candidate is far enough from the coarse points, so every pick is a
+    # repetition of a noisy point.
+    monkeypatch.setattr(active, "MIN_GAP", 10.0)
+    executor = Executor(std_err=0.05)
+    data = run(tmp_path, executor, budget=9)
+    point_ids = [point_id for call in executor.calls for point_id in call]
+    assert len(point_ids) == 9
+    assert len(set(point_ids)) == 9
+    assert any(point_id[-1] > 0 for point_id in point_ids)
+    assert sorted(keys(data)) == sorted(point_ids)
+    seeds = {parallel.derive_seed(7, *point_id, 0) for point_id in point_ids}
+    assert len(seeds) == 9
+
+
+def test_resume_plans_same_points(tmp_path):
+    full = run(tmp_path / "full", Executor())
+
+    interrupted = Executor(fail_after=5)
+    with pytest.raises(RuntimeError):
+        run(tmp_path / "resumed", interrupted)
+    resumed_executor = Executor()
+    resumed = run(tmp_path / "resumed", resumed_executor, resume=True)
+
+    assert keys(resumed) == keys(full)
+    # Only the points that were not checkpointed are simulated again.
+    assert resumed_executor.num_run == 9 - interrupted.num_run
+    for version in ["v1", "v2"]:
+        assert [e["fidelity"] for e in resumed[version]] == [
+            e["fidelity"] for e in full[version]
+        ]
@@ -0,0 +1,47 @@
+import math
+import os
+
+import pytest
+
+pytest.importorskip("netsquid")
+pytest.importorskip("squidasm")
+
+from squidasm.run.stack.config import StackNetworkConfig  # noqa: E402
+
+from bqc import bqc  # noqa: E402
+
+CONFIG = os.path.join(
+    os.path.dirname(__file__), "..", "netqasm_sim", "configs", "near_perfect_nv.yaml"
+)
+NUM_TIMES = 3
+ANGLES = dict(alpha=0.5, beta=1.0, theta1=0.25, theta2=0.75)
+
+
+@pytest.fixture
+def cfg():
+    return StackNetworkConfig.from_file(CONFIG)
+
+
+def test_computation_round_dumps_output_state(cfg):
+    fidelities, durations = bqc.computation_round(
+        cfg, num_times=NUM_TIMES, dump_state=True, **ANGLES
+    )
+
+    assert len(fidelities) == len(durations) == NUM_TIMES
+    for fidelity in fidelities:
+        assert 0.9 < fidelity <= 1.0 + 1e-9
+    assert all(duration > 0 for duration in durations)
+
+
+def test_computation_round_without_dump(cfg):
+    fidelities, durations = bqc.computation_round(
+        cfg, num_times=NUM_TIMES, dump_state=False, **ANGLES
+    )
+
+    assert len(durations) == NUM_TIMES
+    assert all(math.isnan(fidelity) for fidelity in fidelities)
+
+
+def test_server_dumps_are_exclusive():
+    with pytest.raises(ValueError):
+        bqc.ServerProgram("None", dump_state=True, dump_output=True)
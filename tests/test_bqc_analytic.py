@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from bqc import COMPILE_VERSIONS, analytic
+
+
+@pytest.mark.parametrize("version", COMPILE_VERSIONS)
+def test_perfect_trap_rounds(version):
+    model = analytic.expected_trap_rounds(version, 0.0, 1.0)
+    assert np.isclose(model.error_rate, 0)
+    assert np.isclose(model.epr_fid1, 1)
+    assert np.isclose(model.epr_fid2, 1)
+
+
+@pytest.mark.parametrize("version", COMPILE_VERSIONS)
+def test_maximally_mixed_link(version):
+    # A link fidelity of 1/4 gives maximally mixed EPR pairs.
+    model = analytic.expected_trap_rounds(version, 0.0, 0.25)
+    assert np.isclose(model.error_rate, 0.5)
+    assert np.isclose(model.epr_fid1, 0.5)
+
+
+def test_broadcasts_over_grid():
+    probs = np.linspace(0, 0.1, 5)
+    fidelities = np.linspace(0.8, 1, 3)
+    model = analytic.expected_trap_rounds(
+        "nv", probs[:, None], fidelities[None, :], prob_error_0=0.01
+    )
+    assert model.error_rate.shape == (5, 3)
+    for i, prob in enumerate(probs):
+        for j, fidelity in enumerate(fidelities):
+            point = analytic.expected_trap_rounds(
+                "nv", prob, fidelity, prob_error_0=0.01
+            )
+            assert np.isclose(model.error_rate[i, j], point.error_rate)
+
+    # More gate noise and a worse link give more errors.
+    assert np.all(np.diff(model.error_rate, axis=0) > 0)
+    assert np.all(np.diff(model.error_rate, axis=1) < 0)
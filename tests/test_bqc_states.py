@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pytest
+
+from bqc import states
+from bqc.states import h0, h1, s0, s1, y0, y1
+
+PI = math.pi
+PI_OVER_2 = math.pi / 2
+ANGLES = [0, PI_OVER_2, PI, -PI_OVER_2]
+
+
+# The if/elif chains that the tables replaced, with the same exact float
+# comparisons, returning kets instead of NetSquid qubits.
+def old_expected_rsp_state(theta, p, dummy):
+    expected = s0
+    if dummy:
+        if p == 0:
+            expected = s0
+        elif p == 1:
+            expected = s1
+    else:
+        if (theta, p) == (0, 0):
+            expected = h0
+        elif (theta, p) == (0, 1):
+            expected = h1
+        if (theta, p) == (PI_OVER_2, 0):
+            expected = y0
+        elif (theta, p) == (PI_OVER_2, 1):
+            expected = y1
+        if (theta, p) == (PI, 0):
+            expected = h1
+        elif (theta, p) == (PI, 1):
+            expected = h0
+        if (theta, p) == (-PI_OVER_2, 0):
+            expected = y1
+        elif (theta, p) == (-PI_OVER_2, 1):
+            expected = y0
+    return expected
+
+
+def old_expected_state(alpha, beta):
+    return {
+        (0, 0): h0,
+        (0, PI_OVER_2): h0,
+        (0, PI): h0,
+        (0, -PI_OVER_2): h0,
+        (PI_OVER_2, 0): y0,
+        (PI_OVER_2, PI_OVER_2): s0,
+        (PI_OVER_2, PI): y1,
+        (PI_OVER_2, -PI_OVER_2): s1,
+        (PI, 0): h1,
+        (PI, PI_OVER_2): h1,
+        (PI, PI): h1,
+        (PI, -PI_OVER_2): h1,
+        (-PI_OVER_2, 0): y1,
+        (-PI_OVER_2, PI_OVER_2): s1,
+        (-PI_OVER_2, PI): y0,
+        (-PI_OVER_2, -PI_OVER_2): s0,
+    }.get((alpha, beta), s0)
+
+
+def dm(ket):
+    return np.outer(ket, ket.conj())
+
+
+@pytest.mark.parametrize("theta", ANGLES)
+@pytest.mark.parametrize("p", [0, 1])
+@pytest.mark.parametrize("dummy", [False, True])
+def test_rsp_table_matches_old_chain(theta, p, dummy):
+    expected = dm(old_expected_rsp_state(theta, p, dummy))
+    assert np.allclose(states.expected_rsp_state(theta, p, dummy), expected)
+
+
+@pytest.mark.parametrize("alpha", ANGLES)
+@pytest.mark.parametrize("beta", ANGLES)
+def test_computation_table_matches_old_chain(alpha, beta):
+    expected = dm(old_expected_state(alpha, beta))
+    assert np.allclose(states.expected_state(alpha, beta), expected)
+    # The old code rotated the expected state by Z for m1 = 1.
+    z = np.diag([1, -1])
+    assert np.allclose(states.expected_state(alpha, beta, 1), z @ expected @ z)
+
+
+def test_equivalent_angles():
+    assert np.array_equal(
+        states.expected_rsp_state(2 * math.pi / 4, 0, False),
+        states.expected_rsp_state(PI_OVER_2, 0, False),
+    )
+    assert np.array_equal(
+        states.expected_state(3 * PI_OVER_2, PI), states.expected_state(-PI_OVER_2, PI)
+    )
+
+
+def test_rejects_other_angles():
+    with pytest.raises(ValueError):
+        states.expected_rsp_state(PI / 4, 0, False)
+
+
+def test_tables_are_read_only():
+    with pytest.raises(TypeError):
+        states.RSP_STATES[(0, 0, False)] = np.eye(2)
+    with pytest.raises(ValueError):
+        states.expected_state(0, 0)[0, 0] = 0
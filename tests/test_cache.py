@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import cache
+from cache import ResultCache
+
+SAMPLES = {"fidelities": [0.5] * 100}
+
+
+def entry_size(tmp_path):
+    ResultCache(str(tmp_path / "size")).put("00", SAMPLES)
+    return os.path.getsize(tmp_path / "size" / "00" / "00.json")
+
+
+def cached_keys(directory):
+    return sorted(path.stem for path in Path(directory).glob("*/*.json"))
+
+
+def test_evicts_to_below_maximum(tmp_path):
+    size = entry_size(tmp_path)
+    directory = str(tmp_path / "cache")
+    c = ResultCache(directory, max_size=int(3.2 * size))
+    for i in range(4):
+        c.put(f"{i:02d}", SAMPLES)
+    # Evicted down to 90% of the maximum size, i.e. 2.88 entries.
+    assert len(cached_keys(directory)) == 2
+
+
+def test_get_put(tmp_path):
+    c = ResultCache(str(tmp_path))
+    assert c.get("ab12") is None
+    c.put("ab12", SAMPLES)
+    assert c.get("ab12") == SAMPLES
+
+
+def test_evicts_least_recently_used(tmp_path):
+    size = entry_size(tmp_path)
+    directory = str(tmp_path / "cache")
+    c = ResultCache(directory, max_size=int(4.5 * size))
+    for i in range(4):
+        c.put(f"{i:02d}", SAMPLES)
+        os.utime(c._path(f"{i:02d}"), (i, i))
+    c.get("00")
+
+    c.put("04", SAMPLES)
+    assert cached_keys(directory) == ["00", "02", "03", "04"]
+
+
+def test_only_counts_cache_when_needed(tmp_path, monkeypatch):
+    size = entry_size(tmp_path)
+    c = ResultCache(str(tmp_path / "cache"), max_size=1000 * size)
+    counts = []
+    evict = ResultCache._evict
+    monkeypatch.setattr(
+        ResultCache, "_evict", lambda self: counts.append(1) or evict(self)
+    )
+
+    for i in range(2 * cache.RECOUNT_WRITES + 3):
+        c.put(f"{i:04d}", SAMPLES)
+    assert len(counts) == 3
+
+
+@pytest.mark.parametrize("other_writes", [1, cache.RECOUNT_WRITES])
+def test_picks_up_writes_of_other_processes(tmp_path, other_writes):
+    size = entry_size(tmp_path)
+    directory = str(tmp_path / "cache")
+    c = ResultCache(directory, max_size=int((other_writes + 1.5) * size))
+    c.put("aa00", SAMPLES)
+    # Entries written by another process, which this process does not track.
+    for i in range(other_writes):
+        path = Path(c._path(f"bb{i:02d}"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(Path(c._path("aa00")).read_text())
+    for i in range(cache.RECOUNT_WRITES + 1):
+        c.put(f"cc{i:03d}", SAMPLES)
+
+    total = sum(p.stat().st_size for p in Path(directory).glob("*/*.json"))
+    assert total <= c._max_size
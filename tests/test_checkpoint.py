@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from checkpoint import Checkpoint, read_checkpoint_meta
+
+META = {"config": "cfg", "num_times": 10, "seed": 42, "shard_size": None}
+
+
+def test_resume_keeps_finished_points(tmp_path):
+    path = str(tmp_path / "sweep_checkpoint.jsonl")
+    checkpoint = Checkpoint(path, meta=META)
+    checkpoint.record(("v1", 0.1), {"fidelity": 0.9})
+    checkpoint.record(("v1", 0.2), {"fidelity": 0.8})
+
+    assert read_checkpoint_meta(path) == META
+    resumed = Checkpoint(path, meta=META, resume=True)
+    assert ("v1", 0.1) in resumed
+    assert ("v1", 0.2) in resumed
+    assert ("v2", 0.1) not in resumed
+    assert resumed.get(("v1", 0.2)) == {"fidelity": 0.8}
+
+
+def test_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / "sweep_checkpoint.jsonl")
+    Checkpoint(path, meta=META).record(("v1", 0.1), {"fidelity": 0.9})
+
+    checkpoint = Checkpoint(path, meta=META)
+    assert ("v1", 0.1) not in checkpoint
+
+
+def test_resume_drops_partially_written_line(tmp_path):
+    path = str(tmp_path / "sweep_checkpoint.jsonl")
+    Checkpoint(path, meta=META).record(("v1", 0.1), {"fidelity": 0.9})
+    # The process was killed while writing the next record.
+    with open(path, "a") as f:
+        f.write('{"key": ["v1", 0.2], "ent')
+
+    resumed = Checkpoint(path, meta=META, resume=True)
+    assert ("v1", 0.1) in resumed
+    assert ("v1", 0.2) not in resumed
+    resumed.record(("v1", 0.2), {"fidelity": 0.8})
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r.get("key") for r in records[1:]] == [["v1", 0.1], ["v1", 0.2]]
+
+
+def test_resume_rejects_other_sweep(tmp_path):
+    path = str(tmp_path / "sweep_checkpoint.jsonl")
+    Checkpoint(path, meta=META)
+    with pytest.raises(ValueError):
+        Checkpoint(path, meta={**META, "seed": 43}, resume=True)
+
+
+def test_resume_without_checkpoint_starts_fresh(tmp_path):
+    path = str(tmp_path / "sub" / "sweep_checkpoint.jsonl")
+    checkpoint = Checkpoint(path, meta=META, resume=True)
+    assert ("v1", 0.1) not in checkpoint
+    assert read_checkpoint_meta(path) == META
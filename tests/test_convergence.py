@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+pytest.importorskip("netsquid")
+pytest.importorskip("squidasm")
+
+import stats  # noqa: E402
+import sweep_bqc  # noqa: E402
+import sweep_teleport  # noqa: E402
+
+
+def trap_samples(num_times, fail_prob=0.0):
+    # The samples of a `trap_task`, with the inputs of every iteration.
+    num_inputs = len(sweep_bqc.TRAP_INPUTS)
+    inputs = [i for i in range(num_inputs) for _ in range(num_times)]
+    return {
+        "fails": [int(random.random() < fail_prob) for _ in inputs],
+        "durations": [1.0 for _ in inputs],
+        "fid1s": [1.0 for _ in inputs],
+        "fid2s": [1.0 for _ in inputs],
+        "inputs": inputs,
+    }
+
+
+def teleport_samples(num_times, fidelity=1.0):
+    num_inputs = len(sweep_teleport.THETA_PHIS)
+    inputs = [i for i in range(num_inputs) for _ in range(num_times)]
+    return {
+        "fidelities": [fidelity for _ in inputs],
+        "durations": [1.0 for _ in inputs],
+        "inputs": inputs,
+    }
+
+
+def test_error_rate_needs_min_iterations():
+    converged = sweep_bqc.error_rate_converged(0.1)
+    # Without any fails, a single batch must not stop the point.
+    assert not converged([trap_samples(50)])
+    assert converged([trap_samples(stats.MIN_ADAPTIVE_ITERATIONS)])
+
+
+def test_error_rate_without_fails_is_bounded():
+    n = stats.MIN_ADAPTIVE_ITERATIONS
+    converged = sweep_bqc.error_rate_converged(0.001)
+    assert not converged([trap_samples(n)])
+
+    round_results = [
+        sweep_bqc.bqc.trap_round_result(s)
+        for s in sweep_bqc.parallel.split_inputs(trap_samples(n), 4)
+    ]
+    error_rate, _, _ = sweep_bqc.summarize_trap_rounds(round_results, n)
+    assert error_rate.mean == 0
+    assert error_rate.std_error > 0
+
+
+def test_error_rate_checks_every_task():
+    n = stats.MIN_ADAPTIVE_ITERATIONS
+    random.seed(1)
+    converged = sweep_bqc.error_rate_converged(0.01)
+    assert converged([trap_samples(n), trap_samples(n)])
+    assert not converged([trap_samples(n), trap_samples(n, fail_prob=0.5)])
+
+
+def test_fidelity_needs_min_iterations():
+    converged = sweep_teleport.fidelity_converged(0.1)
+    versions = sweep_teleport.COMPILE_VERSIONS
+    assert not converged([teleport_samples(50) for _ in versions])
+    n = stats.MIN_ADAPTIVE_ITERATIONS
+    assert converged([teleport_samples(n) for _ in versions])
+    assert not sweep_teleport.fidelity_converged(0.0001)(
+        [teleport_samples(n) for _ in versions]
+    )
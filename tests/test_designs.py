@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import designs
+
+
+def test_latin_hypercube_strata():
+    rng = np.random.default_rng(1)
+    points = designs.latin_hypercube(20, 3, rng)
+    assert points.shape == (20, 3)
+    assert np.all((points >= 0) & (points < 1))
+    for d in range(3):
+        # Every one of the 20 strata of every dimension holds one point.
+        strata = np.floor(points[:, d] * 20).astype(int)
+        assert sorted(strata) == list(range(20))
+
+
+def test_unscrambled_sobol_start():
+    points = designs.sobol(4, 2, scramble=False)
+    assert np.array_equal(points[:, 0], [0, 0.5, 0.25, 0.75])
+    assert np.array_equal(points[:, 1], [0, 0.5, 0.75, 0.25])
+
+
+def counts(points, levels):
+    """Number of points in every elementary box with `2**levels[d]` intervals
+    in dimension d."""
+    cells = [np.floor(points[:, d] * 2**k).astype(int) for d, k in enumerate(levels)]
+    boxes = np.ravel_multi_index(cells, [2**k for k in levels])
+    return np.bincount(boxes, minlength=int(np.prod([2**k for k in levels])))
+
+
+@pytest.mark.parametrize("scramble", [False, True])
+def test_sobol_balance(scramble):
+    m = 6
+    rng = np.random.default_rng(3)
+    points = designs.sobol(2**m, designs.SOBOL_MAX_DIMENSIONS, rng, scramble)
+    assert np.all((points >= 0) & (points < 1))
+    assert len(np.unique(points, axis=0)) == 2**m
+
+    # Every one-dimensional projection is a (0, m, 1)-net: every interval of
+    # length 2^-k holds 2^(m-k) points.
+    for d in range(designs.SOBOL_MAX_DIMENSIONS):
+        for k in range(m + 1):
+            assert np.all(counts(points[:, [d]], [k]) == 2 ** (m - k))
+
+    # The first two dimensions form a (0, m, 2)-net: every elementary box of
+    # volume 2^-m holds exactly one point.
+    for a in range(m + 1):
+        assert np.all(counts(points[:, :2], [a, m - a]) == 1)
+
+
+def test_sobol_scrambling_is_seeded():
+    first = designs.unit_points("sobol", 16, 3, seed=7)
+    assert np.array_equal(first, designs.unit_points("sobol", 16, 3, seed=7))
+    assert not np.array_equal(first, designs.unit_points("sobol", 16, 3, seed=8))
+    assert not np.array_equal(first, designs.sobol(16, 3, scramble=False))
+
+
+def test_sobol_errors():
+    with pytest.raises(ValueError):
+        designs.sobol(4, designs.SOBOL_MAX_DIMENSIONS + 1, scramble=False)
+    with pytest.raises(ValueError):
+        designs.sobol(4, 2)
+    with pytest.raises(ValueError):
+        designs.unit_points("grid", 4, 2, seed=0)
+
+
+def test_scale_points():
+    unit = np.array([[0.0, 0.0], [0.5, 0.5], [1.0, 1.0]])
+    points = designs.scale_points(unit, [(1, 3), (1e-4, 1e-2)], [False, True])
+    expected = [(1, 1e-4), (2, 1e-3), (3, 1e-2)]
+    for point, e in zip(points, expected):
+        assert point == pytest.approx(e)
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from emulator import Emulator, fit_emulator, std_err_field
+from sweepdata import load_sweep_data, write_columnar
+
+
+def smooth(x):
+    return 0.9 - 0.3 * x[:, 0] ** 2 + 0.1 * np.sin(3 * x[:, 1])
+
+
+def fitted(noise=0.001):
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 1, size=(40, 2))
+    std_err = np.full(len(x), noise)
+    y = smooth(x) + rng.normal(0, noise, size=len(x))
+    return Emulator(["a", "b"], [False, False], x, y, std_err).fit()
+
+
+def test_interpolates_smooth_function():
+    emulator = fitted()
+    rng = np.random.default_rng(2)
+    x = rng.uniform(0.1, 0.9, size=(50, 2))
+    mean, std = emulator.predict(x)
+    error = np.abs(mean - smooth(x))
+    assert np.all(error < 0.01)
+    # The reported uncertainty covers the error (up to a few points).
+    assert np.mean(error <= 3 * std) > 0.9
+
+
+def test_std_grows_away_from_data():
+    emulator = fitted()
+    _, std = emulator.predict([[0.5, 0.5], [1.5, 1.5], [3.0, 3.0]])
+    assert std[0] < std[1] < std[2]
+
+
+def test_noisy_points_are_not_interpolated():
+    x = np.linspace(0, 1, 20)[:, None]
+    y = np.where(np.arange(20) % 2 == 0, 1.0, 0.0)
+    emulator = Emulator(["a"], [False], x, y, np.full(20, 0.5)).fit()
+    mean, std = emulator.predict(x)
+    assert np.all(np.abs(mean - 0.5) < 0.25)
+    assert np.all(std > 0.05)
+
+
+def test_with_points_reduces_std():
+    emulator = fitted()
+    point = [[1.5, 1.5]]
+    _, before = emulator.predict(point)
+    _, after = emulator.with_points(point, [0.5], [0.001]).predict(point)
+    assert after[0] < before[0] / 2
+    # The original is unchanged.
+    np.testing.assert_array_equal(emulator.predict(point)[1], before)
+
+
+def test_save_load_round_trip(tmp_path):
+    emulator = fitted()
+    path = str(tmp_path / "model.npz")
+    emulator.save(path)
+    loaded = Emulator.load(path)
+    assert loaded.names == emulator.names
+    assert loaded.fingerprint() == emulator.fingerprint()
+    np.testing.assert_array_equal(loaded.length_scales, emulator.length_scales)
+    x = [[0.2, 0.3], [2.0, -1.0]]
+    for a, b in zip(loaded.predict(x), emulator.predict(x)):
+        np.testing.assert_allclose(a, b)
+
+
+def sweep_file(tmp_path, values):
+    data = {
+        "nv": [
+            {"sweep_value": float(v), "error_rate": 0.1 + v, "std_err": 0.01}
+            for v in values
+        ]
+    }
+    path = str(tmp_path / "sweep.cols")
+    write_columnar(data, path)
+    return load_sweep_data(path)
+
+
+def test_fit_emulator_reuses_model_of_same_data(tmp_path):
+    model_file = str(tmp_path / "model.npz")
+    data = sweep_file(tmp_path, np.linspace(0, 0.1, 5))
+    first = fit_emulator(data, "nv", "error_rate", model_file)
+    # A model file that does not match the data is fitted again.
+    first.length_scales = first.length_scales * 3
+    first.save(model_file)
+    assert np.all(
+        fit_emulator(data, "nv", "error_rate", model_file).length_scales
+        == first.length_scales
+    )
+    other = sweep_file(tmp_path, np.linspace(0, 0.2, 5))
+    refitted = fit_emulator(other, "nv", "error_rate", model_file)
+    assert refitted.fingerprint() != first.fingerprint()
+
+
+@pytest.mark.parametrize(
+    "field, columns, expected",
+    [
+        ("fidelity", ["fidelity", "fid_std_err"], "fid_std_err"),
+        ("error_rate", ["error_rate", "std_err"], "std_err"),
+        ("duration", ["duration", "duration_std_err"], "duration_std_err"),
+        ("epr_fid1", ["epr_fid1"], None),
+    ],
+)
+def test_std_err_field(field, columns, expected):
+    assert std_err_field(field, {name: None for name in columns}) == expected
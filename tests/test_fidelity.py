@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from fidelity import as_density_matrices, as_density_matrix, squared_fidelities
+
+rng = np.random.default_rng(42)
+
+
+def random_ket():
+    ket = rng.normal(size=2) + 1j * rng.normal(size=2)
+    return ket / np.linalg.norm(ket)
+
+
+def random_density_matrix():
+    a = rng.normal(size=(2, 2)) + 1j * rng.normal(size=(2, 2))
+    rho = a @ a.conj().T
+    return rho / np.trace(rho)
+
+
+def sqrtm(a):
+    values, vectors = np.linalg.eigh(a)
+    return vectors @ np.diag(np.sqrt(np.clip(values, 0, None))) @ vectors.conj().T
+
+
+def uhlmann_fidelity(a, b):
+    # Squared fidelity (tr sqrt(sqrt(a) b sqrt(a)))^2 of two density matrices,
+    # as computed by qubitapi.fidelity(..., squared=True).
+    root = sqrtm(a)
+    return np.real(np.trace(sqrtm(root @ b @ root))) ** 2
+
+
+def test_matches_uhlmann_fidelity():
+    references = np.stack([as_density_matrix(random_ket()) for _ in range(20)])
+    states = [random_density_matrix() for _ in range(10)]
+    states += [random_ket() for _ in range(5)]
+    states += [random_ket().reshape(2, 1) for _ in range(5)]
+
+    expected = [
+        uhlmann_fidelity(ref, as_density_matrix(state))
+        for ref, state in zip(references, states)
+    ]
+    assert np.allclose(squared_fidelities(references, states), expected)
+
+
+def test_single_reference():
+    reference = as_density_matrix([1, 0])
+    states = [[1, 0], [0, 1], np.eye(2) / 2, [1 / np.sqrt(2), 1j / np.sqrt(2)]]
+    assert np.allclose(squared_fidelities(reference, states), [1, 0, 0.5, 0.5])
+
+
+def test_array_of_density_matrices():
+    rhos = np.stack([random_density_matrix() for _ in range(4)])
+    assert as_density_matrices(rhos) is rhos
+    reference = as_density_matrix(random_ket())
+    expected = [uhlmann_fidelity(reference, rho) for rho in rhos]
+    assert np.allclose(squared_fidelities(reference, rhos), expected)
+
+
+def test_no_states():
+    assert as_density_matrices([]).shape == (0, 2, 2)
+    assert squared_fidelities(np.eye(2), []).shape == (0,)
+
+
+@pytest.mark.parametrize("ket", [[1, 1j], [[0.6], [0.8]]])
+def test_as_density_matrix(ket):
+    rho = as_density_matrix(np.asarray(ket) / np.linalg.norm(ket))
+    assert rho.shape == (2, 2)
+    assert np.isclose(np.trace(rho), 1)
+    assert np.allclose(rho, rho.conj().T)
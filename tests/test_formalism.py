@@ -0,0 +1,38 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from formalism import check_formalism
+
+
+def config(typ="generic", t1=0):
+    stacks = [
+        SimpleNamespace(name=name, qdevice_typ=typ, qdevice_cfg={"T1": t1, "T2": 0})
+        for name in ["client", "server"]
+    ]
+    return SimpleNamespace(stacks=stacks)
+
+
+def test_clifford_pauli_config():
+    check_formalism("stab", config(), [0, math.pi / 2, -math.pi, 3 * math.pi / 2])
+
+
+@pytest.mark.parametrize("name", ["dm", "ket"])
+def test_other_formalisms_accept_everything(name):
+    check_formalism(name, config("nv", t1=1e12), [math.pi / 4])
+
+
+def test_rejects_nv_devices():
+    with pytest.raises(ValueError, match="generic devices"):
+        check_formalism("stab", config("nv"))
+
+
+def test_rejects_amplitude_damping():
+    with pytest.raises(ValueError, match="T1"):
+        check_formalism("stab", config(t1=1e9))
+
+
+def test_rejects_non_clifford_rotations():
+    with pytest.raises(ValueError, match="multiples of pi/2"):
+        check_formalism("stab", config(), [0, math.pi / 4])
@@ -0,0 +1,151 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import instrument
+import sweep_engine
+
+
+@pytest.fixture(autouse=True)
+def clean_instrument():
+    instrument.enable(False)
+    instrument.reset()
+    yield
+    instrument.enable(False)
+    instrument.reset()
+
+
+def test_disabled_records_nothing():
+    with instrument.phase("run"):
+        instrument.count("flushes")
+
+    assert instrument.report() == {"phases": {}, "counts": {}}
+
+
+def test_phase_and_count():
+    instrument.enable()
+    with instrument.phase("run"):
+        instrument.count("flushes")
+        instrument.count("flushes", 2)
+
+    r = instrument.report()
+    assert r["counts"] == {"flushes": 3}
+    assert r["phases"]["run"] >= 0
+    assert "events" not in r
+
+
+def test_nested_phases_add_up(monkeypatch):
+    clock = iter([0.0, 1.0, 4.0, 6.0])
+    monkeypatch.setattr(instrument.time, "perf_counter", lambda: next(clock))
+    instrument.enable()
+    with instrument.phase("outer"):
+        with instrument.phase("inner"):
+            pass
+
+    # The outer phase excludes the time of the inner one.
+    assert instrument.totals() == {"outer": 3.0, "inner": 3.0}
+
+
+def test_timeline_events(tmp_path):
+    instrument.enable(timeline=True)
+    with instrument.phase("outer"):
+        with instrument.phase("inner"):
+            pass
+
+    events = instrument.report()["events"]
+    # Events are added when their phase ends.
+    assert [e["name"] for e in events] == ["inner", "outer"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+    path = tmp_path / "trace.json"
+    instrument.write_trace(str(path))
+    assert json.loads(path.read_text())["traceEvents"] == events
+
+
+def test_timeline_needs_instrumentation():
+    instrument.enable(False, timeline=True)
+    assert not instrument.timeline_enabled()
+
+
+def test_recording_restores_totals():
+    instrument.enable(timeline=True)
+    instrument.count("flushes")
+    with instrument.phase("setup"):
+        pass
+
+    with instrument.recording() as recorded:
+        instrument.count("epr_pairs", 2)
+        with instrument.phase("run"):
+            pass
+
+    assert recorded["counts"] == {"epr_pairs": 2}
+    assert recorded["phases"].keys() == {"run"}
+    assert [e["name"] for e in recorded["events"]] == ["run"]
+    r = instrument.report()
+    assert r["counts"] == {"flushes": 1}
+    assert r["phases"].keys() == {"setup"}
+    assert [e["name"] for e in r["events"]] == ["setup"]
+
+
+def test_recording_disabled_is_empty():
+    with instrument.recording() as recorded:
+        instrument.count("flushes")
+
+    assert recorded == {"phases": {}, "counts": {}}
+
+
+def test_merge_reports():
+    reports = [
+        {"phases": {"run": 1.0}, "counts": {"iterations": 2, "flushes": 6}},
+        {
+            "phases": {"run": 0.5, "dump": 0.25},
+            "counts": {"iterations": 2, "cached_iterations": 1, "flushes": 2},
+            "events": [{"name": "run"}],
+        },
+    ]
+
+    merged = instrument.merge_reports(reports)
+    assert merged["phases"] == {"run": 1.5, "dump": 0.25}
+    assert merged["counts"] == {"iterations": 4, "cached_iterations": 1, "flushes": 8}
+    assert merged["per_iteration"] == {"flushes": 2.0}
+    assert merged["events"] == [{"name": "run"}]
+
+
+def test_merge_reports_without_iterations():
+    merged = instrument.merge_reports([{"phases": {}, "counts": {"flushes": 1}}])
+    assert "per_iteration" not in merged
+    assert "events" not in merged
+
+
+def sweep(summaries):
+    spec = SimpleNamespace(paths=["link.fidelity"])
+    protocol = SimpleNamespace(compile_versions=["None"])
+    points = [(0.9,), (1.0,)]
+    return sweep_engine.sweep_data(spec, protocol, points, summaries, {"name": "x"})
+
+
+def test_sweep_data_attaches_reports():
+    report = {"phases": {"run": 1.0}, "counts": {"iterations": 10, "flushes": 20}}
+    summaries = [
+        {"None": {"fidelity": 0.9}, instrument.REPORT_KEY: report},
+        {"None": {"fidelity": 1.0}, instrument.REPORT_KEY: report},
+    ]
+
+    data = sweep(summaries)
+    assert data["None"] == [
+        {"point": [0.9], "sweep_value": 0.9, "fidelity": 0.9},
+        {"point": [1.0], "sweep_value": 1.0, "fidelity": 1.0},
+    ]
+    reports = data["meta"][instrument.REPORT_KEY]
+    assert [r["point"] for r in reports["points"]] == [[0.9], [1.0]]
+    assert reports["total"]["counts"] == {"iterations": 20, "flushes": 40}
+    assert reports["total"]["per_iteration"] == {"flushes": 2.0}
+    assert data["meta"]["name"] == "x"
+
+
+def test_sweep_data_without_reports():
+    summaries = [{"None": {"fidelity": 0.9}}, {"None": {"fidelity": 1.0}}]
+
+    data = sweep(summaries)
+    assert data["meta"] == {"name": "x"}
@@ -0,0 +1,221 @@
+import os
+import random
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import instrument
+import parallel
+
+
+def fake_samples(num_times: int, offset: float = 0.0):
+    return {"x": [offset + random.random() for _ in range(num_times)]}
+
+
+@pytest.fixture(autouse=True)
+def no_netsquid(monkeypatch):
+    # Seed the Python and numpy random states like `reset_simulation` does,
+    # without the NetSquid simulator.
+    def reset_simulation(seed=None):
+        if seed is not None:
+            np.random.seed(seed)
+            random.seed(seed)
+
+    monkeypatch.setattr(parallel, "reset_simulation", reset_simulation)
+
+
+def in_order(func, jobs, workers=1, log_level="WARNING"):
+    for i, job in enumerate(jobs):
+        yield i, func(job)
+
+
+def reversed_order(func, jobs, workers=1, log_level="WARNING"):
+    for i in reversed(range(len(jobs))):
+        yield i, func(jobs[i])
+
+
+def interleaved(func, jobs, workers=1, log_level="WARNING"):
+    # Like `workers` processes that each take every `workers`th job.
+    for start in range(workers):
+        for i in range(start, len(jobs), workers):
+            yield i, func(jobs[i])
+
+
+def test_derive_seed_depends_on_keys_only():
+    assert parallel.derive_seed(42, "a", 0.1, 3) == parallel.derive_seed(
+        42, "a", 0.1, 3
+    )
+    assert parallel.derive_seed(42, "a", 0.1, 3) != parallel.derive_seed(
+        42, "a", 0.1, 4
+    )
+    assert parallel.derive_seed(42, "a") != parallel.derive_seed(43, "a")
+    assert 0 <= parallel.derive_seed(42) < 2**parallel.SEED_BITS
+
+
+def test_shard_sizes():
+    assert parallel.shard_sizes(10) == [10]
+    assert parallel.shard_sizes(10, 20) == [10]
+    assert parallel.shard_sizes(10, 5) == [5, 5]
+    assert parallel.shard_sizes(10, 4) == [4, 4, 2]
+
+
+@pytest.mark.parametrize("run_jobs", [reversed_order, interleaved])
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_run_sharded_same_for_any_worker_count(monkeypatch, run_jobs, workers):
+    args = (fake_samples, {"offset": 1.0}, 23, 42, ("v1", 0.5))
+    expected = parallel.run_sharded(*args, shard_size=5, workers=1)
+
+    monkeypatch.setattr(parallel, "run_jobs", run_jobs)
+    samples = parallel.run_sharded(*args, shard_size=5, workers=workers)
+    assert samples == expected
+    assert len(samples["x"]) == 23
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_run_points_same_for_any_worker_count(monkeypatch, workers):
+    points = [
+        [(fake_samples, {"offset": value}, (version, value)) for version in "ab"]
+        for value in [0.0, 1.0, 2.0]
+    ]
+
+    def run(run_jobs):
+        monkeypatch.setattr(parallel, "run_jobs", run_jobs)
+        results = dict(
+            parallel.run_points(points, 12, 7, shard_size=5, workers=workers)
+        )
+        return [results[p] for p in range(len(points))]
+
+    assert run(interleaved) == run(in_order)
+    assert run(reversed_order) == run(in_order)
+
+
+def test_adaptive_run_matches_fixed_run():
+    points = [[(fake_samples, {}, ("a",))]]
+
+    def stop_after(n):
+        return lambda task_samples: len(task_samples[0]["x"]) >= n
+
+    ((_, adaptive),) = parallel.run_points(
+        points, 100, 7, shard_size=5, converged=stop_after(15)
+    )
+    ((_, fixed),) = parallel.run_points(points, 15, 7, shard_size=5)
+    assert adaptive == fixed
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_run_points_reports_batches_before_point(adaptive):
+    points = [
+        [(fake_samples, {}, (version, value)) for version in "ab"] for value in [0, 1]
+    ]
+    batches = {}
+
+    def on_batch(p, t, start, samples):
+        batches.setdefault((p, t), []).append((start, samples["x"]))
+
+    converged = (lambda task_samples: False) if adaptive else None
+    for p, task_samples in parallel.run_points(
+        points, 12, 7, shard_size=5, converged=converged, on_batch=on_batch
+    ):
+        for t, samples in enumerate(task_samples):
+            starts = [start for start, _ in batches[(p, t)]]
+            assert starts == ([0, 5, 10] if adaptive else [0])
+            assert [x for _, xs in batches[(p, t)] for x in xs] == samples["x"]
+
+
+def multi_input_samples(num_times, inputs):
+    # Like `teleportation_samples_multi`: `num_times` iterations per input in
+    # one run, tagged with the index of their input. The values only depend
+    # on the input and the iteration within the input.
+    indices = [i for i in range(len(inputs)) for _ in range(num_times)]
+    iterations = [j for _ in inputs for j in range(num_times)]
+    return {
+        "fidelities": [inputs[i] + j / 100 for i, j in zip(indices, iterations)],
+        "durations": [10 * inputs[i] + j for i, j in zip(indices, iterations)],
+        "inputs": indices,
+        instrument.REPORT_KEY: [{"phases": {}, "counts": {}}],
+    }
+
+
+def single_input_samples(num_times, value):
+    samples = multi_input_samples(num_times, [value])
+    del samples["inputs"]
+    del samples[instrument.REPORT_KEY]
+    return samples
+
+
+def test_split_inputs_matches_single_input_runs():
+    inputs = [0.0, 1.0, 2.0]
+    split = parallel.split_inputs(multi_input_samples(4, inputs), len(inputs))
+    assert split == [single_input_samples(4, value) for value in inputs]
+
+
+def test_split_sharded_inputs_matches_single_input_runs():
+    inputs = [0.0, 1.0, 2.0]
+    samples = parallel.run_sharded(
+        multi_input_samples, {"inputs": inputs}, 12, 7, shard_size=5
+    )
+    samples.pop(instrument.REPORT_KEY)
+    split = parallel.split_inputs(samples, len(inputs))
+    for value, input_samples in zip(inputs, split):
+        expected = parallel.run_sharded(
+            single_input_samples, {"value": value}, 12, 7, shard_size=5
+        )
+        assert input_samples == expected
+
+
+def test_run_groups_yields_merged_groups(monkeypatch):
+    monkeypatch.setattr(parallel, "run_jobs", reversed_order)
+    groups = [
+        [(fake_samples, {"offset": 10.0 * g}, 2, g * 10 + s, None) for s in range(3)]
+        for g in range(2)
+    ]
+    results = dict(parallel.run_groups(groups))
+    assert sorted(results) == [0, 1]
+    assert len(results[1]["x"]) == 6
+    assert all(10 <= x < 11 for x in results[1]["x"])
+
+
+def init_light_worker(log_level, instrumented, timeline, profile):
+    # `parallel._init_worker` without importing the simulation stack.
+    instrument.enable(instrumented, timeline)
+
+
+def crash_once(job):
+    # The worker running job 2 dies the first time, like on a segfault or when
+    # it is killed for running out of memory.
+    i, marker = job
+    if i == 2 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    random.seed(i)
+    return fake_samples(3, offset=i)
+
+
+def always_crash(job):
+    os._exit(1)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(parallel, "_init_worker", init_light_worker)
+    pool = parallel.WorkerPool(2, ("WARNING", False, False, None), "fork")
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_restarts_after_worker_died(pool, tmp_path, capsys):
+    jobs = [(i, str(tmp_path / "crashed")) for i in range(6)]
+
+    results = dict(pool.run(crash_once, jobs))
+    assert "a worker process died" in capsys.readouterr().out
+    assert sorted(results) == list(range(len(jobs)))
+    # Job 2 does not crash anymore, so this is the serial run.
+    assert results == dict(parallel.run_jobs(crash_once, jobs, workers=1))
+
+
+def test_pool_gives_up_after_max_restarts(pool, capsys):
+    with pytest.raises(BrokenProcessPool):
+        list(pool.run(always_crash, [0, 1]))
+    out = capsys.readouterr().out
+    assert out.count("a worker process died") == parallel.MAX_POOL_RESTARTS
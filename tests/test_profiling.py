@@ -0,0 +1,64 @@
+import glob
+import os
+import pstats
+import time
+
+import pytest
+
+import parallel
+import profiling
+
+
+def square(x):
+    # Long enough for the jobs to be spread over the workers.
+    time.sleep(0.1)
+    return x * x
+
+
+def run_squares(workers):
+    results = dict(parallel.run_jobs(square, list(range(4)), workers=workers))
+    return [results[i] for i in range(4)]
+
+
+def run_ids(out_dir):
+    return {
+        os.path.basename(path)[: -len("_merged.pstats")]
+        for path in glob.glob(os.path.join(out_dir, "*_merged.pstats"))
+    }
+
+
+def test_serial_runs_are_separate(tmp_path):
+    out_dir = str(tmp_path)
+    assert profiling.run(run_squares, 1, out_dir=out_dir, top=1) == [0, 1, 4, 9]
+    assert profiling.run(run_squares, 1, out_dir=out_dir, top=1) == [0, 1, 4, 9]
+    assert not profiling.enabled()
+
+    # Runs in the same second still get their own files.
+    ids = run_ids(out_dir)
+    assert len(ids) == 2
+    for run_id in ids:
+        assert os.path.exists(os.path.join(out_dir, f"{run_id}_main.pstats"))
+        stats = pstats.Stats(os.path.join(out_dir, f"{run_id}_merged.pstats"))
+        assert any(func[2] == "square" for func in stats.stats)
+
+
+def test_workers_are_profiled(tmp_path):
+    # The workers import the simulation stack.
+    pytest.importorskip("netsquid")
+    pytest.importorskip("squidasm")
+    out_dir = str(tmp_path)
+    try:
+        assert profiling.run(run_squares, 2, out_dir=out_dir, top=1) == [0, 1, 4, 9]
+    finally:
+        parallel.shutdown_pool()
+
+    (run_id,) = run_ids(out_dir)
+    worker_paths = glob.glob(os.path.join(out_dir, f"{run_id}_worker_*.pstats"))
+    assert worker_paths
+    for path in worker_paths:
+        stats = pstats.Stats(path)
+        assert any(func[2] == "square" for func in stats.stats)
+    merged = pstats.Stats(os.path.join(out_dir, f"{run_id}_merged.pstats"))
+    calls = sum(stat[1] for func, stat in merged.stats.items() if func[2] == "square")
+    # The main process only submits the jobs, so all calls are in workers.
+    assert calls == 4
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from rawdata import RawSampleWriter, read_raw_samples
+
+META = {"config": "cfg", "num_times": 6, "seed": 42}
+
+
+def batch(start, size):
+    return {"fidelities": [float(i) for i in range(start, start + size)]}
+
+
+def write_point(writer, value, batch_size=2, num_times=6):
+    for start in range(0, num_times, batch_size):
+        writer.write({"sweep_value": value}, batch(start, batch_size), start)
+
+
+def iterations(directory):
+    return sorted(
+        (r["sweep_value"], r["iteration"], r["fidelities"])
+        for r in read_raw_samples(directory)
+    )
+
+
+def expected(values, num_times=6):
+    return sorted((v, i, float(i)) for v in values for i in range(num_times))
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "npz"])
+def test_round_trip(tmp_path, fmt):
+    writer = RawSampleWriter(str(tmp_path), META, fmt=fmt, shard_records=5)
+    write_point(writer, 0.1)
+    write_point(writer, 0.2)
+    writer.close()
+    assert iterations(str(tmp_path)) == expected([0.1, 0.2])
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "npz"])
+def test_resume_does_not_duplicate_unfinished_point(tmp_path, fmt):
+    directory = str(tmp_path)
+    writer = RawSampleWriter(directory, META, fmt=fmt)
+    write_point(writer, 0.1)
+    # The sweep is stopped after the first batch of the second point, which is
+    # therefore not in the checkpoint and simulated again after resuming.
+    writer.write({"sweep_value": 0.2}, batch(0, 2), 0)
+    writer.close()
+
+    writer = RawSampleWriter(directory, META, fmt=fmt, resume=True)
+    write_point(writer, 0.2)
+    writer.close()
+    assert iterations(directory) == expected([0.1, 0.2])
+
+
+def test_resume_removes_interrupted_write(tmp_path):
+    directory = str(tmp_path)
+    writer = RawSampleWriter(directory, META)
+    write_point(writer, 0.1)
+    writer.close()
+    # Killed while writing the next batch, before it was added to the index.
+    shard = os.path.join(directory, "part-00000.jsonl")
+    with open(shard, "a") as f:
+        f.write('{"sweep_value": 0.2, "iteration": 0, "fidelities": 0.0}\n')
+        f.write('{"sweep_value": 0.2, "itera')
+
+    writer = RawSampleWriter(directory, META, resume=True)
+    write_point(writer, 0.2)
+    writer.close()
+    assert iterations(directory) == expected([0.1, 0.2])
+
+
+def test_resume_rejects_other_sweep(tmp_path):
+    writer = RawSampleWriter(str(tmp_path), META)
+    write_point(writer, 0.1)
+    writer.close()
+    with pytest.raises(ValueError):
+        RawSampleWriter(str(tmp_path), {**META, "seed": 43}, resume=True)
+    with pytest.raises(ValueError):
+        RawSampleWriter(str(tmp_path), META)
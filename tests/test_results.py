@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from results import OUTCOME, STATE, TIME, IterationResults
+
+FIELDS = {
+    "m1": OUTCOME,
+    "sender_start": TIME,
+    "receiver_start": TIME,
+    "sender_end": TIME,
+    "receiver_end": TIME,
+    "state": STATE,
+}
+
+
+def test_preallocated_arrays():
+    results = IterationResults(3, FIELDS)
+    assert results.num_times == 3
+    assert results["m1"].shape == (3,)
+    assert results["m1"].dtype == np.int8
+    assert results["sender_start"].dtype == np.float64
+    assert results["state"].shape == (3, 2, 2)
+    assert results["state"].dtype == np.complex128
+
+
+def test_record_in_place():
+    results = IterationResults(3, FIELDS)
+    m1 = results["m1"]
+    state = np.array([[0.5, 0.5j], [-0.5j, 0.5]])
+    results.record(1, m1=1, state=state)
+    results.record(2, m1=1)
+    # The arrays are written in place, not replaced.
+    assert results["m1"] is m1
+    np.testing.assert_array_equal(m1, [0, 1, 1])
+    np.testing.assert_array_equal(results["state"][1], state)
+
+
+def test_unrecorded_fields_are_zero():
+    results = IterationResults(2, FIELDS)
+    results.record(0, m1=1)
+    np.testing.assert_array_equal(results["m1"], [1, 0])
+    np.testing.assert_array_equal(results["state"], np.zeros((2, 2, 2)))
+
+
+def test_unknown_field():
+    results = IterationResults(2, FIELDS)
+    with pytest.raises(KeyError):
+        results.record(0, m3=1)
+    with pytest.raises(KeyError):
+        results["m3"]
+
+
+def test_durations():
+    results = IterationResults(2, FIELDS)
+    results.record(0, sender_start=1.0, receiver_start=2.0)
+    results.record(0, sender_end=5.0, receiver_end=4.0)
+    results.record(1, sender_start=10.0, receiver_start=9.0)
+    results.record(1, sender_end=12.0, receiver_end=13.0)
+    durations = results.durations(
+        ("sender_start", "receiver_start"), ("sender_end", "receiver_end")
+    )
+    np.testing.assert_array_equal(durations, [4.0, 4.0])
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("netsquid")
+pytest.importorskip("squidasm")
+
+from squidasm.run.stack.config import StackNetworkConfig  # noqa: E402
+
+import session  # noqa: E402
+from teleport.teleport import teleportation_samples_multi  # noqa: E402
+
+CONFIG = os.path.join(
+    os.path.dirname(__file__), "..", "netqasm_sim", "configs", "teleport_cfg1.yaml"
+)
+INPUTS = [(0.0, 0.0), (1.0, 0.5)]
+
+
+def run(cfg, seed, reuse_network):
+    np.random.seed(seed)
+    return teleportation_samples_multi(
+        cfg, num_times=5, theta_phis=INPUTS, reuse_network=reuse_network
+    )
+
+
+def test_reuse_matches_fresh_network():
+    cfg = StackNetworkConfig.from_file(CONFIG)
+    session.clear_sessions()
+    # The second call runs on the network that the first one built.
+    run(cfg, 1, reuse_network=True)
+    reused = run(cfg, 2, reuse_network=True)
+    session.clear_sessions()
+    fresh = run(cfg, 2, reuse_network=False)
+
+    assert reused.keys() == fresh.keys()
+    for key in fresh:
+        np.testing.assert_allclose(
+            np.asarray(reused[key], dtype=float), np.asarray(fresh[key], dtype=float)
+        )
+
+
+def instruction_settings(session_or_network):
+    # (instruction, duration, depolarizing rate) of every physical instruction
+    # of every device.
+    network = session_or_network._network
+    settings = {}
+    for name, stack in network.stacks.items():
+        settings[name] = [
+            (
+                instruction.instruction.name,
+                instruction.duration,
+                getattr(instruction.q_noise_model, "depolar_rate", None),
+            )
+            for instruction in stack.qdevice.get_physical_instructions()
+        ]
+    return settings
+
+
+def nv_config(typ, depolar_prob, gate_time):
+    cfg = StackNetworkConfig.from_file(
+        os.path.join(os.path.dirname(CONFIG), "near_perfect_nv.yaml")
+    )
+    for stack in cfg.stacks:
+        stack.qdevice_typ = typ
+        stack.qdevice_cfg["ec_gate_depolar_prob"] = depolar_prob
+        stack.qdevice_cfg["ec_controlled_dir_x"] = gate_time
+        stack.qdevice_cfg["ec_controlled_dir_y"] = gate_time
+    return cfg
+
+
+@pytest.mark.parametrize("typ", ["nv", "nv_vanilla"])
+def test_patched_session_matches_fresh_network(typ):
+    session.clear_sessions()
+    first = session.get_session(nv_config(typ, 0.01, 500_000))
+    cfg = nv_config(typ, 0.05, 700_000)
+    patched = session.get_session(cfg)
+    # Only "nv" devices are patched in place; others get a new network.
+    assert (patched is first) == (typ == "nv")
+    assert instruction_settings(patched) == instruction_settings(
+        session.NetworkSession(cfg)
+    )
+
+
+def test_network_key():
+    nv = nv_config("nv", 0.01, 500_000)
+    assert session.network_key(nv) == session.network_key(nv_config("nv", 0.05, 1))
+    vanilla = nv_config("nv_vanilla", 0.01, 500_000)
+    assert session.network_key(vanilla) != session.network_key(
+        nv_config("nv_vanilla", 0.05, 500_000)
+    )
+
+
+def test_rebuilds_without_private_api(monkeypatch):
+    calls = []
+
+    def run(cfg, programs, num_times):
+        calls.append(num_times)
+        return [[], []]
+
+    monkeypatch.setattr(session, "CAN_REUSE", False)
+    monkeypatch.setattr(session.stack_run, "run", run)
+    cfg = StackNetworkConfig.from_file(CONFIG)
+    assert session.run_programs(cfg, {}, num_times=3) == [[], []]
+    assert calls == [3]
@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+import stats
+from stats import Metric
+
+
+def test_mean_and_std_error():
+    metric = Metric("x", [1.0, 2.0, 3.0, 4.0])
+    assert metric.mean == 2.5
+    assert np.isclose(metric.std_error, np.std([1, 2, 3, 4]) / 2)
+
+
+def test_zero_variance_is_bounded():
+    # E.g. 4 inputs without any fails in 50 iterations each.
+    metric = Metric("error_rate", [0.0] * 4, num_samples=200)
+    rate = 1 / 202
+    assert metric.mean == 0
+    assert np.isclose(metric.std_error, math.sqrt(rate * (1 - rate) / 200))
+    assert metric.std_error > 0
+
+    # The same holds for values that are all 1, e.g. perfect fidelities.
+    assert np.isclose(
+        Metric("fidelity", [1.0] * 200, num_samples=200).std_error, metric.std_error
+    )
+
+
+def test_bound_only_applies_below_sample_std_error():
+    data = [0.0, 1.0] * 50
+    assert Metric("x", data, num_samples=100).std_error == Metric("x", data).std_error
+
+
+def test_bound_shrinks_with_samples():
+    errors = [Metric("x", [0.0], num_samples=n).std_error for n in [100, 1000, 10000]]
+    assert errors[0] > errors[1] > errors[2]
+
+
+@pytest.mark.parametrize("num_times", [0, stats.MIN_ADAPTIVE_ITERATIONS - 1])
+def test_not_converged_before_min_iterations(num_times):
+    metric = Metric("x", [0.5] * 4)
+    assert metric.std_error == 0
+    assert not stats.converged(metric, num_times, 0.1)
+
+
+def test_converged():
+    n = stats.MIN_ADAPTIVE_ITERATIONS
+    metric = Metric("error_rate", [0.0] * 4, num_samples=4 * n)
+    assert stats.converged(metric, n, 0.01)
+    assert not stats.converged(metric, n, metric.std_error)
@@ -0,0 +1,48 @@
+import pytest
+
+from sweep_engine import SweepProtocol
+
+
+class Protocol(SweepProtocol):
+    name = "test"
+    compile_versions = ["v1"]
+    primary_field = "fidelity"
+
+    def tasks(self, cfg, point_id):
+        return []
+
+    def summarize(self, task_samples):
+        return {"v1": {}}
+
+    def converged(self, target_std_err):
+        return lambda task_samples: True
+
+    def analytic(self, cfg):
+        return {"v1": {}}
+
+    def dump_data(self, data, filename):
+        pass
+
+    def checkpoint_path(self, name):
+        return name
+
+
+def test_protocol_is_abstract():
+    with pytest.raises(TypeError):
+        SweepProtocol()
+
+
+def test_protocol_must_implement_all_methods():
+    methods = {
+        name: getattr(Protocol, name) for name in SweepProtocol.__abstractmethods__
+    }
+    for missing in methods:
+        others = {name: m for name, m in methods.items() if name != missing}
+        incomplete = type("Incomplete", (SweepProtocol,), others)
+        with pytest.raises(TypeError, match=missing):
+            incomplete()
+
+
+def test_complete_protocol():
+    protocol = Protocol()
+    assert protocol.meta() == {}
@@ -0,0 +1,96 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pytest
+
+from sweepdata import (
+    COLUMNAR_SUFFIX,
+    json_compatible,
+    load_sweep_data,
+    write_columnar,
+)
+
+FINAL_DATA = os.path.join(os.path.dirname(__file__), "..", "final_data")
+
+DATA = {
+    "nv": [
+        {"sweep_value": 0.0, "error_rate": 0.1, "std_err": 0.01},
+        {"sweep_value": 0.1, "error_rate": 0.2, "std_err": 0.02, "num_times": 50},
+    ],
+    "vanilla": [{"sweep_value": 0.0, "error_rate": 0.3, "std_err": 0.03}],
+    "meta": {"num_times": 100, "seed": 42, "target_std_err": None},
+}
+
+
+def assert_same(loaded, data):
+    groups = [name for name in data if name != "meta"]
+    assert loaded.groups == groups
+    assert loaded.meta == data.get("meta", {})
+    for name in groups:
+        fields = {field for entry in data[name] for field in entry}
+        assert set(loaded[name]) == fields
+        for field in fields:
+            expected = [entry.get(field, np.nan) for entry in data[name]]
+            np.testing.assert_array_equal(loaded[name][field], expected)
+
+
+def test_columnar_round_trip(tmp_path):
+    path = str(tmp_path / "sweep")
+    write_columnar(DATA, path + COLUMNAR_SUFFIX)
+    assert_same(load_sweep_data(path), DATA)
+
+
+def test_json_and_columnar_agree(tmp_path):
+    path = str(tmp_path / "sweep")
+    with open(path + ".json", "w") as f:
+        json.dump(DATA, f)
+    from_json = load_sweep_data(path + ".json")
+    assert_same(from_json, DATA)
+
+    # The columnar file is preferred once it exists.
+    write_columnar(DATA, path + COLUMNAR_SUFFIX)
+    from_columns = load_sweep_data(path + ".json")
+    assert isinstance(from_columns["nv"]["error_rate"], np.memmap)
+    assert_same(from_columns, DATA)
+
+
+def test_nan_written_as_null(tmp_path):
+    data = {
+        "nv": [
+            {"sweep_value": 0.0, "epr_fid1": np.nan, "error_rate": 0.1},
+            {"sweep_value": 0.1, "epr_fid1": 0.9, "error_rate": 0.2},
+        ],
+        "meta": {"values": [0.0, np.nan]},
+    }
+    path = str(tmp_path / "sweep.json")
+    with open(path, "w") as f:
+        json.dump(json_compatible(data), f)
+    with open(path, "r") as f:
+        text = f.read()
+    assert "NaN" not in text
+    assert json.loads(text)["nv"][0]["epr_fid1"] is None
+
+    loaded = load_sweep_data(path)
+    np.testing.assert_array_equal(loaded["nv"]["epr_fid1"], [np.nan, 0.9])
+    assert loaded["nv"]["epr_fid1"].dtype == float
+
+
+def test_overwrites_older_version(tmp_path):
+    path = str(tmp_path / "sweep_LAST") + COLUMNAR_SUFFIX
+    write_columnar(DATA, path)
+    newer = {"nv": [{"sweep_value": 0.5, "fidelity": 0.9}]}
+    write_columnar(newer, path)
+    assert_same(load_sweep_data(path), newer)
+
+
+@pytest.mark.parametrize(
+    "json_path", sorted(glob.glob(os.path.join(FINAL_DATA, "*", "*.json")))
+)
+def test_final_data_round_trip(tmp_path, json_path):
+    with open(json_path) as f:
+        data = json.load(f)
+    path = str(tmp_path / "sweep") + COLUMNAR_SUFFIX
+    write_columnar(data, path)
+    assert_same(load_sweep_data(path), data)
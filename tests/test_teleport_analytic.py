@@ -0,0 +1,60 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from teleport import COMPILE_VERSIONS, analytic
+
+INPUTS = [
+    (0, 0),
+    (math.pi, 0),
+    (math.pi / 2, 0),
+    (math.pi / 2, math.pi / 2),
+]
+
+
+def config(**qdevice):
+    """The parts of a StackNetworkConfig of two perfect NV nodes with a
+    perfect link that the analytic engine reads."""
+    stacks = [
+        SimpleNamespace(
+            qdevice_typ="nv",
+            qdevice_cfg=dict(qdevice),
+            classical_cfg={"host_qnos_latency": 0},
+        )
+        for _ in range(2)
+    ]
+    link = SimpleNamespace(typ="perfect", cfg={}, classical_cfg={"latency": 0})
+    return SimpleNamespace(stacks=stacks, links=[link])
+
+
+@pytest.mark.parametrize("version", COMPILE_VERSIONS)
+def test_perfect_teleportation(version):
+    result = analytic.expected_teleportation(config(), INPUTS, version)
+    assert np.allclose(result.fidelities, 1)
+    assert np.allclose(result.durations, 0)
+
+
+@pytest.mark.parametrize("version", COMPILE_VERSIONS)
+def test_correction_noise_and_duration(version):
+    p = 0.1
+    cfg = config(
+        electron_single_qubit_depolar_prob=p, electron_rot_x=10, electron_rot_z=30
+    )
+    result = analytic.expected_teleportation(cfg, INPUTS, version)
+
+    # The outcomes are uniform, so 0, 1 or 2 corrections are applied with
+    # probability 1/4, 1/2 and 1/4, and every depolarisation halves the
+    # fidelity.
+    prob_depolarised = 0.5 * p + 0.25 * (1 - (1 - p) ** 2)
+    assert np.allclose(result.fidelities, 1 - prob_depolarised / 2)
+    assert np.allclose(result.durations, 0.5 * 10 + 0.5 * 30)
+    assert result.deterministic_duration == 0
+
+
+def test_rejects_other_devices():
+    cfg = config()
+    cfg.stacks[1].qdevice_typ = "generic"
+    with pytest.raises(ValueError):
+        analytic.expected_teleportation(cfg, INPUTS)